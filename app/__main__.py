@@ -1,54 +1,59 @@
 import argparse
+import contextlib
 import logging
 import sys
 import time
-from check_data_volumes import CheckDataVolumes
-from check_google_group_rbac import CheckGoogleGroupRBAC
-from check_nodes import CheckNodes
-from check_robin_cluster import CheckRobinCluster
-from check_root_syncs import CheckRootSyncs
-from check_virtual_machines import CheckVirtualMachines
-from check_vmruntime import CheckVMRuntime
-from kubernetes import config
-
-health_check_map = {
-    CheckGoogleGroupRBAC.__name__.lower(): CheckGoogleGroupRBAC,
-    CheckNodes.__name__.lower(): CheckNodes,
-    CheckRobinCluster.__name__.lower(): CheckRobinCluster,
-    CheckRootSyncs.__name__.lower(): CheckRootSyncs,
-    CheckVMRuntime.__name__.lower(): CheckVMRuntime,
-    CheckDataVolumes.__name__.lower(): CheckDataVolumes,
-    CheckVirtualMachines.__name__.lower(): CheckVirtualMachines,
-}
+from registry import health_check_registry
 
 default_health_checks = [
-    CheckNodes.__name__.lower(),
-    CheckRobinCluster.__name__.lower(),
-    CheckRootSyncs.__name__.lower()
+    'checknodes',
+    'checkrobincluster',
+    'checkrootsyncs'
 ]
 
-config.load_config()
 logging.basicConfig(stream=sys.stdout)
 logger = logging.getLogger('main')
 
-def run_health_checks(args):
+
+def load_kube_config():
+    # Importing kubernetes pulls in the generated client models, which takes
+    # longer than everything else in the CLI. Defer it until checks run so that
+    # --help and argument errors return immediately.
+    from kubernetes import config  # pylint: disable=import-outside-toplevel
+
+    config.load_config()
+
+
+class ParameterError(Exception):
+    """Raised when the parameters of a health check are invalid"""
+
+    def __init__(self, check_name, error):
+        details = [
+            '.'.join(str(part) for part in detail['loc']) + ': ' + detail['msg']
+            if detail['loc'] else detail['msg']
+            for detail in getattr(error, 'errors', lambda: [])()
+        ] or [str(error)]
+        super().__init__('invalid parameters of ' + check_name + ': ' + '; '.join(details))
+
+
+def build_health_checks(args):
     checks = []
 
     if args.health_check is None:
         # use default health checks
         logger.info('No health checks specified, using default health checks: ' + ', '.join(default_health_checks))
-        checks = [health_check_map[check_name]() for check_name in default_health_checks]
+        checks = [health_check_registry[check_name]() for check_name in default_health_checks]
     else:
         for health_check in args.health_check:
             if len(health_check) == 0:
                 logger.error('No health check specified')
-                return 1
+                return None
 
             check_name = health_check[0].lower()
 
-            if check_name not in health_check_map:
-                logger.error('Unknown health check specified: ' + health_check)
-                return 1
+            if check_name not in health_check_registry:
+                logger.error('Unknown health check specified: ' + health_check[0])
+                return None
             
              
             if len(health_check) > 1:
@@ -58,23 +63,41 @@ def run_health_checks(args):
                 for parameter in health_check[1:]:
                     if "=" not in parameter:
                         logger.error('Invalid parameter specified: ' + parameter + '. Parameters must be in the format key=value')
-                        return 1
+                        return None
 
-                    key, value = parameter.split("=")
+                    # Values may hold '=' themselves, e.g. label_selector=tier=db
+                    key, value = parameter.split("=", 1)
                     check_args[key] = value
 
-                checks.append(health_check_map[check_name](check_args))
+                try:
+                    checks.append(health_check_registry[check_name](check_args))
+                except ValueError as e:
+                    # pydantic ValidationError, e.g. a missing or malformed parameter
+                    raise ParameterError(health_check[0], e) from e
             else:
-                checks.append(health_check_map[check_name]())
+                checks.append(health_check_registry[check_name]())
+
+    return checks
 
+
+def run_health_checks(checks, profiler=None, cache=None):
     failed_health_checks = []
 
-    for check in checks:
-        try:
-            if not check.is_healthy():
-                failed_health_checks.append(check.__class__.__name__)
-        except Exception:
-            failed_health_checks.append(check.__class__.__name__)
+    with profiler.cycle() if profiler else contextlib.nullcontext():
+        for check in checks:
+            name = check.__class__.__name__
+            if cache and cache.passed(check):
+                logger.info('Health check ' + name + ' passed recently, not running it again')
+                continue
+            try:
+                with profiler.check(name) if profiler else contextlib.nullcontext():
+                    healthy = check.is_healthy()
+            except Exception:
+                healthy = False
+            if not healthy:
+                failed_health_checks.append(name)
+            if cache:
+                cache.record(check, healthy)
 
 
     if len(failed_health_checks) > 0:
@@ -86,6 +109,57 @@ def run_health_checks(args):
     return 0
 
 
+def setup_offline_run(args):
+    """Points the API client at a capture or dump; returns the traffic recorder
+    to flush once the checks ran, if recording"""
+    if not (args.record or args.replay or args.dump):
+        return None
+
+    # Imported here for the same reason as in load_kube_config
+    import traffic  # pylint: disable=import-outside-toplevel
+    import cluster_dump  # pylint: disable=import-outside-toplevel
+    from kube_client import api_client  # pylint: disable=import-outside-toplevel
+
+    if args.dump:
+        cluster_dump.use_dump(api_client(), args.dump)
+        return None
+    if args.replay:
+        traffic.replay(api_client(), args.replay, args.replay_time_scale)
+        return None
+    return traffic.record(api_client(), args.record)
+
+
+def print_cluster_result(result):
+    if result.healthy:
+        print(f'PASS {result.cluster} ({result.duration_seconds:.1f}s)', flush=True)
+    else:
+        reason = result.error or 'failed checks: ' + ', '.join(result.failed_checks)
+        print(f'FAIL {result.cluster} ({result.duration_seconds:.1f}s) {reason}', flush=True)
+
+
+def run_fleet_mode(args, checks):
+    # Imported here for the same reason as in load_kube_config
+    import fleet  # pylint: disable=import-outside-toplevel
+
+    clusters = fleet.resolve_clusters(
+        args.kubeconfig or [None], args.context or [], args.all_contexts)
+    logger.info('Checking %d clusters, %d at a time', len(clusters), args.concurrency)
+
+    results = fleet.run_fleet(
+        clusters, checks, concurrency=args.concurrency, on_result=print_cluster_result)
+
+    report = fleet.summarize(results)
+    print(f'{report["healthy"]} of {report["clusters"]} clusters healthy, '
+          f'{report["unhealthy"]} unhealthy ({report["errors"]} unreachable)')
+    for check, count in report['failures_by_check'].items():
+        print(f'  {check} failed on {count} clusters')
+
+    if args.report:
+        fleet.write_report(args.report, report)
+
+    return 0 if report['unhealthy'] == 0 else 1
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
 
@@ -94,6 +168,7 @@ def main() -> int:
         action='append',
         help='''Set a health check to perform.
                 For health checks requiring parameters, pass them in a key=value format as additional arguments.
+                List and mapping parameters take comma-separated values.
                 Example: --health-check checkvirtualmachines namespace=vm-workloads count=3''',
         nargs='+')
     verbosity_mutex = parser.add_mutually_exclusive_group()
@@ -112,6 +187,12 @@ def main() -> int:
         action='store_true',
         help='wait for health checks to pass before exiting')
 
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='''show a live table of the health checks, rerun when the Kubernetes objects
+                they check change; with --wait, exit once all of them pass''')
+
     parser.add_argument(
         '-i', '--interval',
         type=int,
@@ -124,7 +205,90 @@ def main() -> int:
         default=3600,
         help='Overall timeout for health checks to pass')
 
+    parser.add_argument(
+        '--profile',
+        type=int,
+        default=0,
+        metavar='N',
+        help='profile the first N runs of the health checks')
+
+    parser.add_argument(
+        '--profile-dir',
+        default='profiles',
+        help='directory to write profiles to (default: %(default)s)')
+
+    fleet_args = parser.add_argument_group(
+        'fleet mode',
+        'Run the health checks against many clusters concurrently')
+    fleet_args.add_argument(
+        '--kubeconfig',
+        action='append',
+        help='kubeconfig file of clusters to check; can be repeated')
+    fleet_args.add_argument(
+        '--context',
+        action='append',
+        help='kubeconfig context of a cluster to check; can be repeated')
+    fleet_args.add_argument(
+        '--all-contexts',
+        action='store_true',
+        help='check every context of the kubeconfig files')
+    fleet_args.add_argument(
+        '--concurrency',
+        type=int,
+        default=16,
+        help='number of clusters checked at a time (default: %(default)s)')
+    fleet_args.add_argument(
+        '--report',
+        metavar='FILE',
+        help='write a JSON report of the results of all clusters to FILE')
+
+    traffic_args = parser.add_argument_group(
+        'offline runs',
+        '''Capture the Kubernetes API traffic of the checks, or run them against a
+           capture or a dump of cluster objects instead of a cluster''')
+    traffic_mutex = traffic_args.add_mutually_exclusive_group()
+    traffic_mutex.add_argument(
+        '--record',
+        metavar='FILE',
+        help='record the API requests and responses of the checks to FILE')
+    traffic_mutex.add_argument(
+        '--replay',
+        metavar='FILE',
+        help='answer the API requests of the checks from FILE, without a cluster')
+    traffic_mutex.add_argument(
+        '--dump',
+        metavar='DIR',
+        help='''answer the API requests of the checks from the YAML/JSON objects in DIR,
+                e.g. kubectl get -o yaml or must-gather output''')
+    traffic_args.add_argument(
+        '--replay-time-scale',
+        type=float,
+        default=1.0,
+        metavar='SCALE',
+        help='''scale the recorded response times by SCALE when replaying;
+                0 replays as fast as possible (default: %(default)s)''')
+
+    cache_args = parser.add_argument_group(
+        'result cache',
+        'Reuse recent passing results of slow-changing checks across invocations')
+    cache_args.add_argument(
+        '--cache-ttl',
+        action='append',
+        default=[],
+        metavar='[CHECK=]SECONDS',
+        help='''reuse a passing result of CHECK on the same cluster for SECONDS, or of every
+                check without a TTL of its own; can be repeated.
+                Example: --cache-ttl checkgooglegrouprbac=3600 --cache-ttl checkvmruntime=600''')
+    cache_args.add_argument(
+        '--cache-dir',
+        help='directory of the result cache (default: ~/.cache/cluster-health-validator)')
+
     args = parser.parse_args()
+    for value in args.cache_ttl:
+        try:
+            float(value.rpartition('=')[2])
+        except ValueError:
+            parser.error('invalid --cache-ttl: ' + value)
     if args.quiet:
         logger.setLevel(logging.ERROR)
     elif args.verbose == 1:
@@ -134,11 +298,66 @@ def main() -> int:
     else:
         logger.setLevel(logging.WARNING)
 
+    try:
+        checks = build_health_checks(args)
+    except ParameterError as e:
+        parser.error(str(e))
+    if checks is None:
+        return 1
+
+    if args.kubeconfig or args.context or args.all_contexts:
+        if args.wait or args.watch or args.profile or args.record or args.replay or args.dump or args.cache_ttl:
+            logger.error('--wait, --watch, --profile, --record, --replay, --dump and --cache-ttl '
+                         'are not supported in fleet mode')
+            return 1
+        return run_fleet_mode(args, checks)
+
+    if args.watch and (args.replay or args.dump):
+        logger.error('--watch needs a cluster, it is not supported with --replay or --dump')
+        return 1
+
+    if not (args.replay or args.dump):
+        load_kube_config()
+    recorder = setup_offline_run(args)
+    try:
+        if args.watch:
+            return run_watch_view(args, checks)
+        return run_checks(args, checks, build_result_cache(args))
+    finally:
+        if recorder:
+            recorder.flush()
+
+
+def build_result_cache(args):
+    # Results of recorded traffic or dumps are not results of the cluster
+    if not args.cache_ttl or args.replay or args.dump:
+        return None
+
+    # Imported here for the same reason as in load_kube_config
+    import result_cache  # pylint: disable=import-outside-toplevel
+    from kube_client import api_client  # pylint: disable=import-outside-toplevel
+
+    default_ttl, ttls = result_cache.parse_ttls(args.cache_ttl)
+    return result_cache.ResultCache(
+        api_client().configuration.host,
+        default_ttl,
+        ttls,
+        directory=args.cache_dir or result_cache.DEFAULT_DIRECTORY)
+
+
+def run_checks(args, checks, cache=None):
+    profiler = None
+    if args.profile > 0:
+        from profiling import CycleProfiler  # pylint: disable=import-outside-toplevel
+
+        profiler = CycleProfiler(args.profile_dir)
+        profiler.arm(args.profile)
+
     if (args.wait):
         # Poll continuously unless all health checks pass
         max_loops = int(args.timeout / args.interval)
         for i in range(max_loops):
-            if run_health_checks(args) == 0:
+            if run_health_checks(checks, profiler, cache) == 0:
                 return 0
 
             time.sleep(args.interval)
@@ -146,7 +365,16 @@ def main() -> int:
         logger.error('Timed out waiting for health checks to pass')
         return 1
     else:
-        return run_health_checks(args)
+        return run_health_checks(checks, profiler, cache)
+
+
+def run_watch_view(args, checks):
+    # Imported here for the same reason as in load_kube_config
+    from change_watch import ChangeWatches  # pylint: disable=import-outside-toplevel
+    from watch_view import WatchView  # pylint: disable=import-outside-toplevel
+
+    view = WatchView(checks, ChangeWatches(), poll_seconds=args.interval)
+    return view.run(until_healthy=args.wait, timeout=args.timeout if args.wait else None)
 
 if __name__ == '__main__':
     sys.exit(main())
\ No newline at end of file
@@ -1,169 +1,294 @@
-import concurrent.futures
 import logging
 import os
+import threading
+from dataclasses import asdict
 
 import requests
+import snapshot
+import traffic
 from apscheduler.schedulers import base
 from apscheduler.schedulers.background import BackgroundScheduler
-from check_data_volumes import CheckDataVolumes
-from check_google_group_rbac import CheckGoogleGroupRBAC
-from check_nodes import CheckNodes
-from check_robin_cluster import CheckRobinCluster
-from check_root_syncs import CheckRootSyncs
-from check_virtual_machines import CheckVirtualMachines
-from check_vmruntime import CheckVMRuntime
-from config import read_config
-from flask import Flask, abort
+from change_watch import ChangeWatches
+from discovery import ApiDiscovery
+from flask import Flask, abort, jsonify, request, send_from_directory
 from health_checks import HealthCheck
+from kube_client import api_client
 from kubernetes import config
-from kubernetes.client.exceptions import ApiException
-from prometheus_client import Gauge, generate_latest
+from metrics import MULTIPROC_DIR, generate_metrics, multiprocess_enabled
+from profiling import CycleProfiler
+from prometheus_client import Gauge
+from registry import health_check_registry
+from runner import CheckResult, CheckRunner, CycleResult, UnknownCheckError
+from tracing import configure_from_env
+from worker_lock import WorkerLock
 
 logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
 app = Flask(__name__)
 
-platform_health_metric = Gauge("platform_health", "Platform Checks")
-workload_health_metric = Gauge("workload_health", "Workload Checks")
+# Any worker can publish the results of a run, the latest one wins
+platform_health_metric = Gauge(
+    "platform_health", "Platform Checks", multiprocess_mode="livemostrecent"
+)
+workload_health_metric = Gauge(
+    "workload_health", "Workload Checks", multiprocess_mode="livemostrecent"
+)
 
 _MAX_WORKERS = os.environ.get("MAX_WORKERS", 10)
+_RESULT_FRESHNESS_SECONDS = float(os.environ.get("RESULT_FRESHNESS_SECONDS", 30))
+_PROFILING_ENABLED = os.environ.get("ENABLE_PROFILING", "false").lower() == "true"
+_PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/profiles")
+_DISCOVERY_REFRESH_SECONDS = float(os.environ.get("DISCOVERY_REFRESH_SECONDS", 600))
+_DISCOVERY_WATCH_CRDS = os.environ.get("DISCOVERY_WATCH_CRDS", "true").lower() == "true"
+_SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+_TRAFFIC_RECORD_PATH = os.environ.get("TRAFFIC_RECORD_PATH")
+_TRAFFIC_REPLAY_PATH = os.environ.get("TRAFFIC_REPLAY_PATH")
+_TRAFFIC_REPLAY_TIME_SCALE = float(os.environ.get("TRAFFIC_REPLAY_TIME_SCALE", 1))
 _ROBIN_MASTER_SVC_ENDPOINT = "robin-master.robinio.svc.cluster.local"
 _ROBIN_MASTER_SVC_METRICS_PORT = 29446
-
-health_check_map = {
-    CheckGoogleGroupRBAC.__name__: CheckGoogleGroupRBAC,
-    CheckNodes.__name__: CheckNodes,
-    CheckRobinCluster.__name__: CheckRobinCluster,
-    CheckRootSyncs.__name__: CheckRootSyncs,
-    CheckVMRuntime.__name__: CheckVMRuntime,
-    CheckDataVolumes.__name__: CheckDataVolumes,
-    CheckVirtualMachines.__name__: CheckVirtualMachines,
-}
+_ROBIN_METRICS_URL = os.environ.get(
+    "ROBIN_METRICS_URL",
+    f"https://{_ROBIN_MASTER_SVC_ENDPOINT}:{_ROBIN_MASTER_SVC_METRICS_PORT}/metrics",
+)
+_ROBIN_METRICS_TIMEOUT_SECONDS = float(
+    os.environ.get("ROBIN_METRICS_TIMEOUT_SECONDS", 10)
+)
+# Requests to robin-master in flight per worker; further /robin_metrics requests
+# are turned away so that they cannot take all the threads of the worker
+_ROBIN_METRICS_CONCURRENCY = int(os.environ.get("ROBIN_METRICS_CONCURRENCY", 2))
 
 
 @app.route("/metrics")
 def metrics():
     """Prometheus metrics endpoint for workload and platform checks"""
-    return generate_latest()
+    return generate_metrics()
 
 
 # requests is used only to query the robin metrics endpoint to proxy metrics
 # Since robin uses a self-signed cert, disabling warning to avoid
 #   `InsecureRequestWarning: Unverified HTTPS request is being made to host` errors
 requests.packages.urllib3.disable_warnings()
+robin_metrics_slots = threading.BoundedSemaphore(_ROBIN_METRICS_CONCURRENCY)
 
 
 @app.route("/robin_metrics")
 def robin_metrics():
     """Queries and returns robin metrics available from the robin-master service.
     This endpoint serves up robin metrics on an http endpoint, which allows
-    prometheus scraping from stackdriver.
+    prometheus scraping from stackdriver. Responds 503 while
+    ROBIN_METRICS_CONCURRENCY requests to robin-master are in flight, and 502 if
+    robin-master fails to answer.
     """
-    url = (
-        f"https://{_ROBIN_MASTER_SVC_ENDPOINT}:{_ROBIN_MASTER_SVC_METRICS_PORT}/metrics"
-    )
-    response = requests.get(url, verify=False, timeout=10)
+    if not robin_metrics_slots.acquire(blocking=False):
+        abort(503, "Too many robin metrics requests in flight")
+    try:
+        response = requests.get(
+            _ROBIN_METRICS_URL, verify=False, timeout=_ROBIN_METRICS_TIMEOUT_SECONDS
+        )
+    except requests.RequestException as e:
+        logging.warning("Failed to query robin metrics: %s", e)
+        abort(502, "Failed to query robin metrics")
+    finally:
+        robin_metrics_slots.release()
     return response.text
 
 
-def create_health_check_cr():
+def create_health_check_cr(state=None):
     """To create health check resource. It is invoked for each healthcheck
     schedule as configsync apply may create pod first and clusterrolebinding
     later which makes the CR creation fail."""
     try:
-        return HealthCheck()
+        return HealthCheck(state)
     except Exception:  # pylint: disable=broad-except
         logging.error("Failed to setup healthcheck CR", exc_info=True)
         logging.error("Health status will not updated in k8s CR")
     return None
 
 
-def run_checks():
+def set_health_metrics(cycle):
+    if cycle.platform_checks_failed:
+        platform_health_metric.set(0)
+    else:
+        platform_health_metric.set(1)
+
+    if cycle.workload_checks_failed:
+        workload_health_metric.set(0)
+    else:
+        workload_health_metric.set(1)
+
+
+def publish_results(cycle):
+    """Publishes the results of a full check cycle as metrics and CR status"""
     global health_check_cr
-    if not health_check_cr:
-        health_check_cr = HealthCheck()
-
-    platform_checks = []
-    workload_checks = []
-
-    app_config = read_config()
-
-    for check in app_config.platform_checks:
-        if "parameters" in check:
-            platform_checks.append(
-                health_check_map[check["module"]](check["parameters"])
-            )
-        else:
-            platform_checks.append(health_check_map[check["module"]]())
-
-    for check in app_config.workload_checks:
-        if "parameters" in check:
-            workload_checks.append(
-                health_check_map[check["module"]](check["parameters"])
-            )
-        else:
-            workload_checks.append(health_check_map[check["module"]]())
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
-        platform_checks_futures = {
-            executor.submit(check.is_healthy): check.__class__.__name__
-            for check in platform_checks
-        }
-        workload_checks_futures = {
-            executor.submit(check.is_healthy): check.__class__.__name__
-            for check in workload_checks
+
+    set_health_metrics(cycle)
+
+    try:
+        if not health_check_cr:
+            health_check_cr = HealthCheck()
+
+        health_check_cr.update_status(
+            cycle.platform_checks_failed,
+            cycle.workload_checks_failed,
+            # Full cycles only, so every configured check has a result
+            cycle.results,
+        )
+        health_check_cr.record_transitions(cycle.results)
+    finally:
+        # One batch of recorded traffic per cycle, CR updates included
+        if traffic_recorder:
+            traffic_recorder.flush()
+
+    if _SNAPSHOT_PATH:
+        save_snapshot(cycle)
+
+
+def save_snapshot(cycle):
+    """Saves the state needed to resume after a restart"""
+    state = {
+        "results": [asdict(result) for result in cycle.results],
+        "crd_resource_version": api_discovery.crd_resource_version,
+    }
+    if health_check_cr:
+        state["health_check"] = health_check_cr.to_state()
+    try:
+        snapshot.save(_SNAPSHOT_PATH, state)
+    except OSError:
+        logging.warning("Failed to save snapshot", exc_info=True)
+
+
+def restore_snapshot():
+    """Restores the state saved before a restart.
+    Returns:
+        state of the HealthCheck CR, None if not saved
+    """
+    state = snapshot.load(_SNAPSHOT_PATH) if _SNAPSHOT_PATH else None
+    if state is None:
+        return None
+
+    results = [CheckResult(**result) for result in state["results"]]
+    check_runner.restore(results)
+    set_health_metrics(CycleResult(results, cached=True))
+    api_discovery.crd_resource_version = state["crd_resource_version"]
+    logging.info("Restored %d check results from snapshot", len(results))
+    return state.get("health_check")
+
+
+cycle_profiler = CycleProfiler(_PROFILE_DIR) if _PROFILING_ENABLED else None
+api_discovery = ApiDiscovery(refresh_seconds=_DISCOVERY_REFRESH_SECONDS)
+
+check_runner = CheckRunner(
+    health_check_registry,
+    max_workers=int(_MAX_WORKERS),
+    on_cycle_complete=publish_results,
+    profiler=cycle_profiler,
+    discovery=api_discovery,
+    # Watches are not recorded
+    change_watches=None if _TRAFFIC_REPLAY_PATH else ChangeWatches(),
+)
+
+
+def run_checks():
+    check_runner.run()
+
+
+@app.route("/run", methods=["POST"])
+def run():
+    """Runs all health checks, or the one named by the `check` query parameter,
+    and returns the results. Requests arriving while a run is in flight share
+    its results, and results younger than `max_age` seconds are served from
+    cache without querying the apiserver. Both are per worker: with several
+    workers, requests served by different workers run the checks each.
+    """
+    check_name = request.args.get("check")
+    max_age = request.args.get("max_age", _RESULT_FRESHNESS_SECONDS, type=float)
+    try:
+        cycle = check_runner.run(check_name, max_age=max_age)
+    except UnknownCheckError:
+        abort(404, f"Unknown health check: {check_name}")
+    return jsonify(cycle.to_dict())
+
+
+@app.route("/status")
+def status():
+    """Returns the most recent result of every check, and the conditions of the
+    HealthCheck CR. Served from memory, or from the snapshot after a restart,
+    without querying the apiserver. With several workers, these are the results
+    of the cycles run by the worker serving the request, which may lag behind
+    those of the worker running the scheduled checks.
+    """
+    results = check_runner.last_results()
+    return jsonify(
+        {
+            "healthy": CycleResult(results).healthy,
+            "results": [result.to_dict() for result in results],
+            "conditions": (
+                health_check_cr.to_state()["conditions"] if health_check_cr else []
+            ),
         }
+    )
+
 
-        def wait_on_futures(futures):
-            checks_failed = []
-            for future in concurrent.futures.as_completed(futures):
-                name = futures[future]
-                try:
-                    if not future.result():
-                        checks_failed.append(name)
-                # Handling k8s resource not found here as it is not
-                # handled in the individual checks.
-                except ApiException as e:
-                    if e.status == 404:
-                        checks_failed.append(name)
-                    else:
-                        raise
-            return checks_failed
-
-        platform_checks_failed = wait_on_futures(platform_checks_futures)
-        workload_checks_failed = wait_on_futures(workload_checks_futures)
-
-        logging.debug("Platform checks failed: %s", platform_checks_failed)
-        logging.debug("Workload checks failed: %s", workload_checks_failed)
-
-        if platform_checks_failed:
-            platform_health_metric.set(0)
-        else:
-            platform_health_metric.set(1)
-
-        if workload_checks_failed:
-            workload_health_metric.set(0)
-        else:
-            workload_health_metric.set(1)
-
-        if health_check_cr:
-            health_check_cr.update_status(
-                platform_checks_failed, workload_checks_failed
-            )
-
-
-config.load_config()
-health_check_cr = create_health_check_cr()
+@app.route("/debug/profile", methods=["GET", "POST"])
+def profile():
+    """Arms profiling of the next `cycles` check cycles (POST), or lists the
+    profile artifacts available for download (GET). Disabled unless the
+    ENABLE_PROFILING environment variable is set to true.
+    """
+    if not cycle_profiler:
+        abort(404)
+
+    if request.method == "POST":
+        cycles = request.args.get("cycles", 1, type=int)
+        cycle_profiler.arm(cycles)
+        logging.info("Profiling the next %d check cycles", cycles)
+
+    return jsonify(
+        {"remaining": cycle_profiler.remaining, "artifacts": cycle_profiler.artifacts()}
+    )
+
+
+@app.route("/debug/profile/<path:artifact>")
+def profile_artifact(artifact):
+    """Downloads a profile artifact"""
+    if not cycle_profiler:
+        abort(404)
+    return send_from_directory(_PROFILE_DIR, artifact, as_attachment=True)
+
+
+traffic_recorder = None
+if _TRAFFIC_REPLAY_PATH:
+    # Served from the archive, no cluster needed
+    traffic.replay(api_client(), _TRAFFIC_REPLAY_PATH, _TRAFFIC_REPLAY_TIME_SCALE)
+else:
+    config.load_config()
+    if _TRAFFIC_RECORD_PATH:
+        traffic_recorder = traffic.record(api_client(), _TRAFFIC_RECORD_PATH)
+configure_from_env()
+health_check_cr = create_health_check_cr(restore_snapshot())
+# Watches are not recorded
+if _DISCOVERY_WATCH_CRDS and not _TRAFFIC_REPLAY_PATH:
+    api_discovery.start_crd_watch()
 
 scheduler = BackgroundScheduler(daemon=True)
 scheduler.add_job(run_checks, "interval", minutes=1)
-scheduler.start()
+# With several workers, only the one holding the lock runs scheduled checks
+scheduler_lock = None
+if multiprocess_enabled():
+    scheduler_lock = WorkerLock(os.path.join(MULTIPROC_DIR, "scheduler.lock"))
+    scheduler_lock.run_when_acquired(scheduler.start)
+else:
+    scheduler.start()
 
 
 @app.route("/health")
 def health():
     """health endpoint that confirms the health check scheduler is running"""
 
+    # Workers not holding the scheduler lock are standing by
+    if scheduler_lock and not scheduler_lock.held:
+        return "Ok"
+
     # 0 == stopped, 1 == running, 2 == paused
     if scheduler.state != base.STATE_RUNNING:
         abort(500, "Scheduler not running")
@@ -0,0 +1,100 @@
+"""Watches of the resource types of checks, to tell when their results may change.
+
+Each resource type is watched by a single background thread, however many
+checks subscribe to it. Watches start from the current resourceVersion, so the
+objects that already exist do not count as changes, and only stream the
+metadata of the objects, enough to tell that they changed.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from kubernetes import watch
+from kubernetes.client.exceptions import ApiException
+from partial_objects import list_metadata, resource_path, watch_metadata
+
+log = logging.getLogger("change_watch")
+
+_WATCH_TIMEOUT_SECONDS = 300
+_WATCH_RETRY_SECONDS = 10
+
+Resource = Tuple[str, str, str]
+
+
+class ChangeWatches:
+    """Calls back subscribers when objects of the resource types they watch are
+    added, modified or deleted"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Subscriber key -> callback, by resource type
+        self._subscribers: Dict[Resource, Dict[str, Callable[[], None]]] = {}
+        self._threads: Dict[Resource, threading.Thread] = {}
+
+    def subscribe(
+        self, key: str, resources: Iterable[Resource], on_change: Callable[[], None]
+    ) -> None:
+        """Calls on_change on changes of any of resources. Subscribing the same
+        key again replaces its callback."""
+        with self._lock:
+            for resource in resources:
+                self._subscribers.setdefault(resource, {})[key] = on_change
+                if resource not in self._threads:
+                    thread = threading.Thread(
+                        target=self._watch,
+                        args=(resource,),
+                        name=f"change-watch-{'/'.join(resource)}",
+                        daemon=True,
+                    )
+                    self._threads[resource] = thread
+                    thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _notify(self, resource: Resource) -> None:
+        with self._lock:
+            callbacks: List[Callable[[], None]] = list(
+                self._subscribers.get(resource, {}).values()
+            )
+        for callback in callbacks:
+            callback()
+
+    def _watch(self, resource: Resource) -> None:
+        plural = resource[2]
+        path = resource_path(*resource)
+        resource_version: Optional[str] = None
+        while not self._stop.is_set():
+            try:
+                if resource_version is None:
+                    listed = list_metadata(path, [("limit", "1")])
+                    resource_version = listed["metadata"]["resourceVersion"]
+                for event in watch.Watch().stream(
+                    watch_metadata,
+                    path,
+                    resource_version=resource_version,
+                    timeout_seconds=_WATCH_TIMEOUT_SECONDS,
+                ):
+                    if self._stop.is_set():
+                        return
+                    resource_version = event["object"]["metadata"]["resourceVersion"]
+                    log.debug(
+                        "%s %s %s",
+                        plural,
+                        event["object"]["metadata"].get("name"),
+                        event["type"].lower(),
+                    )
+                    self._notify(resource)
+            except ApiException as e:
+                if e.status == 410:
+                    # resourceVersion too old, changes may have been missed
+                    resource_version = None
+                    self._notify(resource)
+                    continue
+                log.warning("Watch of %s failed: %s", plural, e.reason)
+                self._stop.wait(_WATCH_RETRY_SECONDS)
+            except Exception:  # pylint: disable=broad-except
+                log.warning("Watch of %s failed", plural, exc_info=True)
+                self._stop.wait(_WATCH_RETRY_SECONDS)
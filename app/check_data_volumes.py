@@ -1,50 +1,147 @@
 import logging
+from collections import Counter
 
+from kube_client import api_client
 from kubernetes import client
-from pydantic import BaseModel
+from prometheus_client import Gauge
+from workload_namespaces import WorkloadParameters, export, list_by_namespace, report
 
 log = logging.getLogger("check.datavolumes")
 
+# Printer columns of the status fields the check reads
+_COLUMNS = {"phase": "Phase", "progress": "Progress"}
+
+# Known phases of a data volume, any other phase is counted as Other to
+# bound the cardinality of data_volumes_metric
+_PHASES = {
+    "Pending",
+    "PVCBound",
+    "WaitForFirstConsumer",
+    "PendingPopulation",
+    "ImportScheduled",
+    "ImportInProgress",
+    "CloneScheduled",
+    "CloneInProgress",
+    "UploadScheduled",
+    "UploadReady",
+    "ExpansionInProgress",
+    "Paused",
+    "Succeeded",
+    "Failed",
+    "Unknown",
+}
+
+data_volumes_metric = Gauge(
+    "data_volumes",
+    "Number of data volumes by namespace and phase",
+    ["namespace", "phase"],
+    multiprocess_mode="livemostrecent",
+)
+import_progress_metric = Gauge(
+    "data_volume_import_progress_ratio",
+    "Import progress of the data volumes of a namespace, as min and mean",
+    ["namespace", "aggregation"],
+    multiprocess_mode="livemostrecent",
+)
+
+
+def _progress(data_volume):
+    """Returns the import progress of a data volume between 0 and 1, None if unknown"""
+    try:
+        return float(data_volume.get("status").get("progress").rstrip("%")) / 100
+    except (AttributeError, ValueError):
+        return None
+
+
+class CheckDataVolumesParameters(WorkloadParameters):
+    pass
 
-class CheckDataVolumesParameters(BaseModel):
-    namespace: str
-    count: int | None = None
 
 class CheckDataVolumes:
+    api_resources = [("cdi.kubevirt.io", "v1beta1", "datavolumes")]
+
     def __init__(self, parameters: dict) -> None:
-        params = CheckDataVolumesParameters(**parameters)
+        self.params = CheckDataVolumesParameters(**parameters)
 
-        self.namespace = params.namespace
-        self.count = params.count
+        self.namespace = self.params.namespace
+        self.count = self.params.count
 
     def is_healthy(self):
-        k8s = client.CustomObjectsApi()
-        resp = k8s.list_namespaced_custom_object(
+        dvs_by_namespace = list_by_namespace(
+            self.params,
+            client.CustomObjectsApi(api_client()),
+            client.CoreV1Api(api_client()),
             group="cdi.kubevirt.io",
             version="v1beta1",
             plural="datavolumes",
-            namespace=self.namespace,
+            columns=_COLUMNS,
         )
 
-        if self.count is not None and len(resp.get("items")) != self.count:
-            log.error(
-                f'Found {len(resp.get("items"))} datavolumes but expected {self.count}.'
+        # Check every namespace, to report all unhealthy namespaces at once
+        results = {}
+        phases = {}
+        progress = {}
+        for namespace, data_volumes in dvs_by_namespace.items():
+            phases[namespace] = Counter()
+            progress[namespace] = []
+            results[namespace] = self._is_namespace_healthy(
+                namespace, data_volumes, phases[namespace], progress[namespace]
             )
+        scope = self.params.scope()
+        report("datavolumes", results, scope)
+        export(
+            data_volumes_metric,
+            {
+                (namespace, phase): count
+                for namespace, counts in phases.items()
+                for phase, count in counts.items()
+            },
+            scope,
+        )
+        progress_samples = {}
+        for namespace, values in progress.items():
+            if values:
+                progress_samples[(namespace, "min")] = min(values)
+                progress_samples[(namespace, "mean")] = sum(values) / len(values)
+        # The least progress of the checks selecting a namespace
+        export(import_progress_metric, progress_samples, scope, combine=min)
+
+        if not all(results.values()):
             return False
 
+        log.info("Check data volumes passed")
+        return True
+
+    def _is_namespace_healthy(self, namespace, data_volumes, phases, progress):
+        """Checks the data volumes of a namespace, counting them by phase and
+        collecting their import progress"""
+        unhealthy = None
+
         # Assert that each data volume is 100% imported and ready
-        for data_volume in resp.get("items"):
-            if data_volume.get("status").get("phase") != "Succeeded":
-                log.error(
-                    f'DataVolume {data_volume.get("metadata").get("name")} phase not succeeded'
-                )
-                return False
-
-            if data_volume.get("status").get("progress") != "100.0%":
-                log.error(
-                    f'DataVolume {data_volume.get("metadata").get("name")} not imported'
-                )
-                return False
+        for data_volume in data_volumes:
+            phase = data_volume.get("status").get("phase")
+            phases[phase if phase in _PHASES else "Other"] += 1
+            data_volume_progress = _progress(data_volume)
+            if data_volume_progress is not None:
+                progress.append(data_volume_progress)
+
+            if unhealthy is not None:
+                continue
+            name = f'{namespace}/{data_volume.get("metadata").get("name")}'
+            if phase != "Succeeded":
+                unhealthy = f"DataVolume {name} phase not succeeded"
+            elif data_volume.get("status").get("progress") != "100.0%":
+                unhealthy = f"DataVolume {name} not imported"
+
+        count = self.params.expected_count(namespace)
+        if count is not None and len(data_volumes) != count:
+            log.error(
+                f"Found {len(data_volumes)} datavolumes in {namespace} but expected {count}."
+            )
+            return False
+
+        if unhealthy is not None:
+            log.error(unhealthy)
+            return False
 
-        log.info("Check data volumes passed")
         return True
@@ -1,13 +1,16 @@
 import logging
 
+from kube_client import api_client
 from kubernetes import client
 
 log = logging.getLogger("check.googlegrouprbac")
 
 
 class CheckGoogleGroupRBAC:
+    api_resources = [("authentication.gke.io", "v2alpha1", "clientconfigs")]
+
     def is_healthy(self):
-        k8s = client.CustomObjectsApi()
+        k8s = client.CustomObjectsApi(api_client())
         resp = k8s.list_namespaced_custom_object(
             group="authentication.gke.io",
             version="v2alpha1",
@@ -1,11 +1,14 @@
+from kube_client import api_client
 from kubernetes import client
 import logging
 
 log = logging.getLogger('check.nodes')
 
 class CheckNodes:
+    api_resources = [('', 'v1', 'nodes')]
+
     def is_healthy(self):
-        k8s = client.CoreV1Api()
+        k8s = client.CoreV1Api(api_client())
         resp = k8s.list_node()
 
         for node in resp.items:
@@ -0,0 +1,100 @@
+import logging
+from typing import Any
+
+from kube_client import api_client
+from partial_objects import METADATA_LIST, resource_path
+from predicates import compile_predicate
+from pydantic import BaseModel, field_validator
+
+log = logging.getLogger("check.resource")
+
+
+class CheckResourceParameters(BaseModel):
+    group: str = ""
+    version: str
+    plural: str
+    namespace: str | None = None
+    label_selector: str | None = None
+    field_selector: str | None = None
+    count: int | None = None
+    predicates: list[str] = []
+
+    @field_validator("predicates", mode="before")
+    @classmethod
+    def single_predicate(cls, predicates: Any) -> Any:
+        # A single predicate, e.g. on the command line
+        if isinstance(predicates, str):
+            return [predicates]
+        return predicates
+
+    @field_validator("predicates")
+    @classmethod
+    def compile_predicates(cls, predicates: list[str]) -> list[str]:
+        # Report invalid predicates as invalid parameters when the check is
+        # built, which fails this check only, rather than on the first object
+        # they are evaluated on
+        for predicate in predicates:
+            compile_predicate(predicate)
+        return predicates
+
+
+class CheckResource:
+    """Declarative check of any resource type, configured with the resource to
+    list, the expected number of objects and predicates every object must match"""
+
+    def __init__(self, parameters: dict) -> None:
+        self.params = params = CheckResourceParameters(**parameters)
+        self.group = params.group
+        self.version = params.version
+        self.plural = params.plural
+        self.namespace = params.namespace
+        self.label_selector = params.label_selector
+        self.field_selector = params.field_selector
+        self.count = params.count
+        self.predicates = [
+            (predicate, compile_predicate(predicate)) for predicate in params.predicates
+        ]
+        self.api_resources = [(self.group, self.version, self.plural)]
+        # Counting objects or matching their metadata needs no more than a
+        # PartialObjectMetadataList, a fraction of the size of full objects
+        self.metadata_only = all(
+            predicate.startswith("metadata.") for predicate in params.predicates
+        )
+
+    def is_healthy(self):
+        query_params = []
+        if self.label_selector:
+            query_params.append(("labelSelector", self.label_selector))
+        if self.field_selector:
+            query_params.append(("fieldSelector", self.field_selector))
+
+        header_params = {}
+        if self.metadata_only:
+            header_params["Accept"] = METADATA_LIST
+
+        resp = api_client().call_api(
+            resource_path(self.group, self.version, self.plural, self.namespace),
+            "GET",
+            query_params=query_params,
+            header_params=header_params,
+            response_type="object",
+            auth_settings=["BearerToken"],
+            _return_http_data_only=True,
+        )
+        items = resp.get("items")
+
+        # Check for specified count of objects
+        if self.count is not None and len(items) != self.count:
+            log.error(f"Found {len(items)} {self.plural} but expected {self.count}.")
+            return False
+
+        for obj in items:
+            for predicate, matches in self.predicates:
+                if not matches(obj):
+                    log.error(
+                        f'{self.plural} {obj.get("metadata", {}).get("name")} does not match {predicate}.'
+                    )
+                    return False
+
+        log.info(f"Check {self.plural} passed")
+        return True
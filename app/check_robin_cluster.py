@@ -1,13 +1,16 @@
 import logging
 
+from kube_client import api_client
 from kubernetes import client
 
 log = logging.getLogger("check.robincluster")
 
 
 class CheckRobinCluster:
+    api_resources = [("manage.robin.io", "v1", "robinclusters")]
+
     def is_healthy(self):
-        k8s = client.CustomObjectsApi()
+        k8s = client.CustomObjectsApi(api_client())
         resp = k8s.list_cluster_custom_object(
             group="manage.robin.io", version="v1", plural="robinclusters"
         )
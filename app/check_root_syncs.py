@@ -1,14 +1,17 @@
 import logging
 import pprint
 
+from kube_client import api_client
 from kubernetes import client
 
 log = logging.getLogger("check.rootsyncs")
 
 
 class CheckRootSyncs:
+    api_resources = [("configsync.gke.io", "v1beta1", "rootsyncs")]
+
     def is_healthy(self):
-        k8s = client.CustomObjectsApi()
+        k8s = client.CustomObjectsApi(api_client())
         resp = k8s.list_namespaced_custom_object(
             group="configsync.gke.io",
             version="v1beta1",
@@ -1,49 +1,114 @@
 import logging
+from collections import Counter
 
+from kube_client import api_client
 from kubernetes import client
-from pydantic import BaseModel
+from prometheus_client import Gauge
+from workload_namespaces import WorkloadParameters, export, list_by_namespace, report
 
 log = logging.getLogger("check.virtualmachines")
 
+# Printer columns of the status fields the check reads
+_COLUMNS = {"state": "Status"}
 
-class CheckVirtualMachinesParameters(BaseModel):
-    namespace: str
-    count: int | None = None
+# Known states of a virtualmachine, any other state is counted as Other to
+# bound the cardinality of virtual_machines_metric
+_STATES = {
+    "Running",
+    "Stopped",
+    "Starting",
+    "Stopping",
+    "Provisioning",
+    "Pending",
+    "Migrating",
+    "Paused",
+    "Failed",
+    "Error",
+    "Unknown",
+}
+
+virtual_machines_metric = Gauge(
+    "virtual_machines",
+    "Number of virtual machines by namespace and state",
+    ["namespace", "state"],
+    multiprocess_mode="livemostrecent",
+)
+
+
+class CheckVirtualMachinesParameters(WorkloadParameters):
+    pass
 
 
 class CheckVirtualMachines:
+    api_resources = [("vm.cluster.gke.io", "v1", "virtualmachines")]
+
     def __init__(self, parameters: dict) -> None:
-        params = CheckVirtualMachinesParameters(**parameters)
-        self.namespace = params.namespace
-        self.count = params.count
+        self.params = CheckVirtualMachinesParameters(**parameters)
+        self.namespace = self.params.namespace
+        self.count = self.params.count
 
     def is_healthy(self):
-        k8s = client.CustomObjectsApi()
-        resp = k8s.list_namespaced_custom_object(
+        vms_by_namespace = list_by_namespace(
+            self.params,
+            client.CustomObjectsApi(api_client()),
+            client.CoreV1Api(api_client()),
             group="vm.cluster.gke.io",
             version="v1",
             plural="virtualmachines",
-            namespace=self.namespace,
+            columns=_COLUMNS,
         )
 
-        # Check for specified count of virtualmachines
-        if self.count is not None and len(resp.get("items")) != self.count:
-            log.error(
-                f'Found {len(resp.get("items"))} virtualmachines but expected {self.count}.'
+        # Check every namespace, to report all unhealthy namespaces at once
+        results = {}
+        states = {}
+        for namespace, virtual_machines in vms_by_namespace.items():
+            states[namespace] = Counter()
+            results[namespace] = self._is_namespace_healthy(
+                namespace, virtual_machines, states[namespace]
             )
+        scope = self.params.scope()
+        report("virtualmachines", results, scope)
+        export(
+            virtual_machines_metric,
+            {
+                (namespace, state): count
+                for namespace, counts in states.items()
+                for state, count in counts.items()
+            },
+            scope,
+        )
+
+        if not all(results.values()):
             return False
 
+        log.info("Check virtual machines passed")
+        return True
+
+    def _is_namespace_healthy(self, namespace, virtual_machines, states):
+        """Checks the virtualmachines of a namespace, counting them by state"""
         # Assert that each virtualmachine is in a healthy state
         healthy_states = ["Running", "Stopped"]
+        unhealthy = None
 
-        for virtual_machine in resp.get("items"):
+        for virtual_machine in virtual_machines:
             vm_state = virtual_machine.get("status").get("state")
+            states[vm_state if vm_state in _STATES else "Other"] += 1
 
-            if vm_state not in healthy_states:
-                log.error(
-                    f'VirtualMachine {virtual_machine.get("metadata").get("name")} not in a healthy state. state={vm_state}'
-                )
-                return False
+            if unhealthy is None and vm_state not in healthy_states:
+                unhealthy = virtual_machine
+
+        # Check for specified count of virtualmachines
+        count = self.params.expected_count(namespace)
+        if count is not None and len(virtual_machines) != count:
+            log.error(
+                f"Found {len(virtual_machines)} virtualmachines in {namespace} but expected {count}."
+            )
+            return False
+
+        if unhealthy is not None:
+            log.error(
+                f'VirtualMachine {namespace}/{unhealthy.get("metadata").get("name")} not in a healthy state. state={unhealthy.get("status").get("state")}'
+            )
+            return False
 
-        log.info("Check virtual machines passed")
         return True
@@ -1,13 +1,16 @@
 import logging
 
+from kube_client import api_client
 from kubernetes import client
 
 log = logging.getLogger("check.vmruntime")
 
 
 class CheckVMRuntime:
+    api_resources = [("vm.cluster.gke.io", "v1", "vmruntimes")]
+
     def is_healthy(self):
-        k8s = client.CustomObjectsApi()
+        k8s = client.CustomObjectsApi(api_client())
         resp = k8s.list_cluster_custom_object(
             group="vm.cluster.gke.io", version="v1", plural="vmruntimes"
         )
@@ -0,0 +1,151 @@
+"""Per-API-group circuit breakers for Kubernetes API calls.
+
+A breaker opens after CIRCUIT_FAILURE_THRESHOLD consecutive transient failures
+(5xx responses, connection errors, timeouts) of its API group. While open,
+requests to the group fail immediately with CircuitOpenError. Once
+CIRCUIT_RESET_SECONDS have passed a single probe request is let through:
+success closes the breaker, failure opens it again.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict
+from urllib.parse import urlparse
+
+from kubernetes.client.exceptions import ApiException
+from prometheus_client import Gauge
+
+log = logging.getLogger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_DEFAULT_FAILURE_THRESHOLD = 5
+_DEFAULT_RESET_SECONDS = 60
+
+circuit_open_metric = Gauge(
+    "kubernetes_client_circuit_open",
+    "Whether the circuit breaker of a Kubernetes API group is open",
+    ["group"],
+    # Open if the circuit is open in any worker
+    multiprocess_mode="livemax",
+)
+
+
+class CircuitOpenError(ApiException):
+    """Raised instead of sending a request while the circuit of its API group is open"""
+
+    def __init__(self, group: str) -> None:
+        super().__init__(status=503, reason=f"Circuit open for API group {group}")
+        self.group = group
+
+
+def api_group(url: str) -> str:
+    """Returns the API group of a request URL, "core" for the legacy /api group"""
+    parts = urlparse(url).path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "apis":
+        return parts[1]
+    return "core"
+
+
+class CircuitBreaker:
+    """Circuit breaker of a single API group"""
+
+    def __init__(
+        self,
+        group: str,
+        failure_threshold: int = _DEFAULT_FAILURE_THRESHOLD,
+        reset_seconds: float = _DEFAULT_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.group = group
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def before_request(self) -> None:
+        """Raises CircuitOpenError unless a request may be sent"""
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.reset_seconds:
+                    raise CircuitOpenError(self.group)
+                self._state = HALF_OPEN
+                self._probing = False
+
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(self.group)
+                log.info("Probing API group %s", self.group)
+                self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                log.info("Closing circuit for API group %s", self.group)
+                self._state = CLOSED
+                circuit_open_metric.labels(self.group).set(0)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    log.warning(
+                        "Opening circuit for API group %s after %d failures",
+                        self.group,
+                        self._failures,
+                    )
+                self._state = OPEN
+                self._opened_at = self._clock()
+                circuit_open_metric.labels(self.group).set(1)
+
+
+class CircuitBreakers:
+    """Lazily created circuit breakers keyed by API group"""
+
+    def __init__(
+        self,
+        failure_threshold: int = _DEFAULT_FAILURE_THRESHOLD,
+        reset_seconds: float = _DEFAULT_RESET_SECONDS,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, group: str) -> CircuitBreaker:
+        with self._lock:
+            if group not in self._breakers:
+                self._breakers[group] = CircuitBreaker(
+                    group, self.failure_threshold, self.reset_seconds
+                )
+            return self._breakers[group]
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreakers":
+        return cls(
+            failure_threshold=int(
+                os.environ.get("CIRCUIT_FAILURE_THRESHOLD", _DEFAULT_FAILURE_THRESHOLD)
+            ),
+            reset_seconds=float(
+                os.environ.get("CIRCUIT_RESET_SECONDS", _DEFAULT_RESET_SECONDS)
+            ),
+        )
+
+
+circuit_breakers = CircuitBreakers.from_env()
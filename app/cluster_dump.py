@@ -0,0 +1,522 @@
+"""Runs the checks against a dump of cluster objects instead of a cluster.
+
+A dump is a directory of YAML or JSON files, as written by kubectl get -o
+yaml/json or must-gather: single objects, multi-document YAML files or Lists.
+On first use the dump is indexed by group, kind and namespace, recording where
+each object lies in its file; the index is saved next to the dump and rebuilt
+when a file changes. List and get requests are then answered from the index,
+reading only the objects they return. Files are memory-mapped, and the items of
+JSON lists are sliced out of the mapping without being decoded again, so large
+dumps are neither loaded nor parsed whole. YAML documents cannot be sliced; a
+request parses each document it reads from once, and only documents adding up
+to _YAML_CACHE_BYTES of YAML are kept between requests.
+"""
+
+import codecs
+import io
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+
+import urllib3
+import yaml
+from kubernetes.client import rest
+from kubernetes.client.exceptions import ApiException
+
+log = logging.getLogger("cluster_dump")
+
+INDEX_FILE = ".health-check-index.json"
+_INDEX_VERSION = 1
+_EXTENSIONS = (".json", ".yaml", ".yml")
+# Size of the YAML documents kept parsed between requests, e.g. of the objects
+# got by name; a larger document is parsed again by every request reading it
+_YAML_CACHE_BYTES = 8 << 20
+
+
+class _YamlLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """Keeps timestamps as strings, as they are in JSON"""
+
+    yaml_implicit_resolvers = {
+        first: [
+            (tag, regexp)
+            for tag, regexp in resolvers
+            if tag != "tag:yaml.org,2002:timestamp"
+        ]
+        for first, resolvers in yaml.SafeLoader.yaml_implicit_resolvers.items()
+    }
+
+
+# JSON tokens that change the nesting depth, the rest of a string, and what
+# separates the items of an array
+_STRUCTURE = re.compile(rb'[{}\[\]"]')
+_STRING_END = re.compile(rb'(?:[^"\\]|\\.)*"', re.DOTALL)
+_KEY_SEPARATOR = re.compile(rb"\s*:")
+_SEPARATORS = re.compile(rb"[\s,]*")
+_DECODER = json.JSONDecoder()
+_YAML_SEPARATOR = re.compile(rb"^---[ \t]*(?:#.*)?$", re.MULTILINE)
+
+# Location of an object: file, start and end offsets of its JSON text or YAML
+# document, index of the object in the items of the document (-1 if the
+# document is the object) and name
+Entry = Tuple[int, int, int, int, str]
+
+
+def plural(kind: str) -> str:
+    """Guesses the resource name of a kind, for kinds without a CRD in the dump"""
+    name = kind.lower()
+    if name.endswith("y") and name[-2:-1] not in "aeiou":
+        return name[:-1] + "ies"
+    if name.endswith(("s", "x", "ch", "sh")):
+        return name + "es"
+    return name + "s"
+
+
+def _decode_at(buffer: Any, position: int) -> Tuple[Any, int]:
+    """Decodes the JSON value at position, reading a window of the buffer that
+    grows until it holds the whole value.
+    Returns:
+        the value and the offset of its end
+    """
+    window = 1 << 12
+    while True:
+        final = position + window >= len(buffer)
+        text = codecs.getincrementaldecoder("utf-8")().decode(
+            buffer[position : position + window], final=final
+        )
+        try:
+            value, end = _DECODER.raw_decode(text)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            window *= 4
+            continue
+        return value, position + len(text[:end].encode("utf-8"))
+
+
+def _json_objects(buffer: Any) -> Iterator[Tuple[int, int, Any]]:
+    """Yields the offsets and values of the objects of a JSON file: the items of
+    a List, or the top-level object itself. Only the top level is scanned, each
+    item is decoded on its own."""
+    start = buffer.find(b"{")
+    if start < 0:
+        return
+    depth = 0
+    key = None
+    found_items = False
+    position = start
+    while True:
+        match = _STRUCTURE.search(buffer, position)
+        if match is None:
+            raise ValueError("Unterminated JSON object")
+        char = match.group()
+        position = match.end()
+        if char == b'"':
+            end = _STRING_END.match(buffer, position).end()
+            if depth == 1 and _KEY_SEPARATOR.match(buffer, end):
+                key = bytes(buffer[position : end - 1])
+            position = end
+        elif depth == 1 and char == b"[" and key == b"items":
+            found_items = True
+            while True:
+                position = _SEPARATORS.match(buffer, position).end()
+                if buffer[position : position + 1] == b"]":
+                    position += 1
+                    break
+                value, end = _decode_at(buffer, position)
+                yield position, end, value
+                position = end
+        elif char in b"{[":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                if not found_items:
+                    yield start, match.end(), json.loads(buffer[start : match.end()])
+                return
+
+
+def _yaml_documents(buffer: Any) -> Iterator[Tuple[int, int]]:
+    """Yields the offsets of the documents of a YAML file"""
+    start = 0
+    for match in _YAML_SEPARATOR.finditer(buffer):
+        yield start, match.start()
+        start = match.end()
+    yield start, len(buffer)
+
+
+def _items(document: Any) -> List[Tuple[int, Dict[str, Any]]]:
+    if not isinstance(document, dict):
+        return []
+    if isinstance(document.get("items"), list):
+        return [
+            (index, item)
+            for index, item in enumerate(document["items"])
+            if isinstance(item, dict)
+        ]
+    return [(-1, document)]
+
+
+class DumpIndex:
+    """Index of the objects of a dump directory"""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.files: List[List[Any]] = []
+        # "group/Kind" -> namespace ("" if cluster scoped) -> entries
+        self.objects: Dict[str, Dict[str, List[Entry]]] = {}
+        # "group/plural" -> kind
+        self.kinds: Dict[str, str] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        # (file index, start, end) -> parsed YAML document, least recently used
+        # first
+        self._documents: "OrderedDict[Tuple[int, int, int], Any]" = OrderedDict()
+        self._documents_bytes = 0
+        self._documents_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory: str) -> "DumpIndex":
+        """Loads the index of directory, building it if missing or outdated"""
+        index = cls(directory)
+        files = index._scan()
+        path = os.path.join(directory, INDEX_FILE)
+        try:
+            with open(path) as stream:
+                saved = json.load(stream)
+            if saved.get("version") == _INDEX_VERSION and saved["files"] == files:
+                index.files = saved["files"]
+                index.objects = saved["objects"]
+                index.kinds = saved["kinds"]
+                return index
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError):
+            log.warning("Rebuilding unreadable index %s", path, exc_info=True)
+
+        index.build(files)
+        try:
+            with open(path, "w") as stream:
+                stream.write(
+                    json.dumps(
+                        {
+                            "version": _INDEX_VERSION,
+                            "files": index.files,
+                            "objects": index.objects,
+                            "kinds": index.kinds,
+                        },
+                        separators=(",", ":"),
+                    )
+                )
+        except OSError:
+            log.warning("Could not save index to %s", path, exc_info=True)
+        return index
+
+    def _scan(self) -> List[List[Any]]:
+        files = []
+        for root, dirs, names in os.walk(self.directory):
+            dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+            for name in sorted(names):
+                if name.startswith(".") or not name.endswith(_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                files.append(
+                    [
+                        os.path.relpath(path, self.directory),
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    ]
+                )
+        return files
+
+    def build(self, files: List[List[Any]]) -> None:
+        """Indexes files, parsing one object or YAML document at a time"""
+        objects: Dict[str, Dict[str, List[Entry]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        plurals: Dict[str, str] = {}
+        self.files = files
+        for file_index, (name, size, _) in enumerate(files):
+            if size == 0:
+                continue
+            buffer = self._map(file_index)
+            for start, end, item, obj in self._objects(name, buffer):
+                api_version = obj.get("apiVersion") or ""
+                kind = obj.get("kind")
+                metadata = obj.get("metadata") or {}
+                if not kind or "name" not in metadata:
+                    continue
+                group = api_version.rpartition("/")[0]
+                objects[f"{group}/{kind}"][metadata.get("namespace") or ""].append(
+                    (file_index, start, end, item, metadata["name"])
+                )
+                if kind == "CustomResourceDefinition":
+                    names = obj.get("spec", {}).get("names", {})
+                    if "plural" in names and "kind" in names:
+                        crd_group = obj["spec"].get("group", "")
+                        plurals[f'{crd_group}/{names["plural"]}'] = names["kind"]
+
+        self.objects = {key: dict(value) for key, value in objects.items()}
+        self.kinds = {}
+        for key in self.objects:
+            group, _, kind = key.rpartition("/")
+            self.kinds[f"{group}/{plural(kind)}"] = kind
+        self.kinds.update(plurals)
+        log.info(
+            "Indexed %d objects of %d kinds in %s",
+            sum(len(self.entries(*key.rpartition("/")[::2])) for key in self.objects),
+            len(self.objects),
+            self.directory,
+        )
+
+    def _objects(
+        self, name: str, buffer: Any
+    ) -> Iterator[Tuple[int, int, int, Dict[str, Any]]]:
+        try:
+            if name.endswith(".json"):
+                for start, end, obj in _json_objects(buffer):
+                    yield start, end, -1, obj
+            else:
+                for start, end in _yaml_documents(buffer):
+                    document = yaml.load(buffer[start:end], Loader=_YamlLoader)
+                    for item, obj in _items(document):
+                        yield start, end, item, obj
+        except (ValueError, yaml.YAMLError):
+            log.warning("Skipping unparsable file %s", name, exc_info=True)
+
+    def _map(self, file_index: int) -> mmap.mmap:
+        if file_index not in self._maps:
+            path = os.path.join(self.directory, self.files[file_index][0])
+            with open(path, "rb") as stream:
+                self._maps[file_index] = mmap.mmap(
+                    stream.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        return self._maps[file_index]
+
+    def kind(self, group: str, plural_name: str) -> Optional[str]:
+        return self.kinds.get(f"{group}/{plural_name}")
+
+    def entries(
+        self, group: str, kind: str, namespace: Optional[str] = None
+    ) -> List[Entry]:
+        """Returns the entries of a kind, in every namespace if namespace is None"""
+        by_namespace = self.objects.get(f"{group}/{kind}", {})
+        if namespace is None:
+            return [entry for entries in by_namespace.values() for entry in entries]
+        return list(by_namespace.get(namespace, []))
+
+    def _is_json(self, entry: Entry) -> bool:
+        return self.files[entry[0]][0].endswith(".json")
+
+    def raw(self, entry: Entry, document: Any = None) -> bytes:
+        """Returns the JSON text of the object at entry.
+        Args:
+            document: the parsed YAML document of entry, if already parsed
+        """
+        file_index, start, end, item, _ = entry
+        if self._is_json(entry):
+            return self._map(file_index)[start:end]
+        if document is None:
+            document = self._yaml_document(file_index, start, end)
+        return json.dumps(document if item < 0 else document["items"][item]).encode()
+
+    def load(self, entry: Entry, document: Any = None) -> Dict[str, Any]:
+        return json.loads(self.raw(entry, document))
+
+    def documents(self, entries: List[Entry]) -> Iterator[Tuple[Entry, Any]]:
+        """Yields each entry with its parsed YAML document, None for JSON. Each
+        document is parsed once, and released after its last entry, rather than
+        parsed again for every item of a YAML List."""
+        last = {entry[:3]: position for position, entry in enumerate(entries)}
+        parsed: Dict[Tuple[int, int, int], Any] = {}
+        for position, entry in enumerate(entries):
+            if self._is_json(entry):
+                yield entry, None
+                continue
+            key = entry[:3]
+            if key not in parsed:
+                parsed[key] = self._yaml_document(*key)
+            document = parsed.pop(key) if last[key] == position else parsed[key]
+            yield entry, document
+
+    def _yaml_document(self, file_index: int, start: int, end: int) -> Any:
+        key = (file_index, start, end)
+        with self._documents_lock:
+            if key in self._documents:
+                self._documents.move_to_end(key)
+                return self._documents[key]
+        document = yaml.load(self._map(file_index)[start:end], Loader=_YamlLoader)
+        if end - start > _YAML_CACHE_BYTES:
+            return document
+        with self._documents_lock:
+            if key not in self._documents:
+                self._documents[key] = document
+                self._documents_bytes += end - start
+            while self._documents_bytes > _YAML_CACHE_BYTES:
+                (_, old_start, old_end), _ = self._documents.popitem(last=False)
+                self._documents_bytes -= old_end - old_start
+        return document
+
+    def close(self) -> None:
+        with self._documents_lock:
+            self._documents.clear()
+            self._documents_bytes = 0
+        for buffer in self._maps.values():
+            buffer.close()
+        self._maps.clear()
+
+
+def _parse_path(
+    path: str,
+) -> Optional[Tuple[str, str, Optional[str], str, Optional[str]]]:
+    """Splits a resource path into group, version, namespace, plural and name"""
+    segments = [unquote(segment) for segment in path.split("/") if segment]
+    if segments[:1] == ["api"] and len(segments) >= 3:
+        group, version, rest_segments = "", segments[1], segments[2:]
+    elif segments[:1] == ["apis"] and len(segments) >= 4:
+        group, version, rest_segments = segments[1], segments[2], segments[3:]
+    else:
+        return None
+
+    namespace = None
+    if rest_segments[0] == "namespaces" and len(rest_segments) >= 3:
+        namespace, rest_segments = rest_segments[1], rest_segments[2:]
+    if len(rest_segments) > 2:
+        # Subresources are not dumped
+        return None
+    name = rest_segments[1] if len(rest_segments) == 2 else None
+    return group, version, namespace, rest_segments[0], name
+
+
+def _lookup(obj: Dict[str, Any], path: str) -> Any:
+    for key in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def _matches_labels(obj: Dict[str, Any], selector: str) -> bool:
+    """Supports the equality-based requirements of label selectors"""
+    labels = (obj.get("metadata") or {}).get("labels") or {}
+    for requirement in filter(None, (part.strip() for part in selector.split(","))):
+        if "!=" in requirement:
+            key, value = requirement.split("!=", 1)
+            if labels.get(key.strip()) == value.strip():
+                return False
+        elif "=" in requirement:
+            key, value = requirement.replace("==", "=").split("=", 1)
+            if labels.get(key.strip()) != value.strip():
+                return False
+        elif requirement.startswith("!"):
+            if requirement[1:].strip() in labels:
+                return False
+        elif requirement not in labels:
+            return False
+    return True
+
+
+def _matches_fields(obj: Dict[str, Any], selector: str) -> bool:
+    for requirement in filter(None, (part.strip() for part in selector.split(","))):
+        negate = "!=" in requirement
+        key, value = requirement.replace("!=", "=").replace("==", "=").split("=", 1)
+        actual = _lookup(obj, key.strip())
+        if (str(actual) if actual is not None else "") == value.strip():
+            if negate:
+                return False
+        elif not negate:
+            return False
+    return True
+
+
+class DumpRESTClient(rest.RESTClientObject):
+    """REST client answering read requests from a DumpIndex"""
+
+    def __init__(self, index: DumpIndex) -> None:  # pylint: disable=super-init-not-called
+        # No connection pool, nothing is sent
+        self.index = index
+
+    def request(
+        self,
+        method,
+        url,
+        query_params=None,
+        headers=None,
+        body=None,
+        post_params=None,
+        _preload_content=True,
+        _request_timeout=None,
+    ):
+        if method != "GET":
+            return self._response(405, "Method Not Allowed", b"")
+
+        params = dict(query_params or [])
+        parsed = _parse_path(urllib3.util.parse_url(url).path or "")
+        kind = parsed and self.index.kind(parsed[0], parsed[3])
+        if not kind or params.get("watch") in (True, "true", "True"):
+            return self._response(404, "Not Found", b"")
+
+        group, version, namespace, _, name = parsed
+        entries = self.index.entries(group, kind, namespace)
+        if name is not None:
+            entries = [entry for entry in entries if entry[4] == name]
+            if not entries:
+                return self._response(404, "Not Found", b"")
+            return self._response(
+                200, "OK", self.index.raw(entries[0]), _preload_content
+            )
+
+        label_selector = params.get("labelSelector")
+        field_selector = params.get("fieldSelector")
+        if label_selector or field_selector:
+            items = []
+            for entry, document in self.index.documents(entries):
+                obj = self.index.load(entry, document)
+                if label_selector and not _matches_labels(obj, label_selector):
+                    continue
+                if field_selector and not _matches_fields(obj, field_selector):
+                    continue
+                items.append(json.dumps(obj).encode())
+        else:
+            items = [
+                self.index.raw(entry, document)
+                for entry, document in self.index.documents(entries)
+            ]
+
+        api_version = f"{group}/{version}" if group else version
+        head = json.dumps(
+            {
+                "apiVersion": api_version,
+                "kind": f"{kind}List",
+                "metadata": {"resourceVersion": ""},
+            }
+        ).encode()
+        data = head[:-1] + b',"items":[' + b",".join(items) + b"]}"
+        return self._response(200, "OK", data, _preload_content)
+
+    @staticmethod
+    def _response(status, reason, data, preload_content=True):
+        response = urllib3.HTTPResponse(
+            body=io.BytesIO(data),
+            headers={"Content-Type": "application/json"},
+            status=status,
+            reason=reason,
+            preload_content=False,
+        )
+        if preload_content:
+            response = rest.RESTResponse(response)
+        if not 200 <= response.status <= 299:
+            raise ApiException(http_resp=response)
+        return response
+
+
+def use_dump(api: Any, directory: str) -> DumpIndex:
+    """Answers the read requests of an ApiClient from the dump in directory"""
+    index = DumpIndex.open(directory)
+    api.rest_client = DumpRESTClient(index)
+    return index
@@ -1,8 +1,9 @@
 import os
-from typing import NotRequired
+import re
+from typing import Literal, NotRequired
 
 import yaml
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing_extensions import TypedDict
 
 """
@@ -13,25 +14,110 @@ platform_checks:
   module: CheckNodes
 - name: Robin Cluster Health
   module: CheckRobinCluster
+- name: Google Group RBAC
+  module: CheckGoogleGroupRBAC
+  cache_ttl: 3600
+  invalidate_on_change: true
 
 workload_checks:
 - name: VM Workloads Health
   module: CheckVirtualMachines
+  if_absent: not_applicable
+  depends_on:
+  - Node Health
   parameters:
     namespace: vm-workloads
 """
 
 
+# Conditions of the HealthCheck status besides those of the checks
+AGGREGATE_CONDITION_TYPES = ("PlatformHealthy", "WorkloadsHealthy")
+
+
+def condition_type(check_name: str) -> str:
+    """Returns the condition type of a check: its name in CamelCase, e.g.
+    VMWorkloadsHealth for VM Workloads Health"""
+    words = re.findall(r"[A-Za-z0-9]+", check_name)
+    return "".join(word[0].upper() + word[1:] for word in words) or "Check"
+
+
 class HealthCheck(TypedDict):
     name: str
     module: str
     parameters: NotRequired[dict] = {}
+    # Result of the check when the cluster does not serve its resource type
+    if_absent: NotRequired[Literal["fail", "not_applicable"]]
+    # Names or modules of checks that must pass before this check runs
+    depends_on: NotRequired[list[str]]
+    # Seconds a result is reused instead of running the check again
+    cache_ttl: NotRequired[float]
+    # Drop the reused result as soon as an object of the check's resource
+    # types changes
+    invalidate_on_change: NotRequired[bool]
 
 
 class Config(BaseModel):
     platform_checks: list[HealthCheck]
     workload_checks: list[HealthCheck]
 
+    def dependencies(self) -> dict[str, set[str]]:
+        """Returns the names of the checks each check depends on, by check name"""
+        checks = self.platform_checks + self.workload_checks
+        dependencies = {}
+        for check in checks:
+            dependencies[check["name"]] = set()
+            for dependency in check.get("depends_on", []):
+                matches = {
+                    other["name"]
+                    for other in checks
+                    if dependency in (other["name"], other["module"])
+                }
+                if not matches:
+                    raise ValueError(
+                        f"Check {check['name']} depends on unknown check {dependency}"
+                    )
+                dependencies[check["name"]] |= matches
+        return dependencies
+
+    @model_validator(mode="after")
+    def check_condition_types(self) -> "Config":
+        # Conditions are keyed by type, checks whose names map to the same type
+        # would overwrite each other's condition
+        names_by_type = {
+            type_: "the aggregate condition" for type_ in AGGREGATE_CONDITION_TYPES
+        }
+        for check in self.platform_checks + self.workload_checks:
+            type_ = condition_type(check["name"])
+            if type_ in names_by_type:
+                raise ValueError(
+                    f"Check {check['name']} has the condition type {type_} of "
+                    f"{names_by_type[type_]}, rename it"
+                )
+            names_by_type[type_] = f"check {check['name']}"
+        return self
+
+    @model_validator(mode="after")
+    def check_dependencies(self) -> "Config":
+        dependencies = self.dependencies()
+        # Depth-first search for a dependency cycle
+        visited, path = set(), []
+
+        def visit(name: str) -> None:
+            if name in path:
+                cycle = path[path.index(name) :] + [name]
+                raise ValueError(f"Dependency cycle: {' -> '.join(cycle)}")
+            if name in visited:
+                return
+            path.append(name)
+            for dependency in sorted(dependencies[name]):
+                visit(dependency)
+            path.pop()
+            visited.add(name)
+
+        for name in dependencies:
+            visit(name)
+        return self
+
 
 def read_config():
     with open(os.environ.get("APP_CONFIG_PATH", "/config/config.yaml")) as stream:
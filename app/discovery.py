@@ -0,0 +1,144 @@
+"""Cached API discovery of the resource types served by the cluster.
+
+Lets the runner resolve checks of resource types that are not installed
+(e.g. Robin or VMRuntime on clusters without them) without sending the list
+request that would 404. Discovery results are cached for DISCOVERY_REFRESH_SECONDS
+and, when the CRD watch is running, dropped as soon as a CRD is added, changed
+or removed.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from kube_client import api_client
+from kubernetes import client, watch
+from kubernetes.client.exceptions import ApiException
+
+log = logging.getLogger("discovery")
+
+_WATCH_TIMEOUT_SECONDS = 300
+_WATCH_RETRY_SECONDS = 10
+
+
+class ApiDiscovery:
+    """Cache of the API groups, versions and resources served by the cluster"""
+
+    def __init__(
+        self,
+        refresh_seconds: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._groups: Optional[Dict[str, Set[str]]] = None
+        self._groups_fetched_at = 0.0
+        # (group, version) -> plural resource names, None if not served
+        self._resources: Dict[tuple[str, str], Optional[Set[str]]] = {}
+        self._stop = threading.Event()
+        self._watch_thread: Optional[threading.Thread] = None
+        self.crd_resource_version: Optional[str] = None
+
+    def has_resource(self, group: str, version: str, plural: str) -> bool:
+        """Returns whether the cluster serves group/version/plural"""
+        with self._lock:
+            if (
+                self._groups is None
+                or self._clock() - self._groups_fetched_at > self.refresh_seconds
+            ):
+                self._groups = self._fetch_groups()
+                self._groups_fetched_at = self._clock()
+                self._resources = {}
+
+            if version not in self._groups.get(group, ()):
+                return False
+
+            if (group, version) not in self._resources:
+                self._resources[(group, version)] = self._fetch_resources(
+                    group, version
+                )
+            resources = self._resources[(group, version)]
+        return resources is not None and plural in resources
+
+    def invalidate(self) -> None:
+        """Drops all cached discovery results"""
+        with self._lock:
+            self._groups = None
+            self._resources = {}
+
+    def _fetch_groups(self) -> Dict[str, Set[str]]:
+        groups = {"": {"v1"}}
+        for api_group in client.ApisApi(api_client()).get_api_versions().groups:
+            groups[api_group.name] = {version.version for version in api_group.versions}
+        return groups
+
+    def _fetch_resources(self, group: str, version: str) -> Optional[Set[str]]:
+        if group:
+            path = f"/apis/{group}/{version}"
+        else:
+            path = f"/api/{version}"
+        try:
+            resource_list = api_client().call_api(
+                path,
+                "GET",
+                response_type="V1APIResourceList",
+                auth_settings=["BearerToken"],
+                _return_http_data_only=True,
+            )
+        except ApiException as e:
+            # Group versions can disappear between fetching groups and resources
+            if e.status == 404:
+                return None
+            raise
+        # Subresources such as virtualmachines/status are not listable resources
+        return {
+            resource.name
+            for resource in resource_list.resources
+            if "/" not in resource.name
+        }
+
+    def start_crd_watch(self) -> None:
+        """Starts invalidating the cache on CRD changes in a background thread"""
+        self._watch_thread = threading.Thread(
+            target=self._watch_crds, name="discovery-crd-watch", daemon=True
+        )
+        self._watch_thread.start()
+
+    def stop_crd_watch(self) -> None:
+        self._stop.set()
+
+    def _watch_crds(self) -> None:
+        while not self._stop.is_set():
+            crd_api = client.ApiextensionsV1Api(api_client())
+            try:
+                if self.crd_resource_version is None:
+                    self.crd_resource_version = crd_api.list_custom_resource_definition(
+                        limit=1
+                    ).metadata.resource_version
+                for event in watch.Watch().stream(
+                    crd_api.list_custom_resource_definition,
+                    resource_version=self.crd_resource_version,
+                    timeout_seconds=_WATCH_TIMEOUT_SECONDS,
+                ):
+                    self.crd_resource_version = event[
+                        "object"
+                    ].metadata.resource_version
+                    log.debug(
+                        "CRD %s %s, invalidating API discovery cache",
+                        event["object"].metadata.name,
+                        event["type"].lower(),
+                    )
+                    self.invalidate()
+            except ApiException as e:
+                if e.status == 410:
+                    # resourceVersion too old, start over from a fresh list
+                    self.crd_resource_version = None
+                    self.invalidate()
+                    continue
+                log.warning("CRD watch failed: %s", e.reason)
+                self._stop.wait(_WATCH_RETRY_SECONDS)
+            except Exception:  # pylint: disable=broad-except
+                log.warning("CRD watch failed", exc_info=True)
+                self._stop.wait(_WATCH_RETRY_SECONDS)
@@ -0,0 +1,130 @@
+"""Kubernetes Events recorded on the HealthCheck resource.
+
+Like the event recorder of client-go, repeats of an event (same type, reason
+and message) are aggregated into the existing Event object by bumping its count
+and lastTimestamp instead of creating a new object, and a token bucket caps
+the rate of API calls, so that a flapping check updates a couple of Events
+rather than loading etcd with a stream of new ones. Repeats held back by the
+rate limit are still counted and reported with the next update.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from kube_client import api_client
+from kubernetes import client
+from kubernetes.client.exceptions import ApiException
+from rate_limit import TokenBucket
+
+log = logging.getLogger("events")
+
+NORMAL = "Normal"
+WARNING = "Warning"
+
+COMPONENT = "cluster-health-validator"
+_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+# Same defaults as the spam filter of client-go: bursts of 25 events, then one
+# every 5 minutes
+_DEFAULT_BURST = 25
+_DEFAULT_QPS = 1 / 300
+# Number of distinct events remembered for aggregation
+_CACHE_SIZE = 256
+
+
+@dataclass
+class _Aggregate:
+    name: str
+    count: int
+
+
+class EventRecorder:
+    """Records aggregated, rate limited Events on a single object"""
+
+    def __init__(
+        self,
+        involved_object: Dict[str, str],
+        namespace: str = "default",
+        rate_limiter: Optional[TokenBucket] = None,
+        clock=time.time,
+    ) -> None:
+        self.involved_object = involved_object
+        self.namespace = namespace
+        self.rate_limiter = rate_limiter or TokenBucket(
+            qps=float(os.environ.get("EVENTS_QPS", _DEFAULT_QPS)),
+            burst=int(os.environ.get("EVENTS_BURST", _DEFAULT_BURST)),
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._events: OrderedDict[Tuple[str, str, str], _Aggregate] = OrderedDict()
+
+    def _timestamp(self) -> str:
+        return datetime.fromtimestamp(self._clock(), timezone.utc).strftime(
+            _DATETIME_FORMAT
+        )
+
+    def record(self, event_type: str, reason: str, message: str) -> None:
+        """Records an event, failures are logged but not raised"""
+        key = (event_type, reason, message)
+        with self._lock:
+            aggregate = self._events.get(key)
+            if aggregate is not None:
+                aggregate.count += 1
+                self._events.move_to_end(key)
+            if not self.rate_limiter.try_acquire():
+                log.debug("Rate limited event %s: %s", reason, message)
+                return
+
+            core_v1_api = client.CoreV1Api(api_client())
+            try:
+                if aggregate is not None:
+                    try:
+                        core_v1_api.patch_namespaced_event(
+                            name=aggregate.name,
+                            namespace=self.namespace,
+                            body={
+                                "count": aggregate.count,
+                                "lastTimestamp": self._timestamp(),
+                            },
+                        )
+                        return
+                    except ApiException as e:
+                        # The Event expired, create a new one
+                        if e.status != 404:
+                            raise
+                        del self._events[key]
+                self._create(core_v1_api, key)
+            except ApiException as e:
+                log.warning("Failed to record event %s: %s", reason, e.reason)
+
+    def _create(self, core_v1_api: Any, key: Tuple[str, str, str]) -> None:
+        event_type, reason, message = key
+        timestamp = self._timestamp()
+        name = f"{self.involved_object['name']}.{time.time_ns():x}"
+        core_v1_api.create_namespaced_event(
+            namespace=self.namespace,
+            body={
+                "apiVersion": "v1",
+                "kind": "Event",
+                "metadata": {"name": name, "namespace": self.namespace},
+                "involvedObject": self.involved_object,
+                "type": event_type,
+                "reason": reason,
+                "message": message,
+                "count": 1,
+                "firstTimestamp": timestamp,
+                "lastTimestamp": timestamp,
+                "source": {"component": COMPONENT, "host": socket.gethostname()},
+                "reportingComponent": COMPONENT,
+                "reportingInstance": socket.gethostname(),
+            },
+        )
+        self._events[key] = _Aggregate(name=name, count=1)
+        while len(self._events) > _CACHE_SIZE:
+            self._events.popitem(last=False)
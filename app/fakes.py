@@ -0,0 +1,30 @@
+"""Fakes shared by the tests"""
+
+import io
+import json
+
+import urllib3
+
+
+class FakeClock:
+    """Clock returning now, which only moves when a test sets it or sleeps"""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def list_response(method, *args, **kwargs):
+    """Streams the return_value of a mocked list method, as the apiserver would"""
+    return urllib3.HTTPResponse(
+        body=io.BytesIO(json.dumps(method.return_value).encode()),
+        status=200,
+        preload_content=False,
+    )
@@ -0,0 +1,169 @@
+"""Runs health checks against a fleet of clusters from a single process.
+
+Clusters are kubeconfig contexts, checked concurrently on a bounded thread
+pool. Each cluster gets its own pooled ApiClient, bound to the thread checking
+it, so that the checks need no changes to talk to the right cluster, and a slow
+or broken cluster only throttles or trips the circuit breakers of its own client.
+"""
+
+import concurrent.futures
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import urllib3
+from kube_client import new_client, use_client
+from kubernetes import config
+
+log = logging.getLogger("fleet")
+
+
+@dataclass(frozen=True)
+class Cluster:
+    """A kubeconfig context to check, the current context if context is None"""
+
+    kubeconfig: Optional[str] = None
+    context: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        if self.context:
+            return self.context
+        return self.kubeconfig or "current-context"
+
+
+@dataclass
+class ClusterResult:
+    """Outcome of the health checks of a single cluster"""
+
+    cluster: str
+    healthy: bool
+    failed_checks: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    duration_seconds: float = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def resolve_clusters(
+    kubeconfigs: Iterable[Optional[str]],
+    contexts: Iterable[str],
+    all_contexts: bool = False,
+) -> List[Cluster]:
+    """Returns the clusters to check.
+    Args:
+        kubeconfigs: kubeconfig files, None for the default kubeconfig
+        contexts: contexts to check in every kubeconfig, the current context
+            if empty
+        all_contexts: check every context of every kubeconfig
+    """
+    contexts = list(contexts)
+    clusters = []
+    for kubeconfig in kubeconfigs:
+        if all_contexts:
+            available, _ = config.list_kube_config_contexts(config_file=kubeconfig)
+            names = [context["name"] for context in available]
+        else:
+            names = contexts or [None]
+        clusters.extend(Cluster(kubeconfig, name) for name in names)
+    return clusters
+
+
+def check_cluster(cluster: Cluster, checks: List[Any]) -> ClusterResult:
+    """Runs checks against a cluster, one after the other, until the apiserver
+    turns out to be unreachable"""
+    start = time.perf_counter()
+    try:
+        api = new_client(cluster.kubeconfig, cluster.context)
+    except Exception as e:  # pylint: disable=broad-except
+        return ClusterResult(
+            cluster=cluster.name,
+            healthy=False,
+            error=f"Failed to load kubeconfig: {e}",
+            duration_seconds=time.perf_counter() - start,
+        )
+
+    failed_checks = []
+    error = None
+    try:
+        with use_client(api):
+            for index, check in enumerate(checks):
+                name = check.__class__.__name__
+                try:
+                    healthy = check.is_healthy()
+                except urllib3.exceptions.HTTPError as e:
+                    # The apiserver cannot be reached, the other checks would
+                    # only wait for their retries to run out
+                    log.debug(
+                        "Check %s failed on %s", name, cluster.name, exc_info=True
+                    )
+                    error = f"Unreachable: {type(e).__name__}"
+                    failed_checks.extend(
+                        other.__class__.__name__ for other in checks[index:]
+                    )
+                    break
+                except Exception:  # pylint: disable=broad-except
+                    log.debug(
+                        "Check %s failed on %s", name, cluster.name, exc_info=True
+                    )
+                    healthy = False
+                if not healthy:
+                    failed_checks.append(name)
+    finally:
+        api.close()
+
+    return ClusterResult(
+        cluster=cluster.name,
+        healthy=not failed_checks,
+        failed_checks=failed_checks,
+        error=error,
+        duration_seconds=time.perf_counter() - start,
+    )
+
+
+def run_fleet(
+    clusters: List[Cluster],
+    checks: List[Any],
+    concurrency: int = 16,
+    on_result: Optional[Callable[[ClusterResult], None]] = None,
+) -> List[ClusterResult]:
+    """Checks clusters concurrently, calling on_result as each cluster completes.
+    Returns:
+        results in the order of clusters
+    """
+    results: List[Optional[ClusterResult]] = [None] * len(clusters)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(check_cluster, cluster, checks): index
+            for index, cluster in enumerate(clusters)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result:
+                on_result(result)
+    return results
+
+
+def summarize(results: List[ClusterResult]) -> Dict[str, Any]:
+    """Aggregates cluster results into a report"""
+    failures: Dict[str, int] = {}
+    for result in results:
+        for check in result.failed_checks:
+            failures[check] = failures.get(check, 0) + 1
+    return {
+        "clusters": len(results),
+        "healthy": sum(result.healthy for result in results),
+        "unhealthy": sum(not result.healthy for result in results),
+        "errors": sum(result.error is not None for result in results),
+        "failures_by_check": dict(sorted(failures.items())),
+        "results": [result.to_dict() for result in results],
+    }
+
+
+def write_report(path: str, report: Dict[str, Any]) -> None:
+    with open(path, "w") as stream:
+        json.dump(report, stream, indent=2)
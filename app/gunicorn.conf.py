@@ -0,0 +1,37 @@
+"""Gunicorn configuration, loaded by gunicorn from the working directory.
+
+Running more than one worker (GUNICORN_WORKERS) requires PROMETHEUS_MULTIPROC_DIR,
+so that all workers serve the same metrics.
+
+Each worker serves requests from a pool of GUNICORN_THREADS threads, so that a
+slow request, such as a /robin_metrics fetch waiting on robin-master, does not
+hold up /health probes and /metrics scrapes. The worker heartbeat runs on the
+main thread, so slow requests do not get the worker killed either.
+GUNICORN_WORKER_CLASS=sync restores one request at a time per worker.
+"""
+
+import glob
+import os
+
+bind = "0.0.0.0:8080"
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# Gunicorn turns sync workers with several threads into gthread workers
+threads = int(os.environ.get("GUNICORN_THREADS", 8 if worker_class == "gthread" else 1))
+
+
+def on_starting(server):
+    # Drop the metric files of a previous run
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    # Stop aggregating the live gauges of the exited worker
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,17 +1,33 @@
-"""Exposes HealthCheck CR on k8s for GDCC cluster health validator."""
+"""Exposes HealthCheck CR on k8s for GDCC cluster health validator.
 
+Besides the PlatformHealthy and WorkloadsHealthy conditions, the status holds a
+condition per check. All conditions are written with a single server-side apply
+of the status, under a stable field manager, and only when one of them changed
+or the heartbeat interval elapsed.
+"""
+
+import copy
+import os
 import time
 from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from os import path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
 
 import yaml
-from kubernetes import client, config
+from config import AGGREGATE_CONDITION_TYPES, condition_type
+from events import NORMAL, WARNING, EventRecorder
+from kube_client import api_client
+from kubernetes import client
 from kubernetes.client.exceptions import ApiException
+from tracing import tracer
 
 _CRD_FILE_PATH = path.join(path.dirname(__file__), "healthchecks.crd.yaml")
 _DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+_FIELD_MANAGER = "cluster-health-validator"
+_APPLY_PATCH = "application/apply-patch+yaml"
+# Conditions are applied at least this often, to refresh lastUpdateTime
+_HEARTBEAT_SECONDS = float(os.environ.get("HEALTHCHECK_HEARTBEAT_SECONDS", 300))
 
 
 class HealthCheck:
@@ -44,10 +60,33 @@ class HealthCheck:
         def to_dict(self) -> Dict[Any, Any]:
             return asdict(self)
 
-    def __init__(self):
-        config.load_config()
-        self.crd_api = client.ApiextensionsV1Api()
-        self.customobjects_api = client.CustomObjectsApi()
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        """Sets up the default HealthCheck resource.
+        Args:
+            state: state saved by a previous process with to_state(). When
+                given, its conditions are only shown until the first status
+                update, which reads the live resource, or recreates it if
+                missing, and starts from its conditions instead
+        """
+        self.crd_api = client.ApiextensionsV1Api(api_client())
+        self.customobjects_api = client.CustomObjectsApi(api_client())
+        self.events = EventRecorder(
+            {
+                "apiVersion": self.meta["apiVersion"],
+                "kind": self.kind,
+                "name": self.name,
+            }
+        )
+        # check name -> status of its last result
+        self.check_statuses: Dict[str, str] = {}
+        # condition type -> condition of each check, in configuration order
+        self.check_conditions: Dict[str, HealthCheck.HealthCheckCondition] = {}
+        # Conditions of the last apply, and when it was sent
+        self._applied: Optional[List[HealthCheck.HealthCheckCondition]] = None
+        self._applied_at = 0.0
+        # Conditions restored from a snapshot, possibly older than those of the
+        # live resource, e.g. written by another replica since
+        self._restored = state is not None
 
         date_time_now = datetime.now().strftime(_DATETIME_FORMAT)
         self.condition_platform = self.HealthCheckCondition(
@@ -67,6 +106,16 @@ class HealthCheck:
             lastUpdateTime=date_time_now,
         )
 
+        if state is not None:
+            self._load_conditions(state["conditions"])
+            self.check_statuses = dict(state["check_statuses"])
+            return
+
+        self.ensure_resource()
+
+    def ensure_resource(self):
+        """Installs the CRD and creates the default resource if missing, or
+        loads the conditions of the existing resource"""
         if not self.is_crd_installed():
             self.install_crd()
 
@@ -75,18 +124,25 @@ class HealthCheck:
         else:
             # Load the current conditions if present
             health_check_resource = self.get()
-            # ignore initializing if we cannot fetch two conditions
-            if (
-                "status" in health_check_resource
-                and "conditions" in health_check_resource["status"]
-                and len(health_check_resource["status"]["conditions"]) == 2
-            ):
-                self.condition_platform = self.HealthCheckCondition(
-                    **health_check_resource["status"]["conditions"][0]
-                )
-                self.condition_workloads = self.HealthCheckCondition(
-                    **health_check_resource["status"]["conditions"][1]
-                )
+            self._load_conditions(
+                health_check_resource.get("status", {}).get("conditions", [])
+            )
+
+    def _load_conditions(self, conditions: List[Dict[str, Any]]) -> None:
+        """Loads conditions, ignoring them unless both aggregate conditions are
+        present"""
+        by_type = {condition["type"]: condition for condition in conditions}
+        if not all(type_ in by_type for type_ in AGGREGATE_CONDITION_TYPES):
+            return
+        platform, workloads = (
+            by_type.pop(type_) for type_ in AGGREGATE_CONDITION_TYPES
+        )
+        self.condition_platform = self.HealthCheckCondition(**platform)
+        self.condition_workloads = self.HealthCheckCondition(**workloads)
+        self.check_conditions = {
+            type_: self.HealthCheckCondition(**condition)
+            for type_, condition in by_type.items()
+        }
 
     def install_crd(self):
         """Install custom resource definition."""
@@ -121,14 +177,6 @@ class HealthCheck:
     def create(self):
         """Create default healtcheck resource."""
         spec = {"spec": {"enabled": True}}
-        status = {
-            "status": {
-                "conditions": [
-                    self.condition_platform.to_dict(),
-                    self.condition_workloads.to_dict(),
-                ]
-            }
-        }
         self.customobjects_api.create_cluster_custom_object(
             group=self.group,
             version=self.version,
@@ -136,13 +184,7 @@ class HealthCheck:
             body=self.meta | spec,
         )
         time.sleep(2)  # adding a delay between create and update status
-        self.customobjects_api.patch_cluster_custom_object_status(
-            group=self.group,
-            version=self.version,
-            plural=self.plural,
-            name=self.name,
-            body=status,
-        )
+        self._apply_status()
 
     def get(self) -> Dict[str, Any]:
         """Get default healtcheck resource.
@@ -179,30 +221,128 @@ class HealthCheck:
         if previous_status != condition.status:
             condition.lastTransitionTime = date_time_now
 
+    def update_check_conditions(self, results: Iterable[Any]) -> None:
+        """Updates the condition of each check, dropping the conditions of
+        checks without a result. Unchanged conditions keep their lastUpdateTime.
+        Args:
+            results: latest CheckResult of every check
+        """
+        date_time_now = datetime.now().strftime(_DATETIME_FORMAT)
+        conditions = {}
+        for result in results:
+            type_ = condition_type(result.name)
+            condition = self.HealthCheckCondition(
+                type=type_,
+                status="True" if result.healthy else "False",
+                reason=f"HealthCheck{result.status}",
+                message=f"Health check {result.name} ({result.module}) is "
+                + result.status,
+                lastUpdateTime=date_time_now,
+                lastTransitionTime=date_time_now,
+            )
+            previous = self.check_conditions.get(type_)
+            if previous is not None and previous == condition:
+                condition = previous
+            elif previous is not None and previous.status == condition.status:
+                condition.lastTransitionTime = previous.lastTransitionTime
+            conditions[type_] = condition
+        self.check_conditions = conditions
+
+    def conditions(self) -> List[HealthCheckCondition]:
+        """Returns the aggregate conditions followed by those of the checks"""
+        return [
+            self.condition_platform,
+            self.condition_workloads,
+            *self.check_conditions.values(),
+        ]
+
     def update_status(
         self,
         failed_platform_checks: List[str],
         failed_workload_checks: List[str],
+        results: Optional[Iterable[Any]] = None,
     ) -> None:
-        """Updates default healthcheck resource status.
+        """Updates default healthcheck resource status. The status is not
+        written if no condition changed since it was last written, unless
+        HEALTHCHECK_HEARTBEAT_SECONDS elapsed.
         Args:
             failed_platform_checks: List of failed platform checks
             failed_workload_checks: List of failed workload checks
+            results: CheckResults of all checks, to update their conditions
         """
-        self.update_condition(self.condition_platform, failed_platform_checks)
-        self.update_condition(self.condition_workloads, failed_workload_checks)
-        patch = {
-            "status": {
-                "conditions": [
-                    self.condition_platform.to_dict(),
-                    self.condition_workloads.to_dict(),
-                ]
-            }
-        }
-        self.customobjects_api.patch_cluster_custom_object_status(
-            group=self.group,
-            version=self.version,
-            plural=self.plural,
-            name=self.name,
-            body=self.meta | patch,
+        if self._restored:
+            self.ensure_resource()
+            self._restored = False
+
+        def update_conditions() -> None:
+            self.update_condition(self.condition_platform, failed_platform_checks)
+            self.update_condition(self.condition_workloads, failed_workload_checks)
+            if results is not None:
+                self.update_check_conditions(results)
+
+        update_conditions()
+        if (
+            self._applied == self.conditions()
+            and time.monotonic() - self._applied_at < _HEARTBEAT_SECONDS
+        ):
+            return
+
+        with tracer.span("healthcheck.update_status", **{"k8s.name": self.name}):
+            try:
+                self._apply_status()
+            except ApiException as e:
+                # The resource was deleted since, or recreated by then with
+                # conditions of its own to start from
+                if e.status != 404:
+                    raise
+                self.ensure_resource()
+                update_conditions()
+                self._apply_status()
+
+    def _apply_status(self) -> None:
+        """Applies all conditions in a single server-side apply. Conditions
+        applied before but missing from the apply are removed."""
+        conditions = self.conditions()
+        self.customobjects_api.api_client.call_api(
+            f"/apis/{self.group}/{self.version}/{self.plural}/{self.name}/status",
+            "PATCH",
+            query_params=[("fieldManager", _FIELD_MANAGER), ("force", True)],
+            header_params={
+                "Accept": "application/json",
+                "Content-Type": _APPLY_PATCH,
+            },
+            body=self.meta
+            | {"status": {"conditions": [cond.to_dict() for cond in conditions]}},
+            response_type="object",
+            auth_settings=["BearerToken"],
+            _return_http_data_only=True,
         )
+        self._applied = copy.deepcopy(conditions)
+        self._applied_at = time.monotonic()
+
+    def to_state(self) -> Dict[str, Any]:
+        """Returns the state to restore with HealthCheck(state)"""
+        return {
+            "conditions": [condition.to_dict() for condition in self.conditions()],
+            "check_statuses": self.check_statuses,
+        }
+
+    def record_transitions(self, results: Iterable[Any]) -> None:
+        """Records an Event for every check whose status changed since its last
+        result, and for checks found unhealthy on their first result.
+        Args:
+            results: CheckResults of a run
+        """
+        for result in results:
+            previous_status = self.check_statuses.get(result.name)
+            self.check_statuses[result.name] = result.status
+            if result.status == previous_status:
+                continue
+            if previous_status is None and result.healthy:
+                continue
+
+            self.events.record(
+                NORMAL if result.healthy else WARNING,
+                f"HealthCheck{result.status}",
+                f"Health check {result.name} ({result.module}) is {result.status}",
+            )
@@ -0,0 +1,192 @@
+"""JSON decoding of Kubernetes API responses.
+
+Responses are decoded with orjson when it is installed, faster than the json
+module on large lists, and with the json module otherwise or when
+JSON_DECODER=json. With JSON_DECODE_PAUSE_GC=true, the cyclic garbage collector
+is also paused while decoding: decoded JSON has no reference cycles, yet the
+hundreds of thousands of containers of a large list trigger collections that
+rescan the whole heap, which took up to half of the decoding time. The pause is
+process-wide, other threads run without collections until the last concurrent
+decode ends, so it is off by default.
+
+List responses can also be decoded while they are received, with list_items():
+the items are yielded one at a time as soon as they are complete, so a check
+evaluates the first objects before the last ones arrive, and neither the whole
+body nor the whole decoded list is held at once. orjson has no incremental API,
+the items of a stream are decoded with the C scanner of the json module, which
+is slower on its own; but a check projecting each item as it arrives never
+holds the decoded list, and so never pays for collecting it.
+"""
+
+import codecs
+import contextlib
+import gc
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_USE_ORJSON = orjson is not None and os.environ.get("JSON_DECODER") != "json"
+_PAUSE_GC = os.environ.get("JSON_DECODE_PAUSE_GC", "false").lower() == "true"
+_CHUNK_BYTES = 64 * 1024
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_resume = False
+
+
+@contextlib.contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Disables the garbage collector until the last of concurrent pauses ends"""
+    global _gc_pauses, _gc_resume
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_resume = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_resume:
+                gc.enable()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decodes a JSON document
+    Raises:
+        ValueError: if data is not valid JSON
+    """
+    with _gc_paused() if _PAUSE_GC else contextlib.nullcontext():
+        if _USE_ORJSON:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # e.g. integers beyond 64 bits, which the json module accepts
+                pass
+        return json.loads(data)
+
+
+class ListStream:
+    """Items of a JSON list response, decoded from the chunks of its body as they
+    arrive. Iterating yields the items; the other top-level fields, such as
+    metadata, are in fields once iterated."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.fields: Dict[str, Any] = {}
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._done = False
+
+    def _more(self) -> bool:
+        """Appends the next chunk to the buffer, dropping the text consumed.
+        Returns:
+            False at the end of the body
+        """
+        if self._done:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._done = True
+        text = self._text.decode(chunk or b"", final=self._done)
+        self._buffer = self._buffer[self._position :] + text
+        self._position = 0
+        return not self._done or bool(text)
+
+    def _peek(self) -> str:
+        """Skips whitespace and returns the next character"""
+        while True:
+            self._position = _WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._more():
+                raise ValueError("Truncated JSON document")
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r}, got {char!r}")
+        self._position += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                # Incomplete until the end of the body
+                if self._more():
+                    continue
+                raise
+            # A number may go on in the next chunk
+            if end == len(self._buffer) and self._more():
+                continue
+            self._position = end
+            return value
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "items" and self._peek() == "[":
+                self._position += 1
+                if self._peek() == "]":
+                    self._position += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.fields[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def list_items(
+    list_method: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Iterator[Any]:
+    """Calls list_method of a generated API, e.g.
+    CustomObjectsApi.list_cluster_custom_object, and yields the items of the
+    list as they are decoded from the response body. The object count and size
+    of the list are recorded on the span of the API call once it is read to the
+    end.
+    Raises:
+        ApiException: if the list fails
+        ValueError: if the response is not a JSON object
+    """
+    response = list_method(*args, _preload_content=False, **kwargs)
+    received = 0
+
+    def chunks() -> Iterator[bytes]:
+        nonlocal received
+        for chunk in response.stream(_CHUNK_BYTES):
+            received += len(chunk)
+            yield chunk
+
+    count = 0
+    try:
+        for item in ListStream(chunks()):
+            count += 1
+            yield item
+        span = getattr(response, "trace_span", None)
+        if span is not None:
+            span.set_attribute("k8s.object_count", count)
+            span.set_attribute("http.response_bytes", received)
+    finally:
+        response.release_conn()
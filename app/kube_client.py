@@ -0,0 +1,216 @@
+"""Shared Kubernetes API client for the health checks and the HealthCheck CR.
+
+All checks share a single ApiClient, and with it a single urllib3 connection
+pool, instead of creating a new client on every call. The client records a
+tracing span for each API call, paces requests through the process-wide
+rate limiter, retries transient failures with jittered exponential backoff,
+fails fast while the circuit breaker of the request's API group is open, and
+decodes responses with json_decode.
+
+In fleet mode each cluster gets its own client, with its own connection pool,
+rate limiter and circuit breakers, which api_client() returns while bound to the
+current context with use_client().
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+import json_decode
+import urllib3
+from circuit_breaker import CircuitBreakers, api_group, circuit_breakers
+from kubernetes import client, config
+from kubernetes.client.exceptions import ApiException
+from rate_limit import TokenBucket, rate_limiter, retry_after_seconds, throttled_metric
+from tracing import current_span, tracer
+
+log = logging.getLogger("kube_client")
+
+_MAX_ATTEMPTS = int(os.environ.get("KUBE_API_MAX_ATTEMPTS", 3))
+_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("KUBE_API_TIMEOUT_SECONDS", 30))
+_BACKOFF_BASE_SECONDS = 0.5
+_BACKOFF_MAX_SECONDS = 5
+_TRANSIENT_STATUSES = {500, 502, 503, 504}
+# Creating an object twice is not idempotent, only retry throttled POSTs
+_RETRIED_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Exponential backoff with full jitter before retrying attempt + 1"""
+    ceiling = min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+def _is_watch(query_params: Any) -> bool:
+    return any(key == "watch" and value for key, value in query_params or [])
+
+
+class ApiClient(client.ApiClient):
+    """ApiClient recording a span per Kubernetes API call"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+        self.circuit_breakers = circuit_breakers
+
+    def call_api(self, resource_path, method, path_params=None, *args, **kwargs):
+        with tracer.span(f"k8s {method} {resource_path}") as span:
+            span.set_attribute("http.method", method)
+            for key, value in (path_params or {}).items():
+                span.set_attribute(f"k8s.{key}", value)
+
+            response = super().call_api(
+                resource_path, method, path_params, *args, **kwargs
+            )
+
+            data = response[0] if isinstance(response, tuple) else response
+            if isinstance(data, dict):
+                items = data.get("items")
+            else:
+                items = getattr(data, "items", None)
+            if isinstance(items, list):
+                span.set_attribute("k8s.object_count", len(items))
+            return response
+
+    def deserialize(self, response, response_type):
+        """Decodes responses with json_decode, and returns the decoded objects
+        of CustomObjectsApi as they are"""
+        if response_type == "file":
+            return super().deserialize(response, response_type)
+        try:
+            data = json_decode.loads(response.data)
+        except ValueError:
+            data = response.data
+        if response_type == "object":
+            return data
+        return self._ApiClient__deserialize(data, response_type)
+
+    def request(self, method, url, *args, **kwargs):
+        # Watches wait for events for as long as their timeoutSeconds, streamed
+        # lists keep the default timeout
+        if kwargs.get("_request_timeout") is None and not _is_watch(
+            kwargs.get("query_params")
+        ):
+            kwargs["_request_timeout"] = _REQUEST_TIMEOUT_SECONDS
+
+        span = current_span()
+        breaker = self.circuit_breakers.get(api_group(url))
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            breaker.before_request()
+            span.set_attribute(
+                "rate_limiter.wait_seconds", self.rate_limiter.acquire()
+            )
+            throttled = False
+            try:
+                response = super().request(method, url, *args, **kwargs)
+                breaker.record_success()
+                break
+            except ApiException as e:
+                if e.status == 429:
+                    # The apiserver is up, just busy
+                    breaker.record_success()
+                    throttled_metric.inc()
+                    throttled = True
+                elif e.status in _TRANSIENT_STATUSES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                    raise
+                if attempt == _MAX_ATTEMPTS or not (
+                    throttled or method in _RETRIED_METHODS
+                ):
+                    raise
+                reason = f"status {e.status}"
+                delay = retry_after_seconds(e.headers) if throttled else None
+            except urllib3.exceptions.HTTPError as e:
+                breaker.record_failure()
+                if attempt == _MAX_ATTEMPTS or method not in _RETRIED_METHODS:
+                    raise
+                reason = type(e).__name__
+                delay = None
+
+            if delay is None:
+                delay = backoff_seconds(attempt)
+            span.set_attribute("retries", attempt)
+            log.warning(
+                "Retrying %s %s in %.1fs after %s (attempt %d of %d)",
+                method,
+                url,
+                delay,
+                reason,
+                attempt + 1,
+                _MAX_ATTEMPTS,
+            )
+            if throttled:
+                # Hold back every request, not only this one
+                self.rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+        span.set_attribute("http.status_code", response.status)
+        if kwargs.get("_preload_content", True):
+            span.set_attribute("http.response_bytes", len(response.data))
+        else:
+            # Counted by the reader of the stream, see json_decode.list_items
+            response.trace_span = span
+        return response
+
+
+_lock = threading.Lock()
+_api_client: Optional[ApiClient] = None
+_bound_client: contextvars.ContextVar[Optional[ApiClient]] = contextvars.ContextVar(
+    "api_client", default=None
+)
+
+
+def api_client() -> ApiClient:
+    """Returns the client bound to the current context, otherwise the shared
+    ApiClient, created from the loaded kubeconfig on first use"""
+    global _api_client
+    bound = _bound_client.get()
+    if bound is not None:
+        return bound
+    with _lock:
+        if _api_client is None:
+            _api_client = ApiClient()
+        return _api_client
+
+
+def reset() -> None:
+    """Drops the shared ApiClient, e.g. after loading a different kubeconfig"""
+    global _api_client
+    with _lock:
+        _api_client = None
+
+
+def new_client(
+    config_file: Optional[str] = None,
+    context: Optional[str] = None,
+    pool_size: int = 4,
+) -> ApiClient:
+    """Creates a client for a kubeconfig context, with its own connection pool,
+    rate limiter and circuit breakers"""
+    configuration = client.Configuration()
+    config.load_kube_config(
+        config_file=config_file, context=context, client_configuration=configuration
+    )
+    configuration.connection_pool_maxsize = pool_size
+    api = ApiClient(configuration)
+    api.rate_limiter = TokenBucket.from_env()
+    api.circuit_breakers = CircuitBreakers.from_env()
+    return api
+
+
+@contextlib.contextmanager
+def use_client(api: ApiClient) -> Iterator[ApiClient]:
+    """Makes api_client() return api within the current context"""
+    token = _bound_client.set(api)
+    try:
+        yield api
+    finally:
+        _bound_client.reset(token)
@@ -0,0 +1,29 @@
+"""Prometheus metrics exposition.
+
+With several gunicorn workers, every worker holds its own copy of the metrics.
+When PROMETHEUS_MULTIPROC_DIR is set, prometheus_client writes the metrics of
+every worker to memory-mapped files in that directory, and /metrics aggregates
+the files of all workers, whichever worker serves the request. Gauges declare
+how their values are aggregated across workers through `multiprocess_mode`.
+"""
+
+import os
+
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def multiprocess_enabled() -> bool:
+    return bool(MULTIPROC_DIR)
+
+
+def generate_metrics() -> bytes:
+    """Returns the metrics of all workers in multiprocess mode, otherwise the
+    metrics of the default registry"""
+    if not multiprocess_enabled():
+        return generate_latest()
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
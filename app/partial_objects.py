@@ -0,0 +1,106 @@
+"""Lists of partial objects, for checks that only need a few fields of each object.
+
+The apiserver can return lists as PartialObjectMetadataList, with only the
+metadata of each object, or as Table, with only the printer columns of the
+resource. Both are much smaller to transfer and decode than full objects.
+Watches can likewise stream PartialObjectMetadata events, which still report
+every change, since each bumps metadata.resourceVersion.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from kube_client import api_client
+
+log = logging.getLogger("partial_objects")
+
+METADATA = "application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1"
+METADATA_LIST = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1"
+TABLE = "application/json;as=Table;g=meta.k8s.io;v=v1"
+
+
+def resource_path(
+    group: str, version: str, plural: str, namespace: Optional[str] = None
+) -> str:
+    """Returns the list path of a resource, cluster-wide unless namespace is set"""
+    if group:
+        path = f"/apis/{group}/{version}"
+    else:
+        path = f"/api/{version}"
+    if namespace:
+        path += f"/namespaces/{namespace}"
+    return f"{path}/{plural}"
+
+
+def _get(path: str, query_params: Sequence[Tuple[str, str]], accept: str) -> dict:
+    return api_client().call_api(
+        path,
+        "GET",
+        query_params=list(query_params),
+        header_params={"Accept": accept},
+        response_type="object",
+        auth_settings=["BearerToken"],
+        _return_http_data_only=True,
+    )
+
+
+def list_metadata(path: str, query_params: Sequence[Tuple[str, str]] = ()) -> dict:
+    """Lists objects with only their apiVersion, kind and metadata"""
+    return _get(path, query_params, METADATA_LIST)
+
+
+def watch_metadata(
+    path: str,
+    watch: bool = True,
+    resource_version: Optional[str] = None,
+    timeout_seconds: Optional[int] = None,
+    _preload_content: bool = False,
+) -> Any:
+    """Watches objects with only their apiVersion, kind and metadata, as the
+    list function of kubernetes.watch.Watch().stream(watch_metadata, path)"""
+    query_params: List[Tuple[str, Any]] = [("watch", watch)]
+    if resource_version is not None:
+        query_params.append(("resourceVersion", resource_version))
+    if timeout_seconds is not None:
+        query_params.append(("timeoutSeconds", timeout_seconds))
+    return api_client().call_api(
+        path,
+        "GET",
+        query_params=query_params,
+        header_params={"Accept": METADATA},
+        auth_settings=["BearerToken"],
+        _preload_content=_preload_content,
+        _return_http_data_only=True,
+    )
+
+
+def list_table(
+    path: str,
+    columns: Dict[str, str],
+    query_params: Sequence[Tuple[str, str]] = (),
+) -> Optional[List[dict]]:
+    """Lists objects as their metadata plus the status fields shown in printer columns.
+    Args:
+        path: list path of the resource
+        columns: printer column name by status field, e.g. {"phase": "Phase"}
+        query_params: additional query parameters such as selectors
+    Returns:
+        objects with metadata and the status fields of columns, None if the
+        resource does not print all of columns
+    """
+    table = _get(path, [*query_params, ("includeObject", "Metadata")], TABLE)
+
+    names = [column["name"] for column in table.get("columnDefinitions", [])]
+    missing = set(columns.values()) - set(names)
+    if missing:
+        log.debug("%s does not print %s", path, ", ".join(sorted(missing)))
+        return None
+
+    indexes = {field: names.index(column) for field, column in columns.items()}
+    return [
+        {
+            "metadata": row.get("object", {}).get("metadata", {}),
+            "status": {field: row["cells"][index] for field, index in indexes.items()},
+        }
+        for row in table.get("rows") or []
+    ]
@@ -0,0 +1,189 @@
+"""Field predicates over Kubernetes objects, compiled once into evaluators.
+
+A predicate compares the value at a field path of an object with a literal:
+
+    status.phase == Ready
+    status.conditions[type=Ready].status == True
+    status.state in [Running, Stopped]
+    status.progress >= 100
+    spec.replicas != 0
+    status.ready
+
+Path segments are separated by dots. A segment can select an element of a list
+by index (`items[0]`) or by the value of one of its fields (`[type=Ready]`).
+Supported operators are ==, !=, <, <=, >, >=, in and not in; a path without
+operator is short for `== True`, so that `status: "False"` of a condition, like
+any other value but true, does not match. Literals are numbers,
+quoted strings, bare words or [a, b] lists. Boolean-like values compare case
+insensitively, so `== True` matches both the string "True" of a condition and
+the boolean true. Values ending in % compare as numbers in ordering operators.
+"""
+
+import functools
+import operator
+import re
+from typing import Any, Callable, List, Optional
+
+_PREDICATE = re.compile(
+    r"^\s*(?P<path>(?:[^\s=!<>\[\]]|\[[^\]]*\])+)\s*"
+    r"(?:(?P<op>==|!=|<=|>=|<|>|not\s+in|in)\s*(?P<value>.+?))?\s*$"
+)
+_SEGMENT = re.compile(r"^(?P<field>[^\[\]]*)(?P<selectors>(?:\[[^\]]*\])*)$")
+_SELECTOR = re.compile(r"\[([^\]]*)\]")
+
+_MISSING = object()
+
+_ORDERING = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class PredicateError(ValueError):
+    """Raised for predicates that cannot be parsed"""
+
+
+def _parse_literal(text: str) -> Any:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    if text.startswith("[") and text.endswith("]"):
+        inner = text[1:-1].strip()
+        return [_parse_literal(item) for item in inner.split(",")] if inner else []
+    if text in ("null", "None"):
+        return None
+    for number in (int, float):
+        try:
+            return number(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower()
+    return value
+
+
+def _equal(actual: Any, expected: Any) -> bool:
+    if actual is _MISSING:
+        return expected is None
+    if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
+        if not isinstance(actual, bool) and not isinstance(expected, bool):
+            return actual == expected
+    return _canonical(actual) == _canonical(expected)
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.rstrip("%"))
+        except ValueError:
+            return None
+    return None
+
+
+def _compile_step(segment: str) -> List[Callable[[Any], Any]]:
+    match = _SEGMENT.match(segment)
+    if not match:
+        raise PredicateError(f"Invalid path segment: {segment}")
+
+    steps = []
+    field = match.group("field")
+    if field:
+        steps.append(
+            lambda obj, field=field: obj.get(field, _MISSING)
+            if isinstance(obj, dict)
+            else _MISSING
+        )
+
+    for selector in _SELECTOR.findall(match.group("selectors")):
+        if "=" in selector:
+            key, _, value = selector.partition("=")
+            key, value = key.strip(), _parse_literal(value)
+
+            def select(obj, key=key, value=value):
+                if not isinstance(obj, list):
+                    return _MISSING
+                for element in obj:
+                    if isinstance(element, dict) and _equal(
+                        element.get(key, _MISSING), value
+                    ):
+                        return element
+                return _MISSING
+
+            steps.append(select)
+        else:
+            try:
+                index = int(selector)
+            except ValueError:
+                raise PredicateError(f"Invalid selector: [{selector}]") from None
+            steps.append(
+                lambda obj, index=index: obj[index]
+                if isinstance(obj, list) and -len(obj) <= index < len(obj)
+                else _MISSING
+            )
+    return steps
+
+
+def compile_path(path: str) -> Callable[[Any], Any]:
+    """Compiles a field path into a function returning the value at the path,
+    or a sentinel when any segment is missing"""
+    steps = [step for segment in path.split(".") for step in _compile_step(segment)]
+
+    def get(obj: Any) -> Any:
+        for step in steps:
+            obj = step(obj)
+            if obj is _MISSING or obj is None:
+                return _MISSING
+        return obj
+
+    return get
+
+
+@functools.lru_cache(maxsize=None)
+def compile_predicate(expression: str) -> Callable[[Any], bool]:
+    """Compiles a predicate expression into a function evaluating it on an object.
+    Compiled predicates are cached, so each expression is only parsed once.
+    """
+    match = _PREDICATE.match(expression)
+    if not match:
+        raise PredicateError(f"Invalid predicate: {expression}")
+
+    get = compile_path(match.group("path"))
+    op = match.group("op")
+    if op is None:
+        return lambda obj: _equal(get(obj), True)
+
+    op = " ".join(op.split())
+    expected = _parse_literal(match.group("value"))
+
+    if op == "==":
+        return lambda obj: _equal(get(obj), expected)
+    if op == "!=":
+        return lambda obj: not _equal(get(obj), expected)
+    if op in ("in", "not in"):
+        if not isinstance(expected, list):
+            raise PredicateError(f"Expected a [list] after '{op}': {expression}")
+        negate = op == "not in"
+        return lambda obj: negate != any(_equal(get(obj), e) for e in expected)
+
+    compare = _ORDERING[op]
+    expected_number = _number(expected)
+    if expected_number is None:
+        raise PredicateError(f"Expected a number after '{op}': {expression}")
+
+    def ordered(obj: Any) -> bool:
+        actual = _number(get(obj))
+        return actual is not None and compare(actual, expected_number)
+
+    return ordered
@@ -0,0 +1,228 @@
+"""Opt-in profiling of health check cycles.
+
+A CycleProfiler is armed for a number of cycles. While armed, each cycle is
+recorded with cProfile, a statistical stack sampler and tracemalloc, and the
+wall and CPU time of every check is measured. The artifacts of each cycle are
+written to their own directory:
+
+    profile.pstats     cProfile stats, e.g. `python3 -m pstats profile.pstats`
+    profile.collapsed  sampled stacks in collapsed format for flamegraph.pl or
+                       speedscope
+    tracemalloc.txt    top allocation sites
+    checks.json        wall and CPU seconds per check
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+log = logging.getLogger("profiling")
+
+# Before Python 3.12 cProfile hooks only the thread that enabled it, so checks
+# running on the thread pool are profiled individually and merged. From 3.12 on
+# cProfile uses sys.monitoring, which covers all threads but allows a single
+# active profiler.
+_PER_THREAD_CPROFILE = sys.version_info < (3, 12)
+
+_DATETIME_FORMAT = "%Y%m%dT%H%M%S"
+
+
+class StackSampler:
+    """Samples the stacks of all threads at a fixed interval"""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path: str) -> None:
+        """Writes the samples in collapsed stack format"""
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _CycleRecording:
+    """Profiling data collected during a single cycle"""
+
+    def __init__(self, number: int, sample_interval: float) -> None:
+        self.number = number
+        self.started = datetime.now()
+        self.sampler = StackSampler(sample_interval)
+        self.profiles: List[cProfile.Profile] = []
+        self.checks: Dict[str, Dict[str, float]] = {}
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.sampler.start()
+        if not _PER_THREAD_CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> None:
+        if self._profile:
+            self._profile.disable()
+            self.profiles.append(self._profile)
+        self.sampler.stop()
+        self.snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    @contextmanager
+    def check(self, name: str) -> Iterator[None]:
+        profile = None
+        if _PER_THREAD_CPROFILE:
+            profile = cProfile.Profile()
+            profile.enable()
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            if profile:
+                profile.disable()
+            with self._lock:
+                self.checks[name] = {"wall_seconds": wall, "cpu_seconds": cpu}
+                if profile:
+                    self.profiles.append(profile)
+
+    def write(self, output_dir: str, top_allocations: int) -> str:
+        path = os.path.join(
+            output_dir,
+            f"cycle-{self.number}-{self.started.strftime(_DATETIME_FORMAT)}",
+        )
+        os.makedirs(path, exist_ok=True)
+
+        if self.profiles:
+            stats = pstats.Stats(self.profiles[0])
+            for profile in self.profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(path, "profile.pstats"))
+
+        self.sampler.write(os.path.join(path, "profile.collapsed"))
+
+        with open(os.path.join(path, "tracemalloc.txt"), "w") as f:
+            for stat in self.snapshot.statistics("lineno")[:top_allocations]:
+                f.write(f"{stat}\n")
+
+        with open(os.path.join(path, "checks.json"), "w") as f:
+            json.dump(self.checks, f, indent=2, sort_keys=True)
+
+        return path
+
+
+class CycleProfiler:
+    """Profiles the next N check cycles once armed"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        sample_interval: float = 0.01,
+        top_allocations: int = 25,
+    ) -> None:
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.top_allocations = top_allocations
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._cycles = 0
+        self._current: Optional[_CycleRecording] = None
+
+    def arm(self, cycles: int) -> None:
+        """Profiles the next cycles check cycles"""
+        with self._lock:
+            self._remaining = cycles
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    @contextmanager
+    def cycle(self) -> Iterator[None]:
+        """Profiles the enclosed check cycle if the profiler is armed"""
+        with self._lock:
+            recording = None
+            if self._remaining > 0 and self._current is None:
+                self._remaining -= 1
+                self._cycles += 1
+                recording = _CycleRecording(self._cycles, self.sample_interval)
+                self._current = recording
+
+        if recording is None:
+            yield
+            return
+
+        recording.start()
+        try:
+            yield
+        finally:
+            recording.stop()
+            with self._lock:
+                self._current = None
+            path = recording.write(self.output_dir, self.top_allocations)
+            log.info("Wrote profile of check cycle to %s", path)
+
+    @contextmanager
+    def check(self, name: str) -> Iterator[None]:
+        """Measures the enclosed check if the current cycle is profiled"""
+        recording = self._current
+        if recording is None:
+            yield
+            return
+        with recording.check(name):
+            yield
+
+    def artifacts(self) -> List[str]:
+        """Returns the paths of all profile artifacts relative to output_dir"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.output_dir)
+            for root, _, names in os.walk(self.output_dir)
+            for name in names
+        )
@@ -0,0 +1,166 @@
+"""Compact projections of Kubernetes objects.
+
+A decoded object is a tree of dicts that holds every field the apiserver
+returned, managedFields and annotations included, although a check reads only a
+handful of them. A Projection keeps only the fields it is given, in the
+__slots__ of a class generated for those fields, with repeated string values
+interned. Projected objects are read like the dicts they came from, with
+get() and [], so checks work on either.
+"""
+
+import functools
+import sys
+from typing import Any, Dict, Iterable, Tuple, Union
+
+_MISSING = object()
+
+# Field name -> slot name of a leaf, or the subtree of a nested field
+_Tree = Dict[str, Union[str, "_Subtree"]]
+
+
+class _Subtree(dict):
+    """Fields of a nested dict, and the slot recording whether an object had
+    that dict"""
+
+    __slots__ = ("slot",)
+
+
+class _Node:
+    """Read access to a subtree of a projected object"""
+
+    __slots__ = ()
+
+    def _record(self) -> "Record":
+        raise NotImplementedError
+
+    def _tree(self) -> _Tree:
+        raise NotImplementedError
+
+    def _value(self, node: Union[str, _Tree]) -> Any:
+        if isinstance(node, str):
+            return getattr(self._record(), node)
+        if not getattr(self._record(), node.slot):
+            return _MISSING
+        return _View(self._record(), node)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        node = self._tree().get(key)
+        if node is None:
+            return default
+        value = self._value(node)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the projected fields as nested dicts"""
+        result = {}
+        for key, node in self._tree().items():
+            value = self._value(node)
+            if value is not _MISSING:
+                result[key] = value.to_dict() if isinstance(value, _View) else value
+        return result
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+
+class _View(_Node):
+    __slots__ = ("_of", "_subtree")
+
+    def __init__(self, record: "Record", subtree: _Tree) -> None:
+        self._of = record
+        self._subtree = subtree
+
+    def _record(self) -> "Record":
+        return self._of
+
+    def _tree(self) -> _Tree:
+        return self._subtree
+
+
+class Record(_Node):
+    """Base class of projected objects, generated by Projection"""
+
+    __slots__ = ()
+    _fields: _Tree = {}
+
+    def _record(self) -> "Record":
+        return self
+
+    def _tree(self) -> _Tree:
+        return self._fields
+
+
+class Projection:
+    """Projects objects onto a set of fields.
+    Args:
+        fields: dotted paths of the fields to keep, e.g. "status.phase". A field
+            whose value is a dict or list is kept whole
+    """
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        paths = sorted({tuple(field.split(".")) for field in fields})
+        tree = _Subtree()
+        self._paths: Tuple[Tuple[str, ...], ...] = ()
+        # Paths of the nested dicts, whose presence is recorded on their own,
+        # so that e.g. status reads as {} rather than None when an object has
+        # a status without any of the projected fields
+        self._dict_paths: Tuple[Tuple[str, ...], ...] = ()
+        for path in paths:
+            node = tree
+            for depth, key in enumerate(path[:-1]):
+                if key not in node:
+                    node[key] = _Subtree()
+                    node[key].slot = f"_d{len(self._dict_paths)}"
+                    self._dict_paths += (path[: depth + 1],)
+                node = node[key]
+                if isinstance(node, str):
+                    # A parent field is kept whole
+                    break
+            else:
+                node[path[-1]] = f"_{len(self._paths)}"
+                self._paths += (path,)
+
+        self.fields = tuple(".".join(path) for path in self._paths)
+        self._slots = tuple(f"_{index}" for index in range(len(self._paths)))
+        self._dict_slots = tuple(
+            f"_d{index}" for index in range(len(self._dict_paths))
+        )
+        self.record_class = type(
+            "Record",
+            (Record,),
+            {"__slots__": self._slots + self._dict_slots, "_fields": tree},
+        )
+
+    def __call__(self, obj: Dict[str, Any]) -> Record:
+        record = self.record_class()
+        for slot, path in zip(self._slots, self._paths):
+            value = obj
+            for key in path:
+                if not isinstance(value, dict):
+                    value = _MISSING
+                    break
+                value = value.get(key, _MISSING)
+            if isinstance(value, str):
+                value = sys.intern(value)
+            setattr(record, slot, value)
+        for slot, path in zip(self._dict_slots, self._dict_paths):
+            value = obj
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            setattr(record, slot, isinstance(value, dict))
+        return record
+
+
+@functools.lru_cache(maxsize=None)
+def projection(fields: Tuple[str, ...]) -> Projection:
+    """Returns the shared Projection of fields"""
+    return Projection(fields)
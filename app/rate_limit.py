@@ -0,0 +1,137 @@
+"""Process-wide client-side rate limiting of Kubernetes API calls.
+
+Every request made through the shared ApiClient takes a token from a single
+token bucket, so that the checks running concurrently on the thread pool
+cannot burst the apiserver beyond KUBE_API_BURST requests, or sustain more
+than KUBE_API_QPS requests per second.
+"""
+
+import email.utils
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Mapping, Optional
+
+from prometheus_client import Counter, Histogram
+
+_DEFAULT_QPS = 5
+_DEFAULT_BURST = 10
+_DEFAULT_RETRY_AFTER_SECONDS = 1
+
+rate_limiter_wait_metric = Histogram(
+    "kubernetes_client_rate_limiter_wait_seconds",
+    "Time Kubernetes API requests waited on the client-side rate limiter",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+throttled_metric = Counter(
+    "kubernetes_client_throttled_requests",
+    "Kubernetes API requests rejected by the apiserver with 429 Too Many Requests",
+)
+
+
+class TokenBucket:
+    """Token bucket refilled at qps tokens per second, holding up to burst tokens.
+
+    Implemented as a generic cell rate algorithm: instead of counting tokens,
+    the bucket tracks the time at which it will be full again.
+    """
+
+    def __init__(
+        self,
+        qps: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.qps = qps
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._full_at = 0.0
+        self._paused_until = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.qps > 0
+
+    def reserve(self) -> float:
+        """Takes a token.
+        Returns:
+            seconds to wait before the token may be used
+        """
+        if not self.enabled:
+            return 0.0
+
+        interval = 1 / self.qps
+        with self._lock:
+            now = self._clock()
+            allowed_at = max(
+                now, self._full_at - (self.burst - 1) * interval, self._paused_until
+            )
+            self._full_at = max(self._full_at, allowed_at) + interval
+        wait = allowed_at - now
+        # Ignore floating point residue from summing intervals
+        return wait if wait > 1e-6 else 0.0
+
+    def try_acquire(self) -> bool:
+        """Takes a token only if one is available right away.
+        Returns:
+            whether a token was taken
+        """
+        if not self.enabled:
+            return True
+
+        interval = 1 / self.qps
+        with self._lock:
+            now = self._clock()
+            allowed_at = max(
+                now, self._full_at - (self.burst - 1) * interval, self._paused_until
+            )
+            if allowed_at - now > 1e-6:
+                return False
+            self._full_at = max(self._full_at, allowed_at) + interval
+        return True
+
+    def acquire(self) -> float:
+        """Blocks until a token is available.
+        Returns:
+            seconds waited
+        """
+        wait = self.reserve()
+        if wait > 0:
+            self._sleep(wait)
+        rate_limiter_wait_metric.observe(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Holds back all requests for seconds, e.g. as asked by Retry-After"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    @classmethod
+    def from_env(cls) -> "TokenBucket":
+        return cls(
+            qps=float(os.environ.get("KUBE_API_QPS", _DEFAULT_QPS)),
+            burst=int(os.environ.get("KUBE_API_BURST", _DEFAULT_BURST)),
+        )
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> float:
+    """Parses the Retry-After header of a 429 response, in seconds or as HTTP date"""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return _DEFAULT_RETRY_AFTER_SECONDS
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return _DEFAULT_RETRY_AFTER_SECONDS
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+rate_limiter = TokenBucket.from_env()
@@ -0,0 +1,132 @@
+"""Registry of available health checks shared by the service and the CLI.
+
+Check modules are imported lazily, the first time a check is looked up, so
+only the checks referenced by the configuration (or command line) are loaded.
+Besides the built-in checks, third-party packages can provide checks through
+the `cluster_health_validator.checks` entry point group, e.g.
+
+    [project.entry-points."cluster_health_validator.checks"]
+    CheckMyOperator = "my_package.checks:CheckMyOperator"
+"""
+
+import importlib
+import logging
+import threading
+from collections.abc import Mapping
+from importlib.metadata import EntryPoint, entry_points
+from typing import Any, Dict, Iterator, Optional
+
+log = logging.getLogger("registry")
+
+ENTRY_POINT_GROUP = "cluster_health_validator.checks"
+
+# check name -> "module:attribute" of the built-in checks
+_BUILTIN_CHECKS = {
+    "CheckGoogleGroupRBAC": "check_google_group_rbac:CheckGoogleGroupRBAC",
+    "CheckNodes": "check_nodes:CheckNodes",
+    "CheckRobinCluster": "check_robin_cluster:CheckRobinCluster",
+    "CheckRootSyncs": "check_root_syncs:CheckRootSyncs",
+    "CheckVMRuntime": "check_vmruntime:CheckVMRuntime",
+    "CheckDataVolumes": "check_data_volumes:CheckDataVolumes",
+    "CheckVirtualMachines": "check_virtual_machines:CheckVirtualMachines",
+    "CheckResource": "check_resource:CheckResource",
+}
+
+
+def _load(source: Any) -> Any:
+    """Resolves a registered check source into the check class"""
+    if isinstance(source, EntryPoint):
+        return source.load()
+    if isinstance(source, str):
+        module_name, _, attribute = source.partition(":")
+        return getattr(importlib.import_module(module_name), attribute)
+    return source
+
+
+class CheckRegistry(Mapping):
+    """Case-insensitive mapping of check names to lazily imported check classes"""
+
+    def __init__(self, builtins: Optional[Dict[str, str]] = None) -> None:
+        self._lock = threading.Lock()
+        # lowercase name -> (canonical name, check class or reference or entry point)
+        self._sources: Dict[str, tuple[str, Any]] = {}
+        self._classes: Dict[str, Any] = {}
+        self._entry_points_loaded = False
+
+        for name, reference in (builtins or _BUILTIN_CHECKS).items():
+            self.register(name, reference)
+
+    def register(self, name: str, check: Any) -> None:
+        """Registers a check.
+        Args:
+            name: check name used in the configuration
+            check: check class, or a "module:attribute" reference to import lazily
+        """
+        with self._lock:
+            self._sources[name.lower()] = (name, check)
+            self._classes.pop(name.lower(), None)
+
+    def canonical_name(self, name: str) -> str:
+        """Returns the registered spelling of a check name"""
+        return self._lookup(name)[0]
+
+    def __getitem__(self, name: str) -> Any:
+        key = name.lower()
+        with self._lock:
+            if key in self._classes:
+                return self._classes[key]
+        _, source = self._lookup(name)
+        check_class = _load(source)
+        with self._lock:
+            self._classes[key] = check_class
+        return check_class
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        try:
+            self._lookup(name)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        self._load_entry_points()
+        with self._lock:
+            return iter([name for name, _ in self._sources.values()])
+
+    def __len__(self) -> int:
+        self._load_entry_points()
+        return len(self._sources)
+
+    def _lookup(self, name: str) -> tuple[str, Any]:
+        key = name.lower()
+        if key not in self._sources:
+            # Entry points are only scanned for names that are not built in
+            self._load_entry_points()
+        try:
+            return self._sources[key]
+        except KeyError:
+            raise KeyError(name) from None
+
+    def _load_entry_points(self) -> None:
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            if entry_point.name.lower() in self._sources:
+                log.warning(
+                    "Ignoring check %s from %s, a check with this name is already registered",
+                    entry_point.name,
+                    entry_point.value,
+                )
+                continue
+            with self._lock:
+                self._sources[entry_point.name.lower()] = (
+                    entry_point.name,
+                    entry_point,
+                )
+
+
+health_check_registry = CheckRegistry()
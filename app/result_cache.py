@@ -0,0 +1,116 @@
+"""On-disk cache of passing check results, for back-to-back CLI invocations.
+
+Results are keyed by cluster (the apiserver URL) and check (its module and
+parameters), one small JSON file per key, and reused for the TTL configured for
+the check. Only passing results are cached: a failing check runs again on the
+next invocation or --wait loop.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+log = logging.getLogger("result_cache")
+
+DEFAULT_DIRECTORY = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "cluster-health-validator",
+)
+
+
+def parse_ttls(values: Iterable[str]) -> Tuple[float, Dict[str, float]]:
+    """Parses [check=]seconds values.
+    Returns:
+        TTL of checks without their own, and TTLs by lowercase check name
+    Raises:
+        ValueError: if a value is not a number of seconds
+    """
+    default_ttl = 0.0
+    ttls = {}
+    for value in values:
+        name, _, seconds = value.rpartition("=")
+        if name:
+            ttls[name.lower()] = float(seconds)
+        else:
+            default_ttl = float(seconds)
+    return default_ttl, ttls
+
+
+def check_key(check: Any) -> Tuple[str, str]:
+    """Returns the name and parameters identifying a check instance"""
+    params = getattr(check, "params", None)
+    return (
+        check.__class__.__name__.lower(),
+        params.model_dump_json() if params is not None else "",
+    )
+
+
+class ResultCache:
+    """Passing results of checks on a cluster"""
+
+    def __init__(
+        self,
+        cluster: str,
+        default_ttl: float = 0,
+        ttls: Optional[Dict[str, float]] = None,
+        directory: str = DEFAULT_DIRECTORY,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.cluster = cluster
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.directory = directory
+        self._clock = clock
+
+    def _path(self, check: Any) -> str:
+        key = json.dumps([self.cluster, *check_key(check)])
+        return os.path.join(
+            self.directory, hashlib.sha256(key.encode()).hexdigest() + ".json"
+        )
+
+    def ttl(self, check: Any) -> float:
+        return self.ttls.get(check_key(check)[0], self.default_ttl)
+
+    def passed(self, check: Any) -> bool:
+        """Returns whether check passed within its TTL"""
+        ttl = self.ttl(check)
+        if ttl <= 0:
+            return False
+        try:
+            with open(self._path(check)) as stream:
+                checked_at = json.load(stream)["checked_at"]
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError):
+            log.debug("Ignoring unreadable cached result", exc_info=True)
+            return False
+        return self._clock() - checked_at < ttl
+
+    def record(self, check: Any, healthy: bool) -> None:
+        """Caches a passing result of check, drops the cached result otherwise"""
+        if self.ttl(check) <= 0:
+            return
+        path = self._path(check)
+        try:
+            if not healthy:
+                if os.path.exists(path):
+                    os.unlink(path)
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".result-")
+            with os.fdopen(fd, "w") as stream:
+                json.dump(
+                    {
+                        "cluster": self.cluster,
+                        "check": check_key(check)[0],
+                        "checked_at": self._clock(),
+                    },
+                    stream,
+                )
+            os.replace(tmp_path, path)
+        except OSError:
+            log.warning("Failed to cache result in %s", self.directory, exc_info=True)
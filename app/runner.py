@@ -0,0 +1,451 @@
+"""Runs the configured platform and workload health checks."""
+
+import concurrent.futures
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from change_watch import ChangeWatches
+from circuit_breaker import CircuitOpenError
+from config import read_config
+from discovery import ApiDiscovery
+from kubernetes.client.exceptions import ApiException
+from profiling import CycleProfiler
+from single_flight import SingleFlight
+from tracing import tracer
+
+log = logging.getLogger("runner")
+
+PLATFORM = "platform"
+WORKLOAD = "workload"
+
+PASSED = "Passed"
+FAILED = "Failed"
+NOT_APPLICABLE = "NotApplicable"
+# Skipped because a check it depends on did not pass
+BLOCKED = "Blocked"
+
+_ALL_CHECKS = "__all__"
+
+
+class UnknownCheckError(KeyError):
+    """Raised when a requested check is not present in the configuration"""
+
+
+@dataclass
+class CheckResult:
+    """Outcome of a single health check run"""
+
+    name: str
+    module: str
+    category: str
+    status: str
+    checked_at: float
+
+    @property
+    def healthy(self) -> bool:
+        return self.status not in (FAILED, BLOCKED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self) | {"healthy": self.healthy}
+
+
+@dataclass
+class CycleResult:
+    """Outcome of a run of one or more health checks"""
+
+    results: List[CheckResult]
+    cached: bool = False
+
+    def failed(self, category: str) -> List[str]:
+        return [
+            result.module
+            for result in self.results
+            if result.category == category and not result.healthy
+        ]
+
+    @property
+    def platform_checks_failed(self) -> List[str]:
+        return self.failed(PLATFORM)
+
+    @property
+    def workload_checks_failed(self) -> List[str]:
+        return self.failed(WORKLOAD)
+
+    @property
+    def healthy(self) -> bool:
+        return all(result.healthy for result in self.results)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "cached": self.cached,
+            "platform_checks_failed": self.platform_checks_failed,
+            "workload_checks_failed": self.workload_checks_failed,
+            "results": [result.to_dict() for result in self.results],
+        }
+
+
+class CheckRunner:
+    """Runs health checks from the app config on a thread pool.
+
+    Concurrent runs of the same target collapse onto the in-flight run, and the
+    most recent result of every check is kept so that callers tolerating stale
+    data can be answered without querying the apiserver. Checks configured with
+    a cache_ttl reuse their result until it expires, or until a change to their
+    resource types invalidates it if invalidate_on_change is set.
+    """
+
+    def __init__(
+        self,
+        health_check_map: Mapping[str, Callable[..., Any]],
+        max_workers: int = 10,
+        on_cycle_complete: Optional[Callable[[CycleResult], None]] = None,
+        profiler: Optional[CycleProfiler] = None,
+        discovery: Optional[ApiDiscovery] = None,
+        change_watches: Optional[ChangeWatches] = None,
+    ) -> None:
+        self.health_check_map = health_check_map
+        self.max_workers = max_workers
+        self.on_cycle_complete = on_cycle_complete
+        self.profiler = profiler
+        self.discovery = discovery
+        self.change_watches = change_watches
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._results: Dict[str, CheckResult] = {}
+        # Checks whose cached result must not be reused
+        self._invalidated: Set[str] = set()
+        # Check name -> resource types watched for changes
+        self._watched: Dict[str, tuple] = {}
+
+    def run(self, check_name: Optional[str] = None, max_age: float = 0) -> CycleResult:
+        """Runs all configured checks, or only the named one.
+        Args:
+            check_name: name or module of a configured check, None for all checks
+            max_age: seconds a cached result stays fresh enough to be returned
+        Returns:
+            results of the run
+        """
+        app_config = read_config()
+        entries = self._select(app_config, check_name)
+        dependencies = app_config.dependencies()
+
+        cached = self._cached(entries, max_age)
+        if cached is not None:
+            return cached
+
+        if check_name is None:
+            return self._flight.do(
+                _ALL_CHECKS, lambda: self._run_cycle(entries, dependencies)
+            )
+
+        # A full run in flight already covers the requested check
+        name = entries[0][1]["name"]
+        cycle = self._flight.wait(_ALL_CHECKS)
+        if cycle is not None:
+            return CycleResult(
+                [result for result in cycle.results if result.name == name]
+            )
+
+        # Keyed by name, as the check may be requested by name or by module
+        return self._flight.do(name, lambda: self._execute(entries, dependencies))
+
+    def last_results(self) -> List[CheckResult]:
+        """Returns the most recent result of every check run so far"""
+        with self._lock:
+            return list(self._results.values())
+
+    def invalidate(self, check_name: str) -> None:
+        """Runs the named check on its next run even if its result is within
+        its cache_ttl"""
+        with self._lock:
+            self._invalidated.add(check_name)
+
+    def restore(self, results: List[CheckResult]) -> None:
+        """Restores results of a previous process, e.g. from a snapshot"""
+        with self._lock:
+            for result in results:
+                self._results.setdefault(result.name, result)
+
+    def _select(self, app_config, check_name: Optional[str]) -> List[Tuple[str, dict]]:
+        entries = [(PLATFORM, check) for check in app_config.platform_checks] + [
+            (WORKLOAD, check) for check in app_config.workload_checks
+        ]
+        if check_name is None:
+            return entries
+
+        for category, check in entries:
+            if check_name in (check["name"], check["module"]):
+                return [(category, check)]
+        raise UnknownCheckError(check_name)
+
+    def _cached(
+        self, entries: List[Tuple[str, dict]], max_age: float
+    ) -> Optional[CycleResult]:
+        if max_age <= 0:
+            return None
+
+        oldest = time.time() - max_age
+        results = []
+        with self._lock:
+            for _, check in entries:
+                result = self._results.get(check["name"])
+                if result is None or result.checked_at < oldest:
+                    return None
+                results.append(result)
+        return CycleResult(results, cached=True)
+
+    def _run_cycle(
+        self, entries: List[Tuple[str, dict]], dependencies: Dict[str, Set[str]]
+    ) -> CycleResult:
+        profile = self.profiler.cycle() if self.profiler else contextlib.nullcontext()
+        with tracer.span("check_cycle", checks=len(entries)) as span:
+            with profile:
+                cycle = self._execute(entries, dependencies)
+            span.set_attribute("healthy", cycle.healthy)
+            self._prune(entries)
+
+            if self.on_cycle_complete:
+                try:
+                    with tracer.span("publish_results"):
+                        self.on_cycle_complete(cycle)
+                except Exception:  # pylint: disable=broad-except
+                    log.error("Failed to publish health check results", exc_info=True)
+        return cycle
+
+    def _prune(self, entries: List[Tuple[str, dict]]) -> None:
+        """Drops the results of checks removed from, or renamed in, the
+        configuration"""
+        names = {check["name"] for _, check in entries}
+        with self._lock:
+            for name in self._results.keys() - names:
+                del self._results[name]
+            self._invalidated &= names
+
+    def _reusable(
+        self, check: dict, dependencies_changed: bool
+    ) -> Optional[CheckResult]:
+        """Returns the result of check if it passed within its cache_ttl and
+        the results of its dependencies did not change since, otherwise marks
+        it as about to be refreshed"""
+        ttl = check.get("cache_ttl", 0)
+        if ttl <= 0:
+            return None
+        with self._lock:
+            result = self._results.get(check["name"])
+            if (
+                result is not None
+                and result.status in (PASSED, NOT_APPLICABLE)
+                and not dependencies_changed
+                and check["name"] not in self._invalidated
+                and time.time() - result.checked_at < ttl
+            ):
+                return result
+            # Invalidations arriving from now on apply to the new result
+            self._invalidated.discard(check["name"])
+        return None
+
+    def _watch_changes(self, check: dict, instance: Any) -> None:
+        if (
+            self.change_watches is None
+            or not check.get("invalidate_on_change")
+            or check.get("cache_ttl", 0) <= 0
+        ):
+            return
+        name = check["name"]
+        resources = tuple(getattr(instance, "api_resources", ()))
+        if self._watched.get(name) == resources:
+            return
+        self._watched[name] = resources
+        self.change_watches.subscribe(name, resources, lambda: self.invalidate(name))
+
+    def _build(self, check: dict) -> Any:
+        check_class = self.health_check_map[check["module"]]
+        if "parameters" in check:
+            return check_class(check["parameters"])
+        return check_class()
+
+    def _missing_resource(self, instance: Any) -> Optional[str]:
+        """Returns the first API resource required by a check that the cluster
+        does not serve, according to the discovery cache"""
+        if self.discovery is None:
+            return None
+
+        for group, version, plural in getattr(instance, "api_resources", ()):
+            try:
+                if not self.discovery.has_resource(group, version, plural):
+                    return "/".join(filter(None, (group, version, plural)))
+            except Exception:  # pylint: disable=broad-except
+                # Let the check itself find out
+                log.warning("API discovery failed", exc_info=True)
+                return None
+        return None
+
+    def _is_healthy(self, check: dict, instance: Any, submitted: float) -> bool:
+        with tracer.span(f"check {check['name']}", module=check["module"]) as span:
+            # Time spent waiting for a free worker thread
+            span.set_attribute("queue_seconds", time.perf_counter() - submitted)
+            profile = (
+                self.profiler.check(check["name"])
+                if self.profiler
+                else contextlib.nullcontext()
+            )
+            with profile:
+                healthy = instance.is_healthy()
+            span.set_attribute("healthy", bool(healthy))
+            return healthy
+
+    def _healthy(self, future: concurrent.futures.Future, check: dict) -> bool:
+        try:
+            return bool(future.result())
+        # The API group of the check is known to be broken, fail the
+        # check without aborting the whole cycle.
+        except CircuitOpenError as e:
+            log.warning("Check %s failed: %s", check["name"], e.reason)
+            return False
+        # Handling k8s resource not found here as it is not
+        # handled in the individual checks.
+        except ApiException as e:
+            if e.status != 404:
+                log.error(
+                    "Check %s failed: API error %s %s",
+                    check["name"],
+                    e.status,
+                    e.reason,
+                )
+            return False
+        # Errors left once the API client ran out of retries, e.g. urllib3
+        # MaxRetryError, fail the check rather than the whole cycle
+        except Exception:  # pylint: disable=broad-except
+            log.error("Check %s failed", check["name"], exc_info=True)
+            return False
+
+    def _execute(
+        self, entries: List[Tuple[str, dict]], dependencies: Dict[str, Set[str]]
+    ) -> CycleResult:
+        """Runs checks as soon as the checks they depend on have passed, and
+        marks them blocked without running them if any of those did not pass.
+        Dependencies on checks outside of entries are ignored.
+        """
+        names = {check["name"] for _, check in entries}
+        with self._lock:
+            previous = {name: result.status for name, result in self._results.items()}
+        completed: Dict[str, CheckResult] = {}
+        waiting: Dict[str, Tuple[str, dict, Any]] = {}
+
+        def complete(category: str, check: dict, status: str) -> None:
+            completed[check["name"]] = CheckResult(
+                name=check["name"],
+                module=check["module"],
+                category=category,
+                status=status,
+                checked_at=time.time(),
+            )
+
+        for category, check in entries:
+            try:
+                instance = self._build(check)
+            except Exception:  # pylint: disable=broad-except
+                # e.g. invalid parameters, which fail this check only
+                log.error("Failed to set up check %s", check["name"], exc_info=True)
+                complete(category, check, FAILED)
+                continue
+            missing = self._missing_resource(instance)
+            if missing is None:
+                waiting[check["name"]] = (category, check, instance)
+                continue
+
+            # Resolve checks of resource types the cluster does not serve
+            # locally rather than sending a request bound to 404
+            status = FAILED
+            if check.get("if_absent") == "not_applicable":
+                status = NOT_APPLICABLE
+            log.info(
+                "Check %s is %s, %s is not served by the cluster",
+                check["name"],
+                status,
+                missing,
+            )
+            complete(category, check, status)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            futures: Dict[concurrent.futures.Future, Tuple[str, dict]] = {}
+            while waiting or futures:
+                # Submit every check whose dependencies have completed, until
+                # blocking checks stops unblocking their dependents
+                progress = True
+                while progress:
+                    progress = False
+                    for name, (category, check, instance) in list(waiting.items()):
+                        required = dependencies.get(name, set()) & names
+                        if not required <= completed.keys():
+                            continue
+                        del waiting[name]
+                        progress = True
+
+                        failed = sorted(
+                            dependency
+                            for dependency in required
+                            if not completed[dependency].healthy
+                        )
+                        if failed:
+                            log.info(
+                                "Check %s is blocked by %s", name, ", ".join(failed)
+                            )
+                            complete(category, check, BLOCKED)
+                            continue
+
+                        changed = any(
+                            completed[dependency].status != previous.get(dependency)
+                            for dependency in required
+                        )
+                        cached = self._reusable(check, changed)
+                        if cached is not None:
+                            log.debug("Reusing result of check %s", name)
+                            completed[name] = cached
+                            continue
+                        self._watch_changes(check, instance)
+
+                        # Each check runs in a copy of the current context so
+                        # that its spans are recorded as children of the cycle
+                        # span
+                        future = executor.submit(
+                            contextvars.copy_context().run,
+                            self._is_healthy,
+                            check,
+                            instance,
+                            time.perf_counter(),
+                        )
+                        futures[future] = (category, check)
+
+                if not futures:
+                    # Only checks with unsatisfiable dependencies are left
+                    for category, check, _ in waiting.values():
+                        complete(category, check, BLOCKED)
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    category, check = futures.pop(future)
+                    healthy = self._healthy(future, check)
+                    complete(category, check, PASSED if healthy else FAILED)
+
+        # Report results in configuration order
+        results = [completed[check["name"]] for _, check in entries]
+        with self._lock:
+            for result in results:
+                self._results[result.name] = result
+
+        cycle = CycleResult(results)
+        log.debug("Platform checks failed: %s", cycle.platform_checks_failed)
+        log.debug("Workload checks failed: %s", cycle.workload_checks_failed)
+        return cycle
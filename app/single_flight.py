@@ -0,0 +1,71 @@
+"""Collapses concurrent calls for the same key onto a single execution."""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class _Call:
+    """An in-flight call that followers wait on"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key.
+
+    The first caller for a key runs the function, callers arriving while it is
+    still running block and receive the same result (or exception).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Runs fn for key, or waits on the in-flight call for the same key.
+        Args:
+            key: deduplication key
+            fn: function to run when no call is in flight for key
+        Returns:
+            result of fn
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            return call.wait()
+
+        try:
+            call.result = fn()
+        except BaseException as e:  # pylint: disable=broad-except
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def wait(self, key: str) -> Any:
+        """Waits on the in-flight call for key, if any.
+        Returns:
+            result of the in-flight call, or None if no call is in flight
+        """
+        with self._lock:
+            call = self._calls.get(key)
+        if call is None:
+            return None
+        return call.wait()
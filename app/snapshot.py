@@ -0,0 +1,56 @@
+"""On-disk snapshot of the service state, for warm restarts.
+
+After every check cycle the results, HealthCheck conditions and watch
+resourceVersions are written to SNAPSHOT_PATH (e.g. on an emptyDir volume,
+which survives container restarts). On startup the snapshot is restored, so
+that metrics and /status are served right away instead of after the first
+cycle, and watches resume where they left off instead of relisting.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+log = logging.getLogger("snapshot")
+
+_FORMAT_VERSION = 1
+
+
+def save(path: str, state: Dict[str, Any]) -> None:
+    """Writes state to path atomically: readers see the previous or the new
+    snapshot, never a partial one"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "w") as stream:
+            json.dump(
+                {"version": _FORMAT_VERSION, "saved_at": time.time()} | state,
+                stream,
+                separators=(",", ":"),
+            )
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load(path: str) -> Optional[Dict[str, Any]]:
+    """Returns the state saved at path, None if there is no usable snapshot"""
+    try:
+        with open(path) as stream:
+            state = json.load(stream)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        log.warning("Ignoring unreadable snapshot %s", path, exc_info=True)
+        return None
+
+    if state.get("version") != _FORMAT_VERSION:
+        log.warning("Ignoring snapshot %s of version %s", path, state.get("version"))
+        return None
+    return state
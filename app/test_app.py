@@ -0,0 +1,177 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import MagicMock, patch
+
+import requests
+from config import Config
+from runner import CheckRunner
+
+_ENV = {
+    "ROBIN_METRICS_URL": "http://robin-master.test:29446/metrics",
+    "ROBIN_METRICS_TIMEOUT_SECONDS": "3",
+    "ROBIN_METRICS_CONCURRENCY": "1",
+}
+
+app = None
+
+
+def setUpModule():
+    global app
+    # Import the service without a cluster: replay an empty capture, and keep
+    # the scheduler and the HealthCheck CR out of the way
+    with tempfile.TemporaryDirectory() as directory:
+        capture = os.path.join(directory, "empty.zip")
+        zipfile.ZipFile(capture, "w").close()
+        with patch.dict(os.environ, _ENV | {"TRAFFIC_REPLAY_PATH": capture}), patch(
+            "apscheduler.schedulers.background.BackgroundScheduler"
+        ), patch("health_checks.HealthCheck"):
+            import app
+
+
+class TestRobinMetrics(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.get = patch("app.requests.get").start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_proxies_robin_metrics(self):
+        self.get.return_value = MagicMock(text="robin_volume_used_bytes 1\n")
+
+        response = self.client.get("/robin_metrics")
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(b"robin_volume_used_bytes 1\n", response.data)
+        self.get.assert_called_once_with(
+            "http://robin-master.test:29446/metrics", verify=False, timeout=3.0
+        )
+
+    def test_too_many_requests_in_flight(self):
+        # The only slot is taken by a request waiting on robin-master
+        self.assertTrue(app.robin_metrics_slots.acquire(blocking=False))
+        try:
+            response = self.client.get("/robin_metrics")
+        finally:
+            app.robin_metrics_slots.release()
+
+        self.assertEqual(503, response.status_code)
+        self.get.assert_not_called()
+
+    def test_upstream_error(self):
+        self.get.side_effect = requests.ConnectionError("connection refused")
+
+        with self.assertLogs(level="WARNING"):
+            response = self.client.get("/robin_metrics")
+
+        self.assertEqual(502, response.status_code)
+        # The slot is released
+        self.assertTrue(app.robin_metrics_slots.acquire(blocking=False))
+        app.robin_metrics_slots.release()
+
+
+class FakeCheck:
+    calls = 0
+    healthy = True
+
+    def __init__(self, parameters: dict = None) -> None:
+        self.parameters = parameters
+
+    def is_healthy(self):
+        FakeCheck.calls += 1
+        return FakeCheck.healthy
+
+
+class TestChecks(unittest.TestCase):
+    def setUp(self):
+        FakeCheck.calls = 0
+        FakeCheck.healthy = True
+        self.client = app.app.test_client()
+        config = Config(
+            platform_checks=[{"name": "Fake Platform", "module": "FakeCheck"}],
+            workload_checks=[
+                {
+                    "name": "Fake Workload",
+                    "module": "FakeCheck",
+                    "parameters": {"namespace": "vm-workloads"},
+                }
+            ],
+        )
+        patch("runner.read_config", return_value=config).start()
+        # Results are published to a mocked HealthCheck CR
+        self.health_check_cr = patch.object(app, "health_check_cr").start()
+        self.conditions = [{"type": "PlatformHealthy", "status": "True"}]
+        self.health_check_cr.to_state.return_value = {"conditions": self.conditions}
+        runner = CheckRunner(
+            {"FakeCheck": FakeCheck}, on_cycle_complete=app.publish_results
+        )
+        patch.object(app, "check_runner", runner).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_run_all(self):
+        FakeCheck.healthy = False
+
+        response = self.client.post("/run")
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.json["healthy"])
+        self.assertFalse(response.json["cached"])
+        self.assertEqual(["FakeCheck"], response.json["platform_checks_failed"])
+        self.assertEqual(
+            ["Fake Platform", "Fake Workload"],
+            [result["name"] for result in response.json["results"]],
+        )
+        self.health_check_cr.update_status.assert_called_once()
+
+    def test_run_named_check(self):
+        response = self.client.post("/run?check=Fake Workload")
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ["Fake Workload"], [result["name"] for result in response.json["results"]]
+        )
+        self.assertEqual(1, FakeCheck.calls)
+        # only full cycles are published
+        self.health_check_cr.update_status.assert_not_called()
+
+    def test_run_unknown_check(self):
+        response = self.client.post("/run?check=CheckDoesNotExist")
+
+        self.assertEqual(404, response.status_code)
+        self.assertIn(b"Unknown health check: CheckDoesNotExist", response.data)
+
+    def test_run_max_age(self):
+        self.client.post("/run?max_age=0")
+
+        cached = self.client.post("/run?max_age=60")
+        fresh = self.client.post("/run?max_age=0")
+
+        self.assertTrue(cached.json["cached"])
+        self.assertFalse(fresh.json["cached"])
+        self.assertEqual(4, FakeCheck.calls)
+
+    def test_status(self):
+        response = self.client.get("/status")
+        self.assertEqual(
+            {"healthy": True, "results": [], "conditions": self.conditions},
+            response.json,
+        )
+
+        self.client.post("/run?check=FakeCheck")
+        response = self.client.get("/status")
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.json["healthy"])
+        self.assertEqual(
+            ["Fake Platform"], [result["name"] for result in response.json["results"]]
+        )
+        # served from memory
+        self.assertEqual(1, FakeCheck.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from change_watch import ChangeWatches
+from kubernetes.client.exceptions import ApiException
+
+_RESOURCE = ("vm.cluster.gke.io", "v1", "vmruntimes")
+
+
+def event(resource_version):
+    return {
+        "type": "MODIFIED",
+        "object": {
+            "metadata": {"name": "vmruntime", "resourceVersion": resource_version}
+        },
+    }
+
+
+@patch("change_watch.list_metadata")
+@patch("change_watch.watch.Watch")
+class TestChangeWatches(unittest.TestCase):
+    def setUp(self):
+        self.watches = ChangeWatches()
+        self.changes = []
+
+    def on_change(self):
+        self.changes.append(True)
+        if len(self.changes) == 2:
+            self.watches.stop()
+
+    def test_notifies_subscribers_from_current_version(self, watch, list_metadata):
+        list_metadata.return_value = {"metadata": {"resourceVersion": "10"}}
+        watch.return_value.stream.side_effect = [[event("11"), event("12")]]
+        with patch("threading.Thread"):
+            self.watches.subscribe("VMRuntime", [_RESOURCE], self.on_change)
+            self.watches.subscribe("Other", [_RESOURCE], MagicMock())
+
+        self.watches._watch(_RESOURCE)
+
+        self.assertEqual(2, len(self.changes))
+        self.assertEqual(
+            "10", watch.return_value.stream.call_args.kwargs["resource_version"]
+        )
+        self.assertEqual(
+            "/apis/vm.cluster.gke.io/v1/vmruntimes",
+            watch.return_value.stream.call_args.args[1],
+        )
+
+    def test_expired_version_counts_as_change(self, watch, list_metadata):
+        list_metadata.return_value = {"metadata": {"resourceVersion": "10"}}
+        watch.return_value.stream.side_effect = [
+            ApiException(status=410),
+            [event("30")],
+        ]
+        with patch("threading.Thread"):
+            self.watches.subscribe("VMRuntime", [_RESOURCE], self.on_change)
+
+        self.watches._watch(_RESOURCE)
+
+        self.assertEqual(2, len(self.changes))
+        self.assertEqual(2, list_metadata.call_count)
+
+    def test_watches_core_resources(self, watch, list_metadata):
+        list_metadata.return_value = {"metadata": {"resourceVersion": "10"}}
+        watch.return_value.stream.side_effect = [[event("11"), event("12")]]
+        with patch("threading.Thread"):
+            self.watches.subscribe("Nodes", [("", "v1", "nodes")], self.on_change)
+
+        self.watches._watch(("", "v1", "nodes"))
+
+        self.assertEqual(2, len(self.changes))
+        self.assertEqual("/api/v1/nodes", list_metadata.call_args.args[0])
@@ -1,7 +1,10 @@
+import functools
 import unittest
 from unittest.mock import MagicMock, patch
 
 from check_data_volumes import CheckDataVolumes
+from fakes import list_response
+from prometheus_client import REGISTRY
 from pydantic import ValidationError
 
 
@@ -14,6 +17,11 @@ class TestCheckDataVolumes(unittest.TestCase):
         self.mock_k8s_client.CustomObjectsApi.return_value = (
             self.mock_custom_objects_api
         )
+        for method in (
+            self.mock_custom_objects_api.list_namespaced_custom_object,
+            self.mock_custom_objects_api.list_cluster_custom_object,
+        ):
+            method.side_effect = functools.partial(list_response, method)
 
     def tearDown(self):
         self.k8s_client_patcher.stop()
@@ -45,6 +53,7 @@ class TestCheckDataVolumes(unittest.TestCase):
             version="v1beta1",
             plural="datavolumes",
             namespace="test-ns",
+            _preload_content=False,
         )
 
     def test_is_healthy_incorrect_count(self):
@@ -140,4 +149,73 @@ class TestCheckDataVolumes(unittest.TestCase):
         # Optional 'count'
         check = CheckDataVolumes(parameters={"namespace": "test-ns"})
         self.assertIsNone(check.count)
- 
\ No newline at end of file
+
+    def test_is_healthy_multiple_namespaces(self):
+        """Test every selected namespace is checked, even after one fails."""
+        params = {"namespace": "tenant-a", "namespaces": ["tenant-b"]}
+        checker = CheckDataVolumes(parameters=params)
+
+        self.mock_custom_objects_api.list_cluster_custom_object.return_value = {
+            "items": [
+                {
+                    "metadata": {"name": "dv1", "namespace": "tenant-a"},
+                    "status": {"phase": "ImportInProgress", "progress": "50.0%"},
+                },
+                {
+                    "metadata": {"name": "dv2", "namespace": "tenant-b"},
+                    "status": {"phase": "Succeeded", "progress": "100.0%"},
+                },
+            ]
+        }
+
+        with patch("check_data_volumes.report") as report:
+            self.assertFalse(checker.is_healthy())
+        self.assertEqual(
+            report.call_args.args[:2],
+            ("datavolumes", {"tenant-a": False, "tenant-b": True}),
+        )
+
+    def test_is_healthy_exports_phases_and_progress(self):
+        """Test data volumes are counted by phase and import progress is summarized."""
+        params = {"namespace": "metrics-ns"}
+        checker = CheckDataVolumes(parameters=params)
+
+        self.mock_custom_objects_api.list_namespaced_custom_object.return_value = {
+            "items": [
+                {
+                    "metadata": {"name": "dv1"},
+                    "status": {"phase": "Succeeded", "progress": "100.0%"},
+                },
+                {
+                    "metadata": {"name": "dv2"},
+                    "status": {"phase": "ImportInProgress", "progress": "50.0%"},
+                },
+                {
+                    "metadata": {"name": "dv3"},
+                    "status": {"phase": "SomethingNew", "progress": "N/A"},
+                },
+            ]
+        }
+
+        self.assertFalse(checker.is_healthy())
+
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(name, {"namespace": "metrics-ns"} | labels)
+
+        self.assertEqual(sample("data_volumes", phase="Succeeded"), 1)
+        self.assertEqual(sample("data_volumes", phase="ImportInProgress"), 1)
+        self.assertEqual(sample("data_volumes", phase="Other"), 1)
+        self.assertEqual(
+            sample("data_volume_import_progress_ratio", aggregation="min"), 0.5
+        )
+        self.assertEqual(
+            sample("data_volume_import_progress_ratio", aggregation="mean"), 0.75
+        )
+
+        # phases no longer seen are dropped
+        self.mock_custom_objects_api.list_namespaced_custom_object.return_value = {
+            "items": []
+        }
+        self.assertTrue(checker.is_healthy())
+        self.assertIsNone(sample("data_volumes", phase="Succeeded"))
+        self.assertIsNone(sample("data_volume_import_progress_ratio", aggregation="min"))
@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import patch
+
+from check_resource import CheckResource
+from pydantic import ValidationError
+
+PARAMETERS = {
+    "group": "manage.robin.io",
+    "version": "v1",
+    "plural": "robinclusters",
+    "count": 1,
+    "predicates": [
+        "status.phase == Ready",
+        "status.conditions[type=Ready].status == True",
+    ],
+}
+
+
+class TestCheckResource(unittest.TestCase):
+    def setUp(self):
+        self.api_client_patcher = patch("check_resource.api_client")
+        self.mock_api_client = self.api_client_patcher.start().return_value
+
+    def tearDown(self):
+        self.api_client_patcher.stop()
+
+    def robin_cluster(self, phase="Ready", ready="True"):
+        return {
+            "metadata": {"name": "robin"},
+            "status": {
+                "phase": phase,
+                "conditions": [{"type": "Ready", "status": ready}],
+            },
+        }
+
+    def test_is_healthy_success(self):
+        self.mock_api_client.call_api.return_value = {"items": [self.robin_cluster()]}
+
+        self.assertTrue(CheckResource(PARAMETERS).is_healthy())
+
+        args, kwargs = self.mock_api_client.call_api.call_args
+        self.assertEqual(args, ("/apis/manage.robin.io/v1/robinclusters", "GET"))
+        self.assertEqual(kwargs["query_params"], [])
+
+    def test_is_healthy_incorrect_count(self):
+        self.mock_api_client.call_api.return_value = {"items": []}
+
+        self.assertFalse(CheckResource(PARAMETERS).is_healthy())
+
+    def test_is_healthy_predicate_not_matched(self):
+        self.mock_api_client.call_api.return_value = {
+            "items": [self.robin_cluster(ready="False")]
+        }
+
+        self.assertFalse(CheckResource(PARAMETERS).is_healthy())
+
+    def test_namespaced_core_resource_with_selectors(self):
+        self.mock_api_client.call_api.return_value = {
+            "items": [{"metadata": {"name": "pod-1"}, "status": {"phase": "Running"}}]
+        }
+        check = CheckResource(
+            {
+                "version": "v1",
+                "plural": "pods",
+                "namespace": "vm-workloads",
+                "label_selector": "app=web",
+                "field_selector": "status.phase!=Succeeded",
+                "predicates": ["status.phase == Running"],
+            }
+        )
+
+        self.assertTrue(check.is_healthy())
+        self.assertEqual(check.api_resources, [("", "v1", "pods")])
+
+        args, kwargs = self.mock_api_client.call_api.call_args
+        self.assertEqual(args, ("/api/v1/namespaces/vm-workloads/pods", "GET"))
+        self.assertEqual(
+            kwargs["query_params"],
+            [("labelSelector", "app=web"), ("fieldSelector", "status.phase!=Succeeded")],
+        )
+
+    def test_metadata_only(self):
+        self.mock_api_client.call_api.return_value = {
+            "items": [{"metadata": {"name": "robin", "labels": {"tier": "storage"}}}]
+        }
+        check = CheckResource(
+            PARAMETERS | {"predicates": ["metadata.labels.tier == storage"]}
+        )
+
+        self.assertTrue(check.is_healthy())
+
+        _, kwargs = self.mock_api_client.call_api.call_args
+        self.assertEqual(
+            kwargs["header_params"]["Accept"],
+            "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1",
+        )
+
+        # predicates on the status need full objects
+        CheckResource(PARAMETERS).is_healthy()
+        _, kwargs = self.mock_api_client.call_api.call_args
+        self.assertEqual(kwargs["header_params"], {})
+
+    def test_invalid_predicate(self):
+        with self.assertRaises(ValidationError):
+            CheckResource(PARAMETERS | {"predicates": ["status.phase =="]})
+
+    def test_missing_parameters(self):
+        with self.assertRaises(ValidationError):
+            CheckResource({"group": "manage.robin.io"})
+
+
+if __name__ == "__main__":
+    unittest.main()
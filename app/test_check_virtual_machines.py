@@ -1,7 +1,10 @@
+import functools
 import unittest
 from unittest.mock import MagicMock, patch
 
 from check_virtual_machines import CheckVirtualMachines
+from fakes import list_response
+from prometheus_client import REGISTRY
 from pydantic import ValidationError
 
 
@@ -14,6 +17,11 @@ class TestCheckVirtualMachines(unittest.TestCase):
         self.mock_k8s_client.CustomObjectsApi.return_value = (
             self.mock_custom_objects_api
         )
+        for method in (
+            self.mock_custom_objects_api.list_namespaced_custom_object,
+            self.mock_custom_objects_api.list_cluster_custom_object,
+        ):
+            method.side_effect = functools.partial(list_response, method)
 
     def tearDown(self):
         self.k8s_client_patcher.stop()
@@ -47,6 +55,7 @@ class TestCheckVirtualMachines(unittest.TestCase):
             version="v1",
             plural="virtualmachines",
             namespace="test-ns",
+            _preload_content=False,
         )
 
     def test_is_healthy_incorrect_count(self):
@@ -83,6 +92,22 @@ class TestCheckVirtualMachines(unittest.TestCase):
 
         self.assertTrue(checker.is_healthy())
 
+    def test_is_healthy_vm_without_state(self):
+        """Test is_healthy returns False for a VM whose status has no state yet."""
+        checker = CheckVirtualMachines(parameters={"namespace": "test-ns"})
+        self.mock_custom_objects_api.list_namespaced_custom_object.return_value = {
+            "items": [
+                {"metadata": {"name": "vm1"}, "status": {"state": "Running"}},
+                {
+                    "metadata": {"name": "vm2"},
+                    "status": {"conditions": [{"type": "Ready", "status": "False"}]},
+                },
+            ]
+        }
+
+        with self.assertLogs("check.virtualmachines", "ERROR"):
+            self.assertFalse(checker.is_healthy())
+
     def test_init_invalid_parameters(self):
         """Test that initializing with invalid parameters raises a ValidationError."""
         # Missing 'namespace'
@@ -109,4 +134,151 @@ class TestCheckVirtualMachines(unittest.TestCase):
             mock_vm_list
         )
 
-        self.assertTrue(checker.is_healthy())
\ No newline at end of file
+        self.assertTrue(checker.is_healthy())
+
+    def test_is_healthy_multiple_namespaces(self):
+        """Test multiple namespaces are checked from a single cluster-wide list."""
+        params = {
+            "namespaces": ["tenant-a", "tenant-b"],
+            "label_selector": "tier=db",
+            "count": 1,
+            "counts": {"tenant-b": 2},
+        }
+        checker = CheckVirtualMachines(parameters=params)
+
+        mock_vm_list = {
+            "items": [
+                {
+                    "metadata": {"name": "vm1", "namespace": "tenant-a"},
+                    "status": {"state": "Running"},
+                },
+                {
+                    "metadata": {"name": "vm2", "namespace": "tenant-b"},
+                    "status": {"state": "Running"},
+                },
+                {
+                    "metadata": {"name": "vm3", "namespace": "tenant-b"},
+                    "status": {"state": "Stopped"},
+                },
+                {
+                    "metadata": {"name": "vm4", "namespace": "other"},
+                    "status": {"state": "Failed"},
+                },
+            ]
+        }
+        self.mock_custom_objects_api.list_cluster_custom_object.return_value = (
+            mock_vm_list
+        )
+
+        self.assertTrue(checker.is_healthy())
+
+        self.mock_custom_objects_api.list_cluster_custom_object.assert_called_once_with(
+            group="vm.cluster.gke.io",
+            version="v1",
+            plural="virtualmachines",
+            label_selector="tier=db",
+            _preload_content=False,
+        )
+        self.mock_custom_objects_api.list_namespaced_custom_object.assert_not_called()
+
+        # tenant-b only has one VM left
+        mock_vm_list["items"].pop(1)
+        self.assertFalse(checker.is_healthy())
+
+    def test_is_healthy_namespace_selector(self):
+        """Test namespaces are selected by label, including those without VMs."""
+        params = {"namespace_selector": "tenant=true", "count": 1}
+        checker = CheckVirtualMachines(parameters=params)
+
+        namespaces = [MagicMock(), MagicMock()]
+        namespaces[0].metadata.name = "tenant-a"
+        namespaces[1].metadata.name = "tenant-b"
+        mock_core_v1_api = self.mock_k8s_client.CoreV1Api.return_value
+        mock_core_v1_api.list_namespace.return_value.items = namespaces
+        self.mock_custom_objects_api.list_cluster_custom_object.return_value = {
+            "items": [
+                {
+                    "metadata": {"name": "vm1", "namespace": "tenant-a"},
+                    "status": {"state": "Running"},
+                },
+            ]
+        }
+
+        self.assertFalse(checker.is_healthy())
+        mock_core_v1_api.list_namespace.assert_called_once_with(
+            label_selector="tenant=true"
+        )
+
+    def test_overlapping_checks_keep_each_others_samples(self):
+        """Test namespaces selected by two checks are exported from both."""
+        broad = CheckVirtualMachines({"namespace_selector": "overlap=true"})
+        narrow = CheckVirtualMachines({"namespace": "overlap-b"})
+        namespaces = [MagicMock(), MagicMock()]
+        namespaces[0].metadata.name = "overlap-a"
+        namespaces[1].metadata.name = "overlap-b"
+        mock_core_v1_api = self.mock_k8s_client.CoreV1Api.return_value
+        mock_core_v1_api.list_namespace.return_value.items = namespaces
+        self.mock_custom_objects_api.list_cluster_custom_object.return_value = {
+            "items": [
+                {
+                    "metadata": {"name": "vm1", "namespace": namespace},
+                    "status": {"state": "Running"},
+                }
+                for namespace in ("overlap-a", "overlap-b")
+            ]
+        }
+        self.mock_custom_objects_api.list_namespaced_custom_object.return_value = {
+            "items": [
+                {"metadata": {"name": "vm1"}, "status": {"state": "Running"}},
+                {"metadata": {"name": "vm2"}, "status": {"state": "Failed"}},
+            ]
+        }
+
+        def sample(namespace, name, **labels):
+            return REGISTRY.get_sample_value(name, {"namespace": namespace} | labels)
+
+        def health(namespace):
+            return sample(
+                namespace, "workload_namespace_health", resource="virtualmachines"
+            )
+
+        self.assertTrue(broad.is_healthy())
+        self.assertFalse(narrow.is_healthy())
+        self.assertTrue(broad.is_healthy())
+        # unhealthy for one of the checks
+        self.assertEqual(0, health("overlap-b"))
+        self.assertEqual(1, sample("overlap-b", "virtual_machines", state="Failed"))
+
+        # no longer selected by one check, still by the other
+        namespaces.pop()
+        self.assertTrue(broad.is_healthy())
+        self.assertEqual(0, health("overlap-b"))
+        self.assertEqual(1, sample("overlap-b", "virtual_machines", state="Running"))
+
+        # no longer selected by any check
+        namespaces.pop()
+        self.assertTrue(broad.is_healthy())
+        self.assertIsNone(health("overlap-a"))
+        self.assertIsNone(sample("overlap-a", "virtual_machines", state="Running"))
+
+    def test_is_healthy_exports_states(self):
+        """Test virtual machines are counted by state, even past the first failure."""
+        params = {"namespace": "metrics-ns"}
+        checker = CheckVirtualMachines(parameters=params)
+
+        self.mock_custom_objects_api.list_namespaced_custom_object.return_value = {
+            "items": [
+                {"metadata": {"name": "vm1"}, "status": {"state": "Failed"}},
+                {"metadata": {"name": "vm2"}, "status": {"state": "Running"}},
+                {"metadata": {"name": "vm3"}, "status": {"state": "Running"}},
+            ]
+        }
+
+        self.assertFalse(checker.is_healthy())
+        for state, count in (("Running", 2), ("Failed", 1)):
+            self.assertEqual(
+                REGISTRY.get_sample_value(
+                    "virtual_machines", {"namespace": "metrics-ns", "state": state}
+                ),
+                count,
+            )
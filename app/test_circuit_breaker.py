@@ -0,0 +1,144 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+import kube_client
+import urllib3
+from circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+    api_group,
+)
+from fakes import FakeClock
+from kubernetes.client.rest import ApiException
+from rate_limit import TokenBucket
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            "manage.robin.io", failure_threshold=2, reset_seconds=60, clock=self.clock
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.before_request()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError) as cm:
+            self.breaker.before_request()
+        self.assertEqual(cm.exception.status, 503)
+        self.assertEqual(cm.exception.group, "manage.robin.io")
+
+    def test_half_open_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 61
+
+        # a single probe is let through
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+        # failed probe opens the circuit again
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+        # successful probe closes it
+        self.clock.now += 61
+        self.breaker.before_request()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.before_request()
+        self.breaker.before_request()
+
+    def test_api_group(self):
+        self.assertEqual(
+            api_group("https://10.0.0.1:6443/apis/manage.robin.io/v1/robinclusters"),
+            "manage.robin.io",
+        )
+        self.assertEqual(api_group("https://10.0.0.1:6443/api/v1/nodes"), "core")
+
+
+class TestApiClientRetries(unittest.TestCase):
+    url = "https://apiserver/apis/vm.cluster.gke.io/v1/vmruntimes"
+
+    def setUp(self):
+        patch.object(kube_client, "rate_limiter", TokenBucket(qps=0, burst=1)).start()
+        self.breakers = CircuitBreakers(failure_threshold=3, reset_seconds=60)
+        patch.object(kube_client, "circuit_breakers", self.breakers).start()
+        self.sleep = patch("kube_client.time.sleep").start()
+        self.response = MagicMock(status=200, data=json.dumps({"items": []}).encode())
+        self.base_request = patch("kubernetes.client.ApiClient.request").start()
+        self.api = kube_client.ApiClient()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_retries_transient_errors(self):
+        self.base_request.side_effect = [
+            ApiException(status=503),
+            urllib3.exceptions.ReadTimeoutError(None, self.url, "timed out"),
+            self.response,
+        ]
+        self.assertIs(self.api.request("GET", self.url), self.response)
+        self.assertEqual(self.base_request.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        # backoff grows exponentially, with jitter
+        self.assertLessEqual(self.sleep.call_args_list[0].args[0], 0.5)
+        self.assertLessEqual(self.sleep.call_args_list[1].args[0], 1)
+        self.assertEqual(self.breakers.get("vm.cluster.gke.io").state, CLOSED)
+
+    def test_does_not_retry_post(self):
+        self.base_request.side_effect = ApiException(status=503)
+        with self.assertRaises(ApiException):
+            self.api.request("POST", self.url)
+        self.assertEqual(self.base_request.call_count, 1)
+
+    def test_request_timeout(self):
+        self.base_request.return_value = self.response
+        self.api.request("GET", self.url)
+        self.assertEqual(self.base_request.call_args.kwargs["_request_timeout"], 30)
+        self.api.request("GET", self.url, _request_timeout=5)
+        self.assertEqual(self.base_request.call_args.kwargs["_request_timeout"], 5)
+        # streamed lists keep the default, watches wait for their timeoutSeconds
+        self.api.request("GET", self.url, _preload_content=False)
+        self.assertEqual(self.base_request.call_args.kwargs["_request_timeout"], 30)
+        self.api.request(
+            "GET",
+            self.url,
+            query_params=[("watch", True), ("timeoutSeconds", 300)],
+            _preload_content=False,
+        )
+        self.assertIsNone(self.base_request.call_args.kwargs.get("_request_timeout"))
+
+    def test_circuit_opens_and_fails_fast(self):
+        self.base_request.side_effect = ApiException(status=503)
+        with self.assertRaises(ApiException):
+            self.api.request("GET", self.url)
+        self.assertEqual(self.base_request.call_count, 3)
+        self.assertEqual(self.breakers.get("vm.cluster.gke.io").state, OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            self.api.request("GET", self.url)
+        self.assertEqual(self.base_request.call_count, 3)
+
+        # other API groups are unaffected
+        self.base_request.side_effect = None
+        self.base_request.return_value = self.response
+        self.api.request("GET", "https://apiserver/api/v1/nodes")
+
+
+if __name__ == "__main__":
+    unittest.main()
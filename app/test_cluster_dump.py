@@ -0,0 +1,242 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cluster_dump
+from check_nodes import CheckNodes
+from check_root_syncs import CheckRootSyncs
+from json_decode import list_items
+from kube_client import ApiClient, use_client
+from kubernetes import client
+from kubernetes.client.exceptions import ApiException
+
+
+def node(name, ready="True", labels=None):
+    return {
+        "apiVersion": "v1",
+        "kind": "Node",
+        "metadata": {"name": name, "labels": labels or {}},
+        "status": {"conditions": [{"type": "Ready", "status": ready}]},
+    }
+
+
+_ROOT_SYNCS = """\
+apiVersion: configsync.gke.io/v1beta1
+kind: RootSync
+metadata:
+  name: root-sync
+  namespace: config-management-system
+  creationTimestamp: 2024-05-01T10:00:00Z
+status:
+  conditions:
+    - type: Reconciling
+      status: "False"
+    - type: Syncing
+      status: "False"
+      message: Sync Completed
+---
+apiVersion: configsync.gke.io/v1beta1
+kind: RootSync
+metadata:
+  name: other
+  namespace: elsewhere
+"""
+
+_CRD = """\
+apiVersion: apiextensions.k8s.io/v1
+kind: CustomResourceDefinition
+metadata:
+  name: vmis.kubevirt.io
+spec:
+  group: kubevirt.io
+  names:
+    kind: VirtualMachineInstance
+    plural: vmis
+"""
+
+
+class TestClusterDump(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.write(
+            "nodes.json",
+            json.dumps(
+                {
+                    "apiVersion": "v1",
+                    "kind": "List",
+                    "items": [
+                        node("node-1", labels={"role": "cp"}),
+                        node("node-{2}", labels={"role": 'w"orker'}),
+                    ],
+                },
+                indent=2,
+            ),
+        )
+        self.write(os.path.join("cms", "rootsyncs.yaml"), _ROOT_SYNCS)
+        self.write("crds.yml", _CRD)
+        self.write(
+            "vmi.json",
+            json.dumps(
+                {
+                    "apiVersion": "kubevirt.io/v1",
+                    "kind": "VirtualMachineInstance",
+                    "metadata": {"name": "vm-1", "namespace": "vms"},
+                }
+            ),
+        )
+        self.write("README.txt", "not an object")
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as stream:
+            stream.write(content)
+
+    def api(self):
+        api = ApiClient()
+        index = cluster_dump.use_dump(api, self.directory)
+        self.addCleanup(index.close)
+        return api
+
+    def test_runs_checks_against_dump(self):
+        with use_client(self.api()):
+            self.assertTrue(CheckNodes().is_healthy())
+            self.assertTrue(CheckRootSyncs().is_healthy())
+
+    def test_unhealthy_objects_fail_checks(self):
+        self.write("broken-node.yaml", json.dumps(node("node-3", ready="False")))
+        with use_client(self.api()):
+            self.assertFalse(CheckNodes().is_healthy())
+
+    def test_lists_namespaced_and_cluster_wide(self):
+        custom_objects_api = client.CustomObjectsApi(self.api())
+
+        namespaced = custom_objects_api.list_namespaced_custom_object(
+            "configsync.gke.io", "v1beta1", "config-management-system", "rootsyncs"
+        )
+        everywhere = custom_objects_api.list_cluster_custom_object(
+            "configsync.gke.io", "v1beta1", "rootsyncs"
+        )
+
+        self.assertEqual(
+            ["root-sync"], [i["metadata"]["name"] for i in namespaced["items"]]
+        )
+        self.assertEqual(2, len(everywhere["items"]))
+        # Timestamps stay strings, as in JSON
+        self.assertEqual(
+            "2024-05-01T10:00:00Z",
+            namespaced["items"][0]["metadata"]["creationTimestamp"],
+        )
+
+    def test_streams_lists(self):
+        custom_objects_api = client.CustomObjectsApi(self.api())
+
+        rootsyncs = list_items(
+            custom_objects_api.list_cluster_custom_object,
+            "configsync.gke.io",
+            "v1beta1",
+            "rootsyncs",
+        )
+
+        self.assertEqual(2, len(list(rootsyncs)))
+
+    def test_parses_yaml_lists_once_per_request(self):
+        self.write(
+            "workers.yaml",
+            json.dumps({"kind": "List", "items": [node(f"w-{i}") for i in range(3)]}),
+        )
+        core_v1_api = client.CoreV1Api(self.api())
+
+        with patch.object(
+            cluster_dump.yaml, "load", wraps=cluster_dump.yaml.load
+        ) as load, patch.object(cluster_dump, "_YAML_CACHE_BYTES", 0):
+            core_v1_api.list_node()
+            core_v1_api.list_node(label_selector="role!=cp")
+            core_v1_api.read_node("w-1")
+            core_v1_api.read_node("w-2")
+
+        # once per request, the document is too large to be kept
+        self.assertEqual(4, load.call_count)
+
+    def test_keeps_small_yaml_documents(self):
+        core_v1_api = client.CustomObjectsApi(self.api())
+
+        with patch.object(
+            cluster_dump.yaml, "load", wraps=cluster_dump.yaml.load
+        ) as load:
+            for _ in range(2):
+                core_v1_api.list_cluster_custom_object(
+                    "configsync.gke.io", "v1beta1", "rootsyncs"
+                )
+
+        self.assertEqual(2, load.call_count)
+
+    def test_uses_plural_of_crds(self):
+        vmis = client.CustomObjectsApi(self.api()).list_cluster_custom_object(
+            "kubevirt.io", "v1", "vmis"
+        )
+        self.assertEqual(["vm-1"], [i["metadata"]["name"] for i in vmis["items"]])
+
+    def test_gets_by_name(self):
+        core_v1_api = client.CoreV1Api(self.api())
+
+        self.assertEqual("node-{2}", core_v1_api.read_node("node-{2}").metadata.name)
+        with self.assertRaises(ApiException) as raised:
+            core_v1_api.read_node("node-9")
+        self.assertEqual(404, raised.exception.status)
+
+    def test_filters_by_selectors(self):
+        core_v1_api = client.CoreV1Api(self.api())
+
+        by_label = core_v1_api.list_node(label_selector="role=cp")
+        by_field = core_v1_api.list_node(field_selector="metadata.name!=node-1")
+
+        self.assertEqual(["node-1"], [n.metadata.name for n in by_label.items])
+        self.assertEqual(["node-{2}"], [n.metadata.name for n in by_field.items])
+
+    def test_slices_large_and_non_ascii_items(self):
+        large = node("node-é", labels={"note": "ü" * 20000})
+        self.write("large.json", json.dumps({"items": [large, node("node-4")]}))
+        core_v1_api = client.CoreV1Api(self.api())
+
+        self.assertEqual(
+            "ü" * 20000, core_v1_api.read_node("node-é").metadata.labels["note"]
+        )
+        self.assertEqual("node-4", core_v1_api.read_node("node-4").metadata.name)
+
+    def test_unknown_resources_are_not_found(self):
+        with self.assertRaises(ApiException) as raised:
+            client.CoreV1Api(self.api()).list_pod_for_all_namespaces()
+        self.assertEqual(404, raised.exception.status)
+
+    def test_reuses_saved_index(self):
+        cluster_dump.DumpIndex.open(self.directory).close()
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, cluster_dump.INDEX_FILE))
+        )
+
+        with patch.object(cluster_dump.DumpIndex, "build") as build:
+            index = cluster_dump.DumpIndex.open(self.directory)
+        build.assert_not_called()
+        self.assertEqual(2, len(index.entries("", "Node")))
+
+    def test_rebuilds_index_when_dump_changes(self):
+        cluster_dump.DumpIndex.open(self.directory).close()
+        self.write("extra.yaml", json.dumps(node("node-3")))
+
+        index = cluster_dump.DumpIndex.open(self.directory)
+        self.addCleanup(index.close)
+
+        self.assertEqual(3, len(index.entries("", "Node")))
+
+
+class TestPlural(unittest.TestCase):
+    def test_plural(self):
+        self.assertEqual("nodes", cluster_dump.plural("Node"))
+        self.assertEqual("policies", cluster_dump.plural("Policy"))
+        self.assertEqual("gateways", cluster_dump.plural("Gateway"))
+        self.assertEqual("ingresses", cluster_dump.plural("Ingress"))
@@ -2,7 +2,7 @@ import os
 import unittest
 
 import yaml
-from config import read_config
+from config import Config, read_config
 from pydantic import ValidationError
 
 
@@ -32,4 +32,68 @@ class TestConfig(unittest.TestCase):
         result = read_config()
         self.assertEqual(len(result.platform_checks), 4)
         self.assertEqual(len(result.workload_checks), 2)
-        
+
+    def test_dependencies(self):
+        config = Config(
+            platform_checks=[
+                {"name": "Node Health", "module": "CheckNodes"},
+            ],
+            workload_checks=[
+                {
+                    "name": "VM Workloads Health",
+                    "module": "CheckVirtualMachines",
+                    "depends_on": ["CheckNodes"],
+                },
+            ],
+        )
+        self.assertEqual(
+            config.dependencies(),
+            {"Node Health": set(), "VM Workloads Health": {"Node Health"}},
+        )
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValidationError):
+            Config(
+                platform_checks=[
+                    {"name": "Node Health", "module": "CheckNodes", "depends_on": ["X"]}
+                ],
+                workload_checks=[],
+            )
+
+    def test_duplicate_condition_types(self):
+        with self.assertRaises(ValidationError) as context:
+            Config(
+                platform_checks=[
+                    {"name": "Node Health", "module": "CheckNodes"},
+                    {"name": "node-health", "module": "CheckVMRuntime"},
+                ],
+                workload_checks=[],
+            )
+        self.assertIn(
+            "Check node-health has the condition type NodeHealth of check Node Health",
+            str(context.exception),
+        )
+
+    def test_aggregate_condition_types_reserved(self):
+        with self.assertRaises(ValidationError) as context:
+            Config(
+                platform_checks=[],
+                workload_checks=[
+                    {"name": "Workloads healthy", "module": "CheckVirtualMachines"},
+                ],
+            )
+        self.assertIn(
+            "condition type WorkloadsHealthy of the aggregate condition",
+            str(context.exception),
+        )
+
+    def test_dependency_cycle(self):
+        with self.assertRaises(ValidationError) as context:
+            Config(
+                platform_checks=[
+                    {"name": "A", "module": "CheckNodes", "depends_on": ["B"]},
+                    {"name": "B", "module": "CheckVMRuntime", "depends_on": ["A"]},
+                ],
+                workload_checks=[],
+            )
+        self.assertIn("A -> B -> A", str(context.exception))
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from discovery import ApiDiscovery
+from fakes import FakeClock
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+
+def api_group(name, *versions):
+    return client.V1APIGroup(
+        name=name,
+        versions=[
+            client.V1GroupVersionForDiscovery(group_version=f"{name}/{v}", version=v)
+            for v in versions
+        ],
+    )
+
+
+def resource_list(*names):
+    return client.V1APIResourceList(
+        group_version="vm.cluster.gke.io/v1",
+        resources=[
+            client.V1APIResource(
+                name=name, kind=name, namespaced=True, singular_name="", verbs=["list"]
+            )
+            for name in names
+        ],
+    )
+
+
+class TestApiDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.apis_api = MagicMock()
+        self.apis_api.get_api_versions.return_value = client.V1APIGroupList(
+            groups=[
+                api_group("vm.cluster.gke.io", "v1"),
+                api_group("configsync.gke.io", "v1beta1", "v1"),
+            ]
+        )
+        patch("discovery.client.ApisApi", return_value=self.apis_api).start()
+        self.api_client = MagicMock()
+        self.api_client.call_api.return_value = resource_list(
+            "virtualmachines", "virtualmachines/status", "vmruntimes"
+        )
+        patch("discovery.api_client", return_value=self.api_client).start()
+        self.clock = FakeClock()
+        self.discovery = ApiDiscovery(refresh_seconds=600, clock=self.clock)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_absent_group_is_resolved_from_group_list(self):
+        self.assertFalse(self.discovery.has_resource("manage.robin.io", "v1", "robinclusters"))
+        self.assertFalse(self.discovery.has_resource("configsync.gke.io", "v2", "rootsyncs"))
+        self.api_client.call_api.assert_not_called()
+
+    def test_resources_are_cached(self):
+        self.assertTrue(self.discovery.has_resource("vm.cluster.gke.io", "v1", "vmruntimes"))
+        self.assertTrue(
+            self.discovery.has_resource("vm.cluster.gke.io", "v1", "virtualmachines")
+        )
+        self.assertFalse(
+            self.discovery.has_resource("vm.cluster.gke.io", "v1", "virtualmachineinstances")
+        )
+        self.apis_api.get_api_versions.assert_called_once()
+        self.api_client.call_api.assert_called_once()
+        self.assertEqual(self.api_client.call_api.call_args.args[0], "/apis/vm.cluster.gke.io/v1")
+
+    def test_subresources_are_ignored(self):
+        self.assertFalse(
+            self.discovery.has_resource("vm.cluster.gke.io", "v1", "virtualmachines/status")
+        )
+
+    def test_refresh_interval(self):
+        self.discovery.has_resource("vm.cluster.gke.io", "v1", "vmruntimes")
+        self.clock.now += 601
+        self.discovery.has_resource("vm.cluster.gke.io", "v1", "vmruntimes")
+        self.assertEqual(self.apis_api.get_api_versions.call_count, 2)
+        self.assertEqual(self.api_client.call_api.call_count, 2)
+
+    def test_invalidate(self):
+        self.discovery.has_resource("vm.cluster.gke.io", "v1", "vmruntimes")
+        self.discovery.invalidate()
+        self.discovery.has_resource("vm.cluster.gke.io", "v1", "vmruntimes")
+        self.assertEqual(self.apis_api.get_api_versions.call_count, 2)
+
+    def test_group_version_removed(self):
+        self.api_client.call_api.side_effect = ApiException(status=404)
+        self.assertFalse(self.discovery.has_resource("vm.cluster.gke.io", "v1", "vmruntimes"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch
+
+from events import WARNING, EventRecorder
+from fakes import FakeClock
+from kubernetes.client.rest import ApiException
+from rate_limit import TokenBucket
+
+
+class TestEventRecorder(unittest.TestCase):
+    def setUp(self):
+        self.create_patcher = patch(
+            "kubernetes.client.CoreV1Api.create_namespaced_event"
+        )
+        self.patch_patcher = patch("kubernetes.client.CoreV1Api.patch_namespaced_event")
+        self.create = self.create_patcher.start()
+        self.patch = self.patch_patcher.start()
+        patch("events.api_client").start()
+        self.clock = FakeClock(1_700_000_000.0)
+        self.recorder = EventRecorder(
+            {
+                "apiVersion": "validator.gdc.gke.io/v1",
+                "kind": "HealthCheck",
+                "name": "default",
+            },
+            rate_limiter=TokenBucket(qps=1 / 300, burst=2, clock=self.clock),
+            clock=self.clock,
+        )
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_create(self):
+        self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+
+        self.create.assert_called_once()
+        body = self.create.call_args.kwargs["body"]
+        self.assertEqual(self.create.call_args.kwargs["namespace"], "default")
+        self.assertEqual(body["involvedObject"]["kind"], "HealthCheck")
+        self.assertEqual(body["type"], "Warning")
+        self.assertEqual(body["reason"], "HealthCheckFailed")
+        self.assertEqual(body["count"], 1)
+        self.assertEqual(body["firstTimestamp"], "2023-11-14T22:13:20Z")
+        self.assertTrue(body["metadata"]["name"].startswith("default."))
+
+    def test_repeats_are_aggregated(self):
+        self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+        self.clock.now += 60
+        self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+
+        self.create.assert_called_once()
+        name = self.create.call_args.kwargs["body"]["metadata"]["name"]
+        self.patch.assert_called_once_with(
+            name=name,
+            namespace="default",
+            body={"count": 2, "lastTimestamp": "2023-11-14T22:14:20Z"},
+        )
+
+    def test_rate_limited_repeats_are_counted(self):
+        for _ in range(4):
+            self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+        # the burst of 2 covers the create and a single patch
+        self.create.assert_called_once()
+        self.assertEqual(self.patch.call_count, 1)
+
+        self.clock.now += 300
+        self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+        self.assertEqual(self.patch.call_args.kwargs["body"]["count"], 5)
+
+    def test_expired_event_is_recreated(self):
+        self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+        self.patch.side_effect = ApiException(status=404)
+        self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_api_errors_are_not_raised(self):
+        self.create.side_effect = ApiException(status=403)
+        self.recorder.record(WARNING, "HealthCheckFailed", "Node Health failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import kube_client
+import urllib3
+import yaml
+from fleet import Cluster, resolve_clusters, run_fleet, summarize
+
+KUBECONFIG = {
+    "apiVersion": "v1",
+    "kind": "Config",
+    "current-context": "site-1",
+    "clusters": [
+        {"name": f"site-{i}", "cluster": {"server": f"https://site-{i}:6443"}}
+        for i in (1, 2)
+    ],
+    "users": [{"name": "admin", "user": {"token": "secret"}}],
+    "contexts": [
+        {"name": f"site-{i}", "context": {"cluster": f"site-{i}", "user": "admin"}}
+        for i in (1, 2)
+    ],
+}
+
+
+class ClusterCheck:
+    """Passes unless the bound client belongs to a cluster listed in failing"""
+
+    failing = set()
+
+    def is_healthy(self):
+        return kube_client.api_client().cluster not in self.failing
+
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self.clients = []
+
+        def new_client(kubeconfig, context):
+            api = MagicMock(cluster=context)
+            self.clients.append(api)
+            return api
+
+        patch("fleet.new_client", side_effect=new_client).start()
+        ClusterCheck.failing = {"site-2"}
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_resolve_clusters(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml") as kubeconfig:
+            yaml.safe_dump(KUBECONFIG, kubeconfig)
+            kubeconfig.flush()
+
+            self.assertEqual(
+                resolve_clusters([kubeconfig.name], [], all_contexts=True),
+                [
+                    Cluster(kubeconfig.name, "site-1"),
+                    Cluster(kubeconfig.name, "site-2"),
+                ],
+            )
+        self.assertEqual(
+            resolve_clusters([None], ["site-3"]), [Cluster(None, "site-3")]
+        )
+        self.assertEqual(resolve_clusters(["a.yaml"], []), [Cluster("a.yaml", None)])
+
+    def test_run_fleet(self):
+        clusters = [Cluster(None, f"site-{i}") for i in range(1, 4)]
+        streamed = []
+
+        results = run_fleet(
+            clusters, [ClusterCheck()], concurrency=2, on_result=streamed.append
+        )
+
+        self.assertEqual(
+            [result.cluster for result in results], ["site-1", "site-2", "site-3"]
+        )
+        self.assertEqual([result.healthy for result in results], [True, False, True])
+        self.assertEqual(results[1].failed_checks, ["ClusterCheck"])
+        self.assertCountEqual(streamed, results)
+        # every cluster got its own client, closed once checked
+        self.assertEqual(len(self.clients), 3)
+        for api in self.clients:
+            api.close.assert_called_once()
+
+    def test_bounded_concurrency(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        class SlowCheck:
+            def is_healthy(self):
+                with lock:
+                    running.append(1)
+                    peak.append(len(running))
+                threading.Event().wait(0.05)
+                with lock:
+                    running.pop()
+                return True
+
+        run_fleet([Cluster(None, f"site-{i}") for i in range(8)], [SlowCheck()], 3)
+        self.assertLessEqual(max(peak), 3)
+
+    def test_unreachable_cluster(self):
+        patch("fleet.new_client", side_effect=OSError("no such file")).start()
+
+        results = run_fleet([Cluster("missing.yaml")], [ClusterCheck()])
+        self.assertFalse(results[0].healthy)
+        self.assertIn("no such file", results[0].error)
+
+        report = summarize(results)
+        self.assertEqual(report["errors"], 1)
+        self.assertEqual(report["unhealthy"], 1)
+
+    def test_apiserver_down(self):
+        class DownCheck:
+            def is_healthy(self):
+                raise urllib3.exceptions.MaxRetryError(None, "/api/v1/nodes")
+
+        results = run_fleet([Cluster(None, "site-1")], [DownCheck(), ClusterCheck()])
+
+        self.assertFalse(results[0].healthy)
+        self.assertEqual("Unreachable: MaxRetryError", results[0].error)
+        self.assertEqual(["DownCheck", "ClusterCheck"], results[0].failed_checks)
+        self.assertEqual(summarize(results)["errors"], 1)
+
+    def test_summarize(self):
+        results = run_fleet(
+            [Cluster(None, "site-1"), Cluster(None, "site-2")], [ClusterCheck()]
+        )
+        report = summarize(results)
+        self.assertEqual(report["clusters"], 2)
+        self.assertEqual(report["healthy"], 1)
+        self.assertEqual(report["failures_by_check"], {"ClusterCheck": 1})
+        self.assertEqual(len(report["results"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,10 @@
 import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from health_checks import HealthCheck
+from health_checks import HealthCheck, condition_type
 from kubernetes.client.rest import ApiException
+from runner import CheckResult
 
 
 class TestHealthCheck(unittest.TestCase):
@@ -21,9 +22,8 @@ class TestHealthCheck(unittest.TestCase):
         self.custom_create_patcher = patch(
             "kubernetes.client.CustomObjectsApi.create_cluster_custom_object"
         )
-        self.custom_patch_patcher = patch(
-            "kubernetes.client.CustomObjectsApi.patch_cluster_custom_object_status"
-        )
+        # status is written with a server-side apply through call_api
+        self.custom_patch_patcher = patch("kube_client.ApiClient.call_api")
         self.load_config_patcher = patch("kubernetes.config.load_config")
         self.crd_read = self.crd_read_patcher.start()
         self.crd_create = self.crd_create_patcher.start()
@@ -189,6 +189,207 @@ class TestHealthCheck(unittest.TestCase):
             ),
         )
 
+    def test_record_transitions(self):
+        self.hc.events = MagicMock()
+
+        def result(status):
+            return CheckResult("Node Health", "CheckNodes", "platform", status, 0)
+
+        # healthy checks are not reported on their first result
+        self.hc.record_transitions([result("Passed")])
+        self.hc.record_transitions([result("Passed")])
+        self.hc.events.record.assert_not_called()
+
+        self.hc.record_transitions([result("Failed")])
+        self.hc.record_transitions([result("Failed")])
+        self.hc.record_transitions([result("Passed")])
+        self.assertEqual(
+            self.hc.events.record.call_args_list[0].args,
+            (
+                "Warning",
+                "HealthCheckFailed",
+                "Health check Node Health (CheckNodes) is Failed",
+            ),
+        )
+        self.assertEqual(
+            [call.args[:2] for call in self.hc.events.record.call_args_list],
+            [("Warning", "HealthCheckFailed"), ("Normal", "HealthCheckPassed")],
+        )
+
+    def test_restore_state(self):
+        self.hc.update_status(["CheckNodes"], [])
+        self.hc.check_statuses["Node Health"] = "Failed"
+        state = self.hc.to_state()
+        self.crd_read.reset_mock()
+        self.custom_get.reset_mock()
+
+        hc = HealthCheck(state)
+        # no round trips to the apiserver
+        self.crd_read.assert_not_called()
+        self.custom_get.assert_not_called()
+        self.assertEqual(hc.condition_platform.status, "False")
+        self.assertEqual(hc.condition_workloads.status, "True")
+        self.assertEqual(hc.check_statuses, {"Node Health": "Failed"})
+
+        # the resource is recreated if it disappeared since
+        self.custom_patch.reset_mock()
+        self.custom_get.side_effect = ApiException(status=404)
+        with patch("time.sleep"):
+            hc.update_status([], [])
+        self.custom_create.assert_called()
+        self.assertEqual(self.custom_patch.call_count, 2)
+
+    def test_restored_conditions_not_written(self):
+        results = [CheckResult("Node Health", "CheckNodes", "platform", "Failed", 0)]
+        self.hc.update_status(["Node Health"], [], results)
+        hc = HealthCheck(self.hc.to_state())
+        # another replica has written the status since the snapshot
+        self.custom_get.return_value = {
+            "status": {
+                "conditions": [
+                    {
+                        "type": type_,
+                        "status": "True",
+                        "reason": "",
+                        "message": "",
+                        "lastTransitionTime": "2026-01-01T00:00:00Z",
+                    }
+                    for type_ in ("PlatformHealthy", "WorkloadsHealthy", "NodeHealth")
+                ]
+            }
+        }
+        self.custom_get.reset_mock()
+
+        passed = [CheckResult("Node Health", "CheckNodes", "platform", "Passed", 0)]
+        hc.update_status([], [], passed)
+
+        self.custom_get.assert_called()
+        _, kwargs = self.custom_patch.call_args
+        conditions = kwargs["body"]["status"]["conditions"]
+        # transitions are relative to the live conditions, not the snapshot
+        self.assertEqual(
+            ["2026-01-01T00:00:00Z"] * 3,
+            [condition["lastTransitionTime"] for condition in conditions],
+        )
+
+    def test_recreated_resource_gets_current_conditions(self):
+        results = [CheckResult("Node Health", "CheckNodes", "platform", "Failed", 0)]
+        self.custom_patch.side_effect = [ApiException(status=404), None]
+        # recreated by then with conditions of its own
+        self.custom_get.return_value = {
+            "status": {
+                "conditions": [
+                    {"type": type_, "status": "True", "reason": "", "message": ""}
+                    for type_ in ("PlatformHealthy", "WorkloadsHealthy", "NodeHealth")
+                ]
+            }
+        }
+
+        self.hc.update_status(["Node Health"], [], results)
+
+        _, kwargs = self.custom_patch.call_args
+        conditions = kwargs["body"]["status"]["conditions"]
+        self.assertEqual(
+            ["False", "True", "False"],
+            [condition["status"] for condition in conditions],
+        )
+
+    def test_apply_status(self):
+        self.hc.update_status([], [])
+
+        args, kwargs = self.custom_patch.call_args
+        self.assertEqual(
+            args,
+            (
+                "/apis/validator.gdc.gke.io/v1/healthchecks/default/status",
+                "PATCH",
+            ),
+        )
+        self.assertEqual(
+            kwargs["header_params"]["Content-Type"], "application/apply-patch+yaml"
+        )
+        self.assertIn(
+            ("fieldManager", "cluster-health-validator"), kwargs["query_params"]
+        )
+        self.assertEqual(kwargs["body"]["kind"], "HealthCheck")
+        self.assertEqual(kwargs["body"]["metadata"], {"name": "default"})
+
+    def test_check_conditions(self):
+        results = [
+            CheckResult("Node Health", "CheckNodes", "platform", "Passed", 0),
+            CheckResult("VM Workloads Health", "CheckVMs", "workload", "Failed", 0),
+        ]
+        self.hc.update_status([], ["VM Workloads Health"], results)
+
+        _, kwargs = self.custom_patch.call_args
+        conditions = kwargs["body"]["status"]["conditions"]
+        self.assertEqual(
+            [condition["type"] for condition in conditions],
+            ["PlatformHealthy", "WorkloadsHealthy", "NodeHealth", "VMWorkloadsHealth"],
+        )
+        self.assertEqual(
+            HealthCheck.HealthCheckCondition(**conditions[3]),
+            HealthCheck.HealthCheckCondition(
+                type="VMWorkloadsHealth",
+                status="False",
+                reason="HealthCheckFailed",
+                message="Health check VM Workloads Health (CheckVMs) is Failed",
+            ),
+        )
+
+        # conditions of checks without a result are dropped
+        self.hc.update_status([], [], results[:1])
+        _, kwargs = self.custom_patch.call_args
+        conditions = kwargs["body"]["status"]["conditions"]
+        self.assertEqual(
+            [condition["type"] for condition in conditions],
+            ["PlatformHealthy", "WorkloadsHealthy", "NodeHealth"],
+        )
+
+        # check conditions are restored
+        hc = HealthCheck(self.hc.to_state())
+        self.assertEqual(list(hc.check_conditions), ["NodeHealth"])
+
+    def test_skips_unchanged_status(self):
+        results = [CheckResult("Node Health", "CheckNodes", "platform", "Passed", 0)]
+        self.custom_patch.reset_mock()
+
+        self.hc.update_status([], [], results)
+        self.hc.update_status([], [], results)
+        self.assertEqual(self.custom_patch.call_count, 1)
+
+        results = [CheckResult("Node Health", "CheckNodes", "platform", "Failed", 0)]
+        self.hc.update_status([], [], results)
+        self.assertEqual(self.custom_patch.call_count, 2)
+
+        # unchanged conditions are applied again after the heartbeat interval
+        with patch("time.monotonic", return_value=time.monotonic() + 3600):
+            self.hc.update_status([], [], results)
+        self.assertEqual(self.custom_patch.call_count, 3)
+
+    def test_load_conditions_by_type(self):
+        self.custom_get.return_value = {
+            "status": {
+                "conditions": [
+                    {"type": type_, "status": status, "reason": "", "message": ""}
+                    for type_, status in (
+                        ("NodeHealth", "True"),
+                        ("WorkloadsHealthy", "False"),
+                        ("PlatformHealthy", "True"),
+                    )
+                ]
+            }
+        }
+
+        hc = HealthCheck()
+        self.assertEqual(hc.condition_workloads.status, "False")
+        self.assertEqual(hc.condition_platform.status, "True")
+        self.assertEqual(list(hc.check_conditions), ["NodeHealth"])
+
+    def test_condition_type(self):
+        self.assertEqual(condition_type("VM Workloads Health"), "VMWorkloadsHealth")
+        self.assertEqual(condition_type("node-health check"), "NodeHealthCheck")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,140 @@
+import gc
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import json_decode
+from json_decode import ListStream, list_items
+from kube_client import ApiClient
+
+_LIST = {
+    "apiVersion": "vm.cluster.gke.io/v1",
+    "items": [
+        {"metadata": {"name": "vm-1", "labels": {"ü": "ß"}}, "spec": {"cpus": 12}},
+        {"metadata": {"name": "vm-2"}, "status": {"state": "Running"}},
+    ],
+    "kind": "VirtualMachineList",
+    "metadata": {"continue": "", "resourceVersion": "1234"},
+}
+
+
+def chunked(data: bytes, size: int):
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+class TestLoads(unittest.TestCase):
+    def test_decodes_bytes_and_str(self):
+        self.assertEqual(_LIST, json_decode.loads(json.dumps(_LIST).encode()))
+        self.assertEqual(_LIST, json_decode.loads(json.dumps(_LIST)))
+
+    def test_falls_back_to_json(self):
+        self.assertEqual({"n": 2**70}, json_decode.loads(b'{"n": %d}' % 2**70))
+        with patch("json_decode._USE_ORJSON", False):
+            self.assertEqual(_LIST, json_decode.loads(json.dumps(_LIST)))
+
+    def test_invalid_json(self):
+        with self.assertRaises(ValueError):
+            json_decode.loads(b"not json")
+
+    def test_pauses_garbage_collector(self):
+        enabled = []
+        with patch("json_decode._USE_ORJSON", False), patch(
+            "json.loads", side_effect=lambda data: enabled.append(gc.isenabled())
+        ):
+            json_decode.loads(b"{}")
+            with patch("json_decode._PAUSE_GC", True):
+                json_decode.loads(b"{}")
+        with json_decode._gc_paused():
+            with json_decode._gc_paused():
+                pass
+            self.assertFalse(gc.isenabled())
+
+        # only when enabled
+        self.assertEqual([True, False], enabled)
+        self.assertTrue(gc.isenabled())
+
+    def test_concurrent_garbage_collector_pauses(self):
+        first_paused, second_paused = threading.Event(), threading.Event()
+        first_done = threading.Event()
+        enabled = []
+
+        def first():
+            with json_decode._gc_paused():
+                first_paused.set()
+                second_paused.wait(5)
+            first_done.set()
+
+        thread = threading.Thread(target=first)
+        thread.start()
+        first_paused.wait(5)
+        with json_decode._gc_paused():
+            second_paused.set()
+            first_done.wait(5)
+            # the end of the first pause does not resume collections
+            enabled.append(gc.isenabled())
+        thread.join()
+
+        self.assertEqual([False], enabled)
+        self.assertTrue(gc.isenabled())
+
+
+class TestListStream(unittest.TestCase):
+    def test_decodes_items_in_any_chunks(self):
+        data = json.dumps(_LIST, ensure_ascii=False, indent=1).encode()
+        # Chunks of one byte split multi-byte characters, numbers and keys
+        for size in (1, 2, 7, 64, len(data)):
+            stream = ListStream(chunked(data, size))
+
+            self.assertEqual(_LIST["items"], list(stream), size)
+            self.assertEqual(
+                {key: _LIST[key] for key in ("apiVersion", "kind", "metadata")},
+                stream.fields,
+            )
+
+    def test_yields_items_before_the_body_ends(self):
+        def chunks():
+            yield b'{"items": [{"name": "a"}, '
+            raise AssertionError("read past the first item")
+
+        self.assertEqual({"name": "a"}, next(iter(ListStream(chunks()))))
+
+    def test_empty_lists(self):
+        self.assertEqual([], list(ListStream([b'{"items": [], "kind": "List"}'])))
+        self.assertEqual([], list(ListStream([b'{"items": null}'])))
+        self.assertEqual([], list(ListStream([b"{}"])))
+
+    def test_truncated_body(self):
+        with self.assertRaises(ValueError):
+            list(ListStream([b'{"items": [{"name": "a"}, {"na']))
+        with self.assertRaises(ValueError):
+            list(ListStream([b"[]"]))
+
+
+class TestListItems(unittest.TestCase):
+    def test_streams_response_and_releases_connection(self):
+        response = MagicMock()
+        response.stream.return_value = chunked(json.dumps(_LIST).encode(), 10)
+        list_method = MagicMock(return_value=response)
+
+        items = list(list_items(list_method, "vms", label_selector="a=b"))
+
+        self.assertEqual(_LIST["items"], items)
+        list_method.assert_called_once_with(
+            "vms", _preload_content=False, label_selector="a=b"
+        )
+        response.release_conn.assert_called_once()
+
+
+class TestDeserialize(unittest.TestCase):
+    def test_deserializes_objects_and_models(self):
+        api = ApiClient()
+        response = MagicMock(data=json.dumps(_LIST).encode())
+
+        self.assertEqual(_LIST, api.deserialize(response, "object"))
+        nodes = api.deserialize(
+            MagicMock(data=b'{"items": [{"metadata": {"name": "node-1"}}]}'),
+            "V1NodeList",
+        )
+        self.assertEqual("node-1", nodes.items[0].metadata.name)
+        self.assertEqual("text", api.deserialize(MagicMock(data="text"), "str"))
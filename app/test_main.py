@@ -0,0 +1,128 @@
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Wall clock budget for CLI invocations that do not run checks. Interpreter
+# startup alone takes a few tens of milliseconds, importing kubernetes takes
+# several hundred.
+_STARTUP_BUDGET_SECONDS = float(os.environ.get("CLI_STARTUP_BUDGET_SECONDS", 1.0))
+
+
+def run_cli(*args):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", _APP_DIR, *args],
+        capture_output=True,
+        text=True,
+        # Make sure the CLI cannot find a cluster to talk to
+        env=os.environ | {"KUBECONFIG": os.devnull},
+    )
+    return proc, time.perf_counter() - start
+
+
+def load_cli():
+    spec = importlib.util.spec_from_file_location(
+        "cli", os.path.join(_APP_DIR, "__main__.py")
+    )
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+    return cli
+
+
+def imported_modules(importtime_output):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in importtime_output.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+
+
+class TestCLIStartup(unittest.TestCase):
+    def assert_fast_startup(self, proc, elapsed):
+        modules = imported_modules(proc.stderr)
+        self.assertNotIn("kubernetes", modules)
+        self.assertNotIn("pydantic", modules)
+        self.assertLess(
+            elapsed,
+            _STARTUP_BUDGET_SECONDS,
+            f"CLI startup took {elapsed:.2f}s, budget is {_STARTUP_BUDGET_SECONDS}s",
+        )
+
+    def test_help(self):
+        proc, elapsed = run_cli("--help")
+        self.assertEqual(proc.returncode, 0)
+        self.assertIn("--health-check", proc.stdout)
+        self.assert_fast_startup(proc, elapsed)
+
+    def test_argument_error(self):
+        proc, elapsed = run_cli("--interval", "not-a-number")
+        self.assertEqual(proc.returncode, 2)
+        self.assert_fast_startup(proc, elapsed)
+
+    def test_unknown_health_check(self):
+        proc, elapsed = run_cli("--health-check", "checkdoesnotexist")
+        self.assertEqual(proc.returncode, 1)
+        self.assertIn("Unknown health check specified: checkdoesnotexist", proc.stdout)
+        self.assert_fast_startup(proc, elapsed)
+
+
+class TestCheckParameters(unittest.TestCase):
+    def setUp(self):
+        self.cli = load_cli()
+
+    def build(self, *health_check):
+        return self.cli.build_health_checks(
+            argparse.Namespace(health_check=[list(health_check)])
+        )
+
+    def test_selector_values(self):
+        (check,) = self.build(
+            "checkvirtualmachines",
+            "namespace_selector=env=prod",
+            "label_selector=tier=db,zone in (a,b)",
+        )
+        self.assertEqual("env=prod", check.params.namespace_selector)
+        self.assertEqual("tier=db,zone in (a,b)", check.params.label_selector)
+
+    def test_list_and_mapping_values(self):
+        (check,) = self.build(
+            "checkdatavolumes", "namespaces=vm-a,vm-b", "counts=vm-a=3,vm-b=1"
+        )
+        self.assertEqual(["vm-a", "vm-b"], check.params.namespaces)
+        self.assertEqual({"vm-a": 3, "vm-b": 1}, check.params.counts)
+
+    def test_single_predicate(self):
+        (check,) = self.build(
+            "checkresource",
+            "version=v1",
+            "plural=nodes",
+            "predicates=spec.unschedulable",
+        )
+        self.assertEqual(["spec.unschedulable"], check.params.predicates)
+
+    def test_invalid_parameters(self):
+        with self.assertRaisesRegex(
+            self.cli.ParameterError, "invalid parameters of checkdatavolumes: counts"
+        ):
+            self.build("checkdatavolumes", "namespaces=vm-a", "counts=vm-a=many")
+        with self.assertRaisesRegex(
+            self.cli.ParameterError, "One of namespace, namespaces or"
+        ):
+            self.build("checkvirtualmachines", "count=3")
+
+    def test_invalid_parameters_usage_error(self):
+        proc, _ = run_cli("--health-check", "checkdatavolumes", "counts=vm-a")
+        self.assertEqual(proc.returncode, 2)
+        self.assertIn("invalid parameters of checkdatavolumes", proc.stderr)
+        self.assertNotIn("Traceback", proc.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+_SET_GAUGE = """
+import sys
+from prometheus_client import Gauge
+Gauge("platform_health", "Platform Checks", multiprocess_mode="livemostrecent").set(
+    float(sys.argv[1])
+)
+"""
+
+_GENERATE = """
+from metrics import generate_metrics
+print(generate_metrics().decode())
+"""
+
+_REPORT_NAMESPACES = """
+import warnings
+from metrics import generate_metrics
+from workload_namespaces import report
+
+warnings.simplefilter("error")
+report("virtualmachines", {"a": True, "b": True})
+report("virtualmachines", {"a": True})
+print(generate_metrics().decode())
+"""
+
+
+class TestMetrics(unittest.TestCase):
+    def run_python(self, script, *args, **env):
+        return subprocess.run(
+            [sys.executable, "-c", script, *args],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=os.environ | env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+
+    def test_multiprocess(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # two workers publishing results, the latest one wins
+            self.run_python(_SET_GAUGE, "0", PROMETHEUS_MULTIPROC_DIR=directory)
+            self.run_python(_SET_GAUGE, "1", PROMETHEUS_MULTIPROC_DIR=directory)
+
+            output = self.run_python(_GENERATE, PROMETHEUS_MULTIPROC_DIR=directory)
+        self.assertIn("platform_health 1.0", output)
+
+    def test_multiprocess_stale_samples(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = self.run_python(
+                _REPORT_NAMESPACES, PROMETHEUS_MULTIPROC_DIR=directory
+            )
+        self.assertIn(
+            'workload_namespace_health{namespace="a",resource="virtualmachines"} 1.0',
+            output,
+        )
+        # samples cannot be removed from the files of multiprocess mode
+        self.assertIn(
+            'workload_namespace_health{namespace="b",resource="virtualmachines"} 0.0',
+            output,
+        )
+
+    def test_single_process(self):
+        env = dict(os.environ)
+        env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        output = subprocess.run(
+            [sys.executable, "-c", _GENERATE],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        self.assertIn("python_info", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
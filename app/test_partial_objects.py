@@ -0,0 +1,132 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from check_data_volumes import CheckDataVolumes
+from kubernetes import watch
+from partial_objects import list_table, resource_path, watch_metadata
+
+DATA_VOLUME_TABLE = {
+    "kind": "Table",
+    "columnDefinitions": [
+        {"name": "Name"},
+        {"name": "Phase"},
+        {"name": "Progress"},
+        {"name": "Restarts"},
+        {"name": "Age"},
+    ],
+    "rows": [
+        {
+            "cells": ["dv1", "Succeeded", "100.0%", "", "5d"],
+            "object": {"metadata": {"name": "dv1", "namespace": "tenant-a"}},
+        },
+        {
+            "cells": ["dv2", "ImportInProgress", "42.0%", "", "1m"],
+            "object": {"metadata": {"name": "dv2", "namespace": "tenant-b"}},
+        },
+    ],
+}
+
+
+class TestPartialObjects(unittest.TestCase):
+    def setUp(self):
+        self.api_client_patcher = patch("partial_objects.api_client")
+        self.mock_api_client = self.api_client_patcher.start().return_value
+        self.mock_api_client.call_api.return_value = DATA_VOLUME_TABLE
+
+    def tearDown(self):
+        self.api_client_patcher.stop()
+
+    def test_resource_path(self):
+        self.assertEqual(resource_path("", "v1", "pods"), "/api/v1/pods")
+        self.assertEqual(
+            resource_path("cdi.kubevirt.io", "v1beta1", "datavolumes", "ns"),
+            "/apis/cdi.kubevirt.io/v1beta1/namespaces/ns/datavolumes",
+        )
+
+    def test_list_table(self):
+        items = list_table(
+            "/apis/cdi.kubevirt.io/v1beta1/datavolumes",
+            {"phase": "Phase", "progress": "Progress"},
+            [("labelSelector", "tier=db")],
+        )
+        self.assertEqual(
+            items[1],
+            {
+                "metadata": {"name": "dv2", "namespace": "tenant-b"},
+                "status": {"phase": "ImportInProgress", "progress": "42.0%"},
+            },
+        )
+
+        args, kwargs = self.mock_api_client.call_api.call_args
+        self.assertEqual(args, ("/apis/cdi.kubevirt.io/v1beta1/datavolumes", "GET"))
+        self.assertEqual(
+            kwargs["header_params"],
+            {"Accept": "application/json;as=Table;g=meta.k8s.io;v=v1"},
+        )
+        self.assertEqual(
+            kwargs["query_params"],
+            [("labelSelector", "tier=db"), ("includeObject", "Metadata")],
+        )
+
+    def test_list_table_missing_column(self):
+        self.assertIsNone(list_table("/apis/x/v1/ys", {"state": "Status"}))
+
+    def test_watch_metadata(self):
+        events = [
+            {
+                "type": "MODIFIED",
+                "object": {
+                    "kind": "PartialObjectMetadata",
+                    "metadata": {"name": "node-1", "resourceVersion": "11"},
+                },
+            }
+        ]
+        response = self.mock_api_client.call_api.return_value = MagicMock()
+        response.stream.return_value = [
+            json.dumps(event).encode() + b"\n" for event in events
+        ]
+
+        streamed = list(
+            watch.Watch().stream(
+                watch_metadata,
+                "/api/v1/nodes",
+                resource_version="10",
+                timeout_seconds=60,
+            )
+        )
+
+        self.assertEqual(
+            ["node-1"], [event["object"]["metadata"]["name"] for event in streamed]
+        )
+        args, kwargs = self.mock_api_client.call_api.call_args
+        self.assertEqual(args, ("/api/v1/nodes", "GET"))
+        self.assertEqual(
+            kwargs["header_params"],
+            {"Accept": "application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1"},
+        )
+        self.assertEqual(
+            kwargs["query_params"],
+            [("watch", True), ("resourceVersion", "10"), ("timeoutSeconds", 60)],
+        )
+        self.assertFalse(kwargs["_preload_content"])
+
+    def test_workload_check_table_format(self):
+        params = {
+            "namespaces": ["tenant-a", "tenant-b"],
+            "list_format": "table",
+        }
+        with patch("check_data_volumes.client") as k8s_client, patch(
+            "check_data_volumes.report"
+        ) as report:
+            self.assertFalse(CheckDataVolumes(parameters=params).is_healthy())
+
+        k8s_client.CustomObjectsApi.return_value.list_cluster_custom_object.assert_not_called()
+        self.assertEqual(
+            report.call_args.args[:2],
+            ("datavolumes", {"tenant-a": True, "tenant-b": False}),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+from predicates import PredicateError, compile_predicate
+
+ROBIN_CLUSTER = {
+    "metadata": {"name": "robin"},
+    "spec": {"replicas": 3},
+    "status": {
+        "phase": "Ready",
+        "progress": "100.0%",
+        "ready": True,
+        "conditions": [
+            {"type": "Progressing", "status": "False"},
+            {"type": "Ready", "status": "True"},
+        ],
+        "robin_node_status": [{"host_name": "node-1", "state": "ONLINE"}],
+    },
+}
+
+
+class TestPredicates(unittest.TestCase):
+    def assertMatches(self, expression, obj=ROBIN_CLUSTER):
+        self.assertTrue(compile_predicate(expression)(obj), expression)
+
+    def assertNotMatches(self, expression, obj=ROBIN_CLUSTER):
+        self.assertFalse(compile_predicate(expression)(obj), expression)
+
+    def test_equality(self):
+        self.assertMatches("status.phase == Ready")
+        self.assertMatches('status.phase == "Ready"')
+        self.assertNotMatches("status.phase == Pending")
+        self.assertMatches("status.phase != Pending")
+        self.assertMatches("spec.replicas == 3")
+
+    def test_condition_selector(self):
+        self.assertMatches("status.conditions[type=Ready].status == True")
+        self.assertNotMatches("status.conditions[type=Progressing].status == True")
+        self.assertNotMatches("status.conditions[type=Stalled].status == True")
+
+    def test_booleans_compare_case_insensitively(self):
+        self.assertMatches("status.ready == true")
+        self.assertMatches("status.ready == True")
+        self.assertMatches("status.conditions[type=Ready].status == true")
+
+    def test_index(self):
+        self.assertMatches("status.robin_node_status[0].state == ONLINE")
+        self.assertMatches("status.robin_node_status[-1].host_name == node-1")
+        self.assertNotMatches("status.robin_node_status[1].state == ONLINE")
+
+    def test_membership(self):
+        self.assertMatches("status.phase in [Ready, Running]")
+        self.assertNotMatches("status.phase not in [Ready, Running]")
+        self.assertMatches("status.phase not in [Failed]")
+
+    def test_ordering(self):
+        self.assertMatches("status.progress >= 100")
+        self.assertNotMatches("status.progress < 100")
+        self.assertMatches("spec.replicas > 2")
+        self.assertNotMatches("status.phase > 2")
+
+    def test_presence(self):
+        self.assertMatches("status.ready")
+        self.assertNotMatches("status.missing")
+        self.assertMatches("status.conditions[type=Ready].status")
+        self.assertNotMatches("status.conditions[type=Progressing].status")
+        self.assertMatches("status.missing == null")
+        self.assertMatches("status.missing != Ready")
+        self.assertNotMatches("status.phase == Ready", {"metadata": {"name": "new"}})
+
+    def test_bare_path_requires_true(self):
+        for value in (True, "True", "true"):
+            self.assertMatches("status.value", {"status": {"value": value}})
+        for value in (False, "False", "Unknown", "", {}, [], {"a": 1}, [1], 1, 0):
+            with self.subTest(value=value):
+                self.assertNotMatches("status.value", {"status": {"value": value}})
+
+    def test_compiled_once(self):
+        self.assertIs(
+            compile_predicate("status.phase == Ready"),
+            compile_predicate("status.phase == Ready"),
+        )
+
+    def test_invalid_predicates(self):
+        for expression in (
+            "",
+            "status.phase ==",
+            "status.phase in Ready",
+            "status.progress >= done",
+            "items[first].name == a",
+        ):
+            with self.subTest(expression=expression):
+                with self.assertRaises(PredicateError):
+                    compile_predicate(expression)
+
+
+if __name__ == "__main__":
+    unittest.main()
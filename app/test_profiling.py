@@ -0,0 +1,87 @@
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+
+from profiling import CycleProfiler
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+class TestCycleProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profiler = CycleProfiler(self.tmp.name, sample_interval=0.001)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cycle(self):
+        def check(name, work):
+            with self.profiler.check(name):
+                work()
+
+        with self.profiler.cycle():
+            threads = [
+                threading.Thread(target=check, args=("CheckBusy", lambda: busy(0.05))),
+                threading.Thread(target=check, args=("CheckIdle", lambda: time.sleep(0.05))),
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    def test_unarmed(self):
+        self.run_cycle()
+        self.assertEqual(self.profiler.artifacts(), [])
+
+    def test_armed(self):
+        self.profiler.arm(1)
+        self.assertEqual(self.profiler.remaining, 1)
+        self.run_cycle()
+        self.assertEqual(self.profiler.remaining, 0)
+
+        artifacts = self.profiler.artifacts()
+        self.assertEqual(
+            sorted(os.path.basename(artifact) for artifact in artifacts),
+            ["checks.json", "profile.collapsed", "profile.pstats", "tracemalloc.txt"],
+        )
+        cycle_dir = os.path.join(self.tmp.name, os.path.dirname(artifacts[0]))
+
+        with open(os.path.join(cycle_dir, "checks.json")) as f:
+            checks = json.load(f)
+        self.assertGreaterEqual(checks["CheckBusy"]["wall_seconds"], 0.05)
+        self.assertGreater(checks["CheckBusy"]["cpu_seconds"], 0.01)
+        self.assertGreaterEqual(checks["CheckIdle"]["wall_seconds"], 0.05)
+        self.assertLess(checks["CheckIdle"]["cpu_seconds"], 0.05)
+
+        stats = pstats.Stats(os.path.join(cycle_dir, "profile.pstats"))
+        self.assertIn("busy", {func[2] for func in stats.stats})
+
+        with open(os.path.join(cycle_dir, "profile.collapsed")) as f:
+            collapsed = f.read()
+        self.assertIn("busy (test_profiling.py", collapsed)
+
+        # Following cycles are not profiled
+        self.run_cycle()
+        self.assertEqual(len(self.profiler.artifacts()), 4)
+
+    def test_armed_multiple_cycles(self):
+        self.profiler.arm(2)
+        for _ in range(3):
+            self.run_cycle()
+        cycles = {os.path.dirname(artifact) for artifact in self.profiler.artifacts()}
+        self.assertEqual(len(cycles), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
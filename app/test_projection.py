@@ -0,0 +1,77 @@
+import unittest
+
+from projection import Projection, projection
+
+_VM = {
+    "apiVersion": "vm.cluster.gke.io/v1",
+    "kind": "VirtualMachine",
+    "metadata": {
+        "name": "vm-1",
+        "namespace": "vms",
+        "annotations": {"a": "b"},
+        "managedFields": [{"manager": "kubectl"}],
+    },
+    "spec": {"running": True},
+    "status": {"state": "Running", "conditions": [{"type": "Ready"}]},
+}
+
+
+class TestProjection(unittest.TestCase):
+    def test_keeps_only_projected_fields(self):
+        vm = Projection(["metadata.name", "status.state"])(_VM)
+
+        self.assertEqual(
+            {"metadata": {"name": "vm-1"}, "status": {"state": "Running"}},
+            vm.to_dict(),
+        )
+        self.assertFalse(hasattr(vm, "__dict__"))
+
+    def test_reads_like_a_dict(self):
+        vm = Projection(["metadata.name", "status.state", "status.conditions"])(_VM)
+
+        self.assertEqual("Running", vm.get("status").get("state"))
+        self.assertEqual("vm-1", vm["metadata"]["name"])
+        self.assertEqual([{"type": "Ready"}], vm["status"]["conditions"])
+        self.assertIn("status", vm)
+        self.assertNotIn("spec", vm)
+        self.assertIsNone(vm.get("spec"))
+        with self.assertRaises(KeyError):
+            vm["metadata"]["namespace"]
+
+    def test_missing_fields(self):
+        vm = Projection(["metadata.name", "status.state"])(
+            {"metadata": {"name": "vm-1"}, "status": None}
+        )
+
+        self.assertIsNone(vm.get("status"))
+        self.assertEqual({}, vm.get("status", {}))
+
+    def test_dict_without_projected_fields(self):
+        vm = Projection(["metadata.name", "status.state"])(
+            {"metadata": {"name": "vm-1"}, "status": {"conditions": []}}
+        )
+
+        self.assertIsNotNone(vm.get("status"))
+        self.assertIsNone(vm.get("status").get("state"))
+        self.assertIn("status", vm)
+        self.assertEqual({"metadata": {"name": "vm-1"}, "status": {}}, vm.to_dict())
+
+    def test_parent_field_is_kept_whole(self):
+        project = Projection(["status.state", "status", "metadata.name"])
+
+        self.assertEqual(("metadata.name", "status"), project.fields)
+        self.assertEqual(_VM["status"], project(_VM)["status"])
+
+    def test_interns_strings(self):
+        project = Projection(["status.state"])
+        states = [
+            project({"status": {"state": "".join(["Run", "ning"])}}) for _ in range(2)
+        ]
+
+        self.assertIs(states[0]["status"]["state"], states[1]["status"]["state"])
+
+    def test_shares_projections_of_same_fields(self):
+        self.assertIs(
+            projection(("metadata.name", "status.phase")),
+            projection(("metadata.name", "status.phase")),
+        )
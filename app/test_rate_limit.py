@@ -0,0 +1,111 @@
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import MagicMock, patch
+
+import kube_client
+from fakes import FakeClock
+from kubernetes.client.rest import ApiException
+from rate_limit import TokenBucket, retry_after_seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(qps=5, burst=3, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_qps(self):
+        waits = [self.bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertAlmostEqual(waits[3], 0.2)
+        self.assertAlmostEqual(waits[4], 0.2)
+
+    def test_refills_while_idle(self):
+        for _ in range(3):
+            self.bucket.acquire()
+        self.clock.now += 10
+        self.assertEqual([self.bucket.acquire() for _ in range(3)], [0, 0, 0])
+
+    def test_pause(self):
+        self.bucket.pause(2)
+        self.assertAlmostEqual(self.bucket.acquire(), 2)
+        self.assertEqual(self.bucket.acquire(), 0)
+
+    def test_disabled(self):
+        bucket = TokenBucket(qps=0, burst=1, clock=self.clock, sleep=self.clock.sleep)
+        self.assertFalse(bucket.enabled)
+        self.assertEqual([bucket.acquire() for _ in range(100)], [0] * 100)
+        self.assertEqual(self.clock.sleeps, [])
+
+    @patch.dict("os.environ", {"KUBE_API_QPS": "20", "KUBE_API_BURST": "40"})
+    def test_from_env(self):
+        bucket = TokenBucket.from_env()
+        self.assertEqual(bucket.qps, 20)
+        self.assertEqual(bucket.burst, 40)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(retry_after_seconds({"Retry-After": "3"}), 3)
+
+    def test_http_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        seconds = retry_after_seconds({"Retry-After": format_datetime(retry_at)})
+        self.assertGreater(seconds, 25)
+        self.assertLessEqual(seconds, 30)
+
+    def test_missing_or_invalid(self):
+        self.assertEqual(retry_after_seconds(None), 1)
+        self.assertEqual(retry_after_seconds({"Retry-After": "soon"}), 1)
+
+
+class TestApiClientRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(qps=5, burst=1, clock=self.clock, sleep=self.clock.sleep)
+        patch.object(kube_client, "rate_limiter", self.bucket).start()
+        self.response = MagicMock(status=200, data=json.dumps({"items": []}).encode())
+        self.base_request = patch("kubernetes.client.ApiClient.request").start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def throttled(self, retry_after="2"):
+        e = ApiException(status=429)
+        e.headers = {"Retry-After": retry_after}
+        return e
+
+    def test_requests_wait_on_limiter(self):
+        self.base_request.return_value = self.response
+        api = kube_client.ApiClient()
+        api.request("GET", "https://apiserver/api/v1/nodes")
+        api.request("GET", "https://apiserver/api/v1/nodes")
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.2)
+
+    def test_retry_after_on_429(self):
+        self.base_request.side_effect = [self.throttled(), self.response]
+        api = kube_client.ApiClient()
+        response = api.request("GET", "https://apiserver/api/v1/nodes")
+        self.assertIs(response, self.response)
+        self.assertEqual(self.base_request.call_count, 2)
+        self.assertAlmostEqual(self.clock.sleeps[0], 2)
+
+    def test_gives_up_after_repeated_429(self):
+        self.base_request.side_effect = [self.throttled("0")] * 3
+        api = kube_client.ApiClient()
+        with self.assertRaises(ApiException):
+            api.request("GET", "https://apiserver/api/v1/nodes")
+        self.assertEqual(self.base_request.call_count, 3)
+
+    def test_other_errors_are_not_retried(self):
+        self.base_request.side_effect = ApiException(status=403)
+        api = kube_client.ApiClient()
+        with self.assertRaises(ApiException):
+            api.request("GET", "https://apiserver/api/v1/nodes")
+        self.assertEqual(self.base_request.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
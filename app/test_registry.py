@@ -0,0 +1,81 @@
+import unittest
+from importlib.metadata import EntryPoint
+from unittest.mock import patch
+
+from registry import ENTRY_POINT_GROUP, CheckRegistry
+
+
+class FakeCheck:
+    def is_healthy(self):
+        return True
+
+
+class TestCheckRegistry(unittest.TestCase):
+    def setUp(self):
+        self.entry_points_patcher = patch("registry.entry_points", return_value=[])
+        self.entry_points = self.entry_points_patcher.start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_builtin_lookup_is_case_insensitive(self):
+        registry = CheckRegistry()
+        from check_nodes import CheckNodes
+
+        self.assertIs(registry["CheckNodes"], CheckNodes)
+        self.assertIs(registry["checknodes"], CheckNodes)
+        self.assertIn("CHECKNODES", registry)
+        self.assertEqual(registry.canonical_name("checkvmruntime"), "CheckVMRuntime")
+
+    def test_builtin_lookup_does_not_scan_entry_points(self):
+        registry = CheckRegistry()
+        _ = registry["CheckNodes"]
+        self.entry_points.assert_not_called()
+
+    @patch("registry.importlib.import_module")
+    def test_modules_imported_on_lookup(self, import_module):
+        registry = CheckRegistry(
+            {"CheckFake": "fake_module:FakeCheck", "CheckOther": "other:Check"}
+        )
+        import_module.assert_not_called()
+
+        import_module.return_value.FakeCheck = FakeCheck
+        self.assertIs(registry["checkfake"], FakeCheck)
+        self.assertIs(registry["CheckFake"], FakeCheck)
+        import_module.assert_called_once_with("fake_module")
+
+    def test_entry_point_checks(self):
+        self.entry_points.return_value = [
+            EntryPoint(
+                name="CheckFake",
+                value="test_registry:FakeCheck",
+                group=ENTRY_POINT_GROUP,
+            ),
+            EntryPoint(
+                name="CheckNodes",
+                value="test_registry:FakeCheck",
+                group=ENTRY_POINT_GROUP,
+            ),
+        ]
+        registry = CheckRegistry()
+
+        self.assertIs(registry["checkfake"], FakeCheck)
+        self.entry_points.assert_called_once_with(group=ENTRY_POINT_GROUP)
+        # built-in checks cannot be overridden
+        self.assertIsNot(registry["CheckNodes"], FakeCheck)
+        self.assertIn("CheckFake", list(registry))
+
+    def test_unknown_check(self):
+        registry = CheckRegistry()
+        self.assertNotIn("CheckDoesNotExist", registry)
+        with self.assertRaises(KeyError):
+            _ = registry["CheckDoesNotExist"]
+
+    def test_register(self):
+        registry = CheckRegistry()
+        registry.register("CheckFake", FakeCheck)
+        self.assertIs(registry["checkfake"], FakeCheck)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from check_resource import CheckResource
+from fakes import FakeClock
+from result_cache import ResultCache, parse_ttls
+
+
+class CheckVMRuntime:
+    def is_healthy(self):
+        return True
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.clock = FakeClock()
+
+    def cache(self, cluster="https://a:6443", default_ttl=0, ttls=None):
+        return ResultCache(
+            cluster,
+            default_ttl,
+            ttls,
+            directory=self.directory,
+            clock=self.clock,
+        )
+
+    def test_parse_ttls(self):
+        self.assertEqual(
+            (300.0, {"checkvmruntime": 60.0}),
+            parse_ttls(["checkVMRuntime=60", "300"]),
+        )
+        with self.assertRaises(ValueError):
+            parse_ttls(["checkvmruntime=soon"])
+
+    def test_reuses_passing_result_within_ttl(self):
+        check = CheckVMRuntime()
+        self.cache(ttls={"checkvmruntime": 60}).record(check, True)
+
+        self.clock.now += 30
+        self.assertTrue(self.cache(ttls={"checkvmruntime": 60}).passed(check))
+        self.clock.now += 31
+        self.assertFalse(self.cache(ttls={"checkvmruntime": 60}).passed(check))
+
+    def test_failing_result_drops_cached_result(self):
+        check = CheckVMRuntime()
+        cache = self.cache(default_ttl=60)
+        cache.record(check, True)
+
+        cache.record(check, False)
+
+        self.assertFalse(cache.passed(check))
+
+    def test_checks_without_ttl_are_not_cached(self):
+        check = CheckVMRuntime()
+        cache = self.cache(ttls={"checknodes": 60})
+        cache.record(check, True)
+
+        self.assertFalse(cache.passed(check))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_keyed_by_cluster_and_parameters(self):
+        parameters = {"version": "v1", "plural": "nodes", "count": 3}
+        check = CheckResource(parameters)
+        self.cache(default_ttl=60).record(check, True)
+
+        self.assertTrue(self.cache(default_ttl=60).passed(CheckResource(parameters)))
+        self.assertFalse(
+            self.cache(default_ttl=60).passed(CheckResource(parameters | {"count": 4}))
+        )
+        self.assertFalse(self.cache("https://b:6443", default_ttl=60).passed(check))
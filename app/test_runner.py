@@ -0,0 +1,398 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from circuit_breaker import CircuitOpenError
+from config import Config
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import MaxRetryError
+from runner import CheckResult, CheckRunner, UnknownCheckError
+
+
+class FakeCheck:
+    calls = 0
+    healthy = True
+    release = None
+
+    def __init__(self, parameters: dict = None) -> None:
+        self.parameters = parameters
+
+    def is_healthy(self):
+        FakeCheck.calls += 1
+        if FakeCheck.release is not None:
+            FakeCheck.release.wait(5)
+        return FakeCheck.healthy
+
+
+class NotFoundCheck:
+    api_resources = [("manage.robin.io", "v1", "robinclusters")]
+
+    def is_healthy(self):
+        raise ApiException(status=404)
+
+
+class TestCheckRunner(unittest.TestCase):
+    def setUp(self):
+        FakeCheck.calls = 0
+        FakeCheck.healthy = True
+        FakeCheck.release = None
+        self.app_config = Config(
+            platform_checks=[
+                {"name": "Fake Platform", "module": "FakeCheck"},
+                {"name": "Missing CRD", "module": "NotFoundCheck"},
+            ],
+            workload_checks=[
+                {
+                    "name": "Fake Workload",
+                    "module": "FakeCheck",
+                    "parameters": {"namespace": "vm-workloads"},
+                },
+            ],
+        )
+        self.read_config_patcher = patch(
+            "runner.read_config", return_value=self.app_config
+        )
+        self.read_config_patcher.start()
+        self.on_cycle_complete = MagicMock()
+        self.runner = CheckRunner(
+            {"FakeCheck": FakeCheck, "NotFoundCheck": NotFoundCheck},
+            on_cycle_complete=self.on_cycle_complete,
+        )
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_run_all(self):
+        cycle = self.runner.run()
+        self.assertEqual(
+            [result.name for result in cycle.results],
+            ["Fake Platform", "Missing CRD", "Fake Workload"],
+        )
+        self.assertEqual(cycle.platform_checks_failed, ["NotFoundCheck"])
+        self.assertEqual(cycle.workload_checks_failed, [])
+        self.assertFalse(cycle.healthy)
+        self.on_cycle_complete.assert_called_once_with(cycle)
+
+    def test_run_named_check(self):
+        cycle = self.runner.run("Fake Workload")
+        self.assertEqual(len(cycle.results), 1)
+        self.assertEqual(cycle.results[0].category, "workload")
+        self.assertTrue(cycle.healthy)
+        self.on_cycle_complete.assert_not_called()
+
+        # checks can also be referenced by module
+        cycle = self.runner.run("NotFoundCheck")
+        self.assertEqual(cycle.results[0].name, "Missing CRD")
+
+    def test_run_unknown_check(self):
+        with self.assertRaises(UnknownCheckError):
+            self.runner.run("CheckDoesNotExist")
+
+    def test_run_cached(self):
+        self.runner.run()
+        self.assertEqual(FakeCheck.calls, 2)
+
+        cycle = self.runner.run(max_age=60)
+        self.assertTrue(cycle.cached)
+        self.assertEqual(FakeCheck.calls, 2)
+
+        cycle = self.runner.run("Fake Platform", max_age=60)
+        self.assertTrue(cycle.cached)
+        self.assertEqual(FakeCheck.calls, 2)
+
+        # max_age of 0 always runs the checks
+        cycle = self.runner.run(max_age=0)
+        self.assertFalse(cycle.cached)
+        self.assertEqual(FakeCheck.calls, 4)
+
+    def test_run_concurrent_collapse(self):
+        FakeCheck.release = threading.Event()
+        cycles = []
+
+        def trigger(check_name=None):
+            cycles.append(self.runner.run(check_name))
+
+        leader = threading.Thread(target=trigger)
+        leader.start()
+        while FakeCheck.calls < 2:
+            time.sleep(0.01)
+
+        threads = [threading.Thread(target=trigger) for _ in range(4)]
+        threads.append(threading.Thread(target=trigger, args=("Fake Platform",)))
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        FakeCheck.release.set()
+        threads.append(leader)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(cycles), 6)
+        self.assertEqual(FakeCheck.calls, 2)
+        self.on_cycle_complete.assert_called_once()
+
+    def test_run_named_check_collapse(self):
+        FakeCheck.release = threading.Event()
+        self.app_config.workload_checks = []
+        cycles = []
+
+        def trigger(check_name):
+            cycles.append(self.runner.run(check_name))
+
+        threads = [
+            threading.Thread(target=trigger, args=(check_name,))
+            for check_name in ("Fake Platform", "FakeCheck")
+        ]
+        threads[0].start()
+        while FakeCheck.calls < 1:
+            time.sleep(0.01)
+        threads[1].start()
+        time.sleep(0.2)
+        FakeCheck.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(FakeCheck.calls, 1)
+        self.assertEqual([cycles[0].results], [cycle.results for cycle in cycles[1:]])
+
+    def test_run_circuit_open(self):
+        class BrokenApiCheck:
+            def is_healthy(self):
+                raise CircuitOpenError("manage.robin.io")
+
+        self.runner.health_check_map["NotFoundCheck"] = BrokenApiCheck
+        cycle = self.runner.run()
+        self.assertEqual(cycle.platform_checks_failed, ["NotFoundCheck"])
+
+    def test_run_absent_resource(self):
+        discovery = MagicMock()
+        discovery.has_resource.return_value = False
+        self.runner.discovery = discovery
+
+        cycle = self.runner.run()
+        discovery.has_resource.assert_called_once_with(
+            "manage.robin.io", "v1", "robinclusters"
+        )
+        self.assertEqual(cycle.platform_checks_failed, ["NotFoundCheck"])
+        self.assertEqual(cycle.results[1].status, "Failed")
+
+        self.app_config.platform_checks[1]["if_absent"] = "not_applicable"
+        cycle = self.runner.run()
+        self.assertEqual(cycle.results[1].status, "NotApplicable")
+        self.assertTrue(cycle.healthy)
+
+    def test_run_discovery_error(self):
+        discovery = MagicMock()
+        discovery.has_resource.side_effect = ApiException(status=500)
+        self.runner.discovery = discovery
+
+        # the check runs and reports the 404 itself
+        cycle = self.runner.run()
+        self.assertEqual(cycle.results[1].status, "Failed")
+
+    def test_run_api_error(self):
+        class ForbiddenCheck:
+            def is_healthy(self):
+                raise ApiException(status=403)
+
+        class UnreachableCheck:
+            def is_healthy(self):
+                raise MaxRetryError(None, "/api/v1/nodes")
+
+        self.app_config.platform_checks.append(
+            {"name": "Unreachable", "module": "UnreachableCheck"}
+        )
+        self.runner.health_check_map["NotFoundCheck"] = ForbiddenCheck
+        self.runner.health_check_map["UnreachableCheck"] = UnreachableCheck
+
+        with self.assertLogs("runner", "ERROR"):
+            cycle = self.runner.run()
+
+        self.assertEqual(
+            ["Passed", "Failed", "Failed", "Passed"],
+            [result.status for result in cycle.results],
+        )
+        self.on_cycle_complete.assert_called_once_with(cycle)
+        self.assertEqual(4, len(self.runner.last_results()))
+
+    def test_run_invalid_parameters(self):
+        class InvalidCheck:
+            def __init__(self, parameters):
+                raise ValueError("Invalid predicate: status.phase ==")
+
+        self.app_config.workload_checks[0]["module"] = "InvalidCheck"
+        self.runner.health_check_map["InvalidCheck"] = InvalidCheck
+
+        with self.assertLogs("runner", "ERROR"):
+            cycle = self.runner.run()
+
+        self.assertEqual(
+            ["Passed", "Failed", "Failed"], [result.status for result in cycle.results]
+        )
+        self.on_cycle_complete.assert_called_once_with(cycle)
+
+    def test_run_dependencies_blocked(self):
+        self.app_config.workload_checks[0]["depends_on"] = ["NotFoundCheck"]
+
+        cycle = self.runner.run()
+        self.assertEqual(
+            [result.status for result in cycle.results],
+            ["Passed", "Failed", "Blocked"],
+        )
+        self.assertEqual(cycle.workload_checks_failed, ["FakeCheck"])
+        # the blocked check did not run
+        self.assertEqual(FakeCheck.calls, 1)
+
+    def test_run_dependencies_order(self):
+        order = []
+
+        class OrderedCheck:
+            def __init__(self, parameters: dict = None) -> None:
+                self.name = parameters["name"]
+
+            def is_healthy(self):
+                time.sleep(0.05 if self.name == "first" else 0)
+                order.append(self.name)
+                return True
+
+        self.runner.health_check_map["OrderedCheck"] = OrderedCheck
+        self.app_config.platform_checks = [
+            {
+                "name": "Second",
+                "module": "OrderedCheck",
+                "parameters": {"name": "second"},
+                "depends_on": ["First"],
+            },
+            {"name": "First", "module": "OrderedCheck", "parameters": {"name": "first"}},
+        ]
+        self.app_config.workload_checks = []
+
+        cycle = self.runner.run()
+        self.assertTrue(cycle.healthy)
+        self.assertEqual(order, ["first", "second"])
+
+        # dependencies are ignored when running a single check
+        order.clear()
+        self.runner.run("Second")
+        self.assertEqual(order, ["second"])
+
+    def test_restore(self):
+        restored = CheckResult(
+            "Fake Platform", "FakeCheck", "platform", "Failed", time.time()
+        )
+        self.runner.restore([restored])
+        self.assertEqual(self.runner.last_results(), [restored])
+
+        cycle = self.runner.run("Fake Platform", max_age=60)
+        self.assertTrue(cycle.cached)
+        self.assertFalse(cycle.healthy)
+
+        # results of this process take precedence over restored ones
+        self.runner.run()
+        self.runner.restore([restored])
+        self.assertEqual(self.runner.last_results()[0].status, "Passed")
+
+    def test_removed_checks_are_pruned(self):
+        self.runner.run()
+        self.app_config.platform_checks[0]["name"] = "Renamed Platform"
+        del self.app_config.platform_checks[1]
+
+        cycle = self.runner.run()
+
+        self.assertCountEqual(
+            ["Renamed Platform", "Fake Workload"],
+            [result.name for result in self.runner.last_results()],
+        )
+        self.assertTrue(cycle.healthy)
+
+    def test_run_cache_ttl(self):
+        self.app_config.platform_checks[0]["cache_ttl"] = 60
+
+        first = self.runner.run()
+        second = self.runner.run()
+
+        # the platform check ran once, the workload check twice
+        self.assertEqual(FakeCheck.calls, 3)
+        self.assertIs(first.results[0], second.results[0])
+
+        self.runner.invalidate("Fake Platform")
+        self.runner.run()
+        self.assertEqual(FakeCheck.calls, 5)
+
+    def test_run_cache_ttl_failed_dependency_recovered(self):
+        self.app_config.workload_checks[0]["depends_on"] = ["NotFoundCheck"]
+        self.app_config.workload_checks[0]["cache_ttl"] = 60
+
+        first = self.runner.run()
+        self.assertEqual("Blocked", first.results[2].status)
+
+        with patch.object(NotFoundCheck, "is_healthy", return_value=True):
+            second = self.runner.run()
+        self.assertEqual(
+            ["Passed", "Passed", "Passed"],
+            [result.status for result in second.results],
+        )
+        # the dependent check ran once its dependency recovered
+        self.assertEqual(FakeCheck.calls, 3)
+
+    def test_run_cache_ttl_failed_not_reused(self):
+        self.app_config.platform_checks[0]["cache_ttl"] = 60
+        FakeCheck.healthy = False
+        self.runner.run()
+
+        FakeCheck.healthy = True
+        cycle = self.runner.run()
+
+        self.assertEqual("Passed", cycle.results[0].status)
+        self.assertEqual(FakeCheck.calls, 4)
+
+    def test_run_cache_ttl_dependency_changed(self):
+        self.app_config.platform_checks[0]["depends_on"] = ["Missing CRD"]
+        self.app_config.platform_checks[0]["cache_ttl"] = 60
+        self.app_config.platform_checks[1]["if_absent"] = "not_applicable"
+        with patch.object(NotFoundCheck, "is_healthy", return_value=True):
+            self.runner.run()
+            self.runner.run()
+        # the dependency still passed, its dependent was reused
+        self.assertEqual(FakeCheck.calls, 3)
+
+        self.runner.discovery = MagicMock()
+        self.runner.discovery.has_resource.return_value = False
+        cycle = self.runner.run()
+
+        self.assertEqual("NotApplicable", cycle.results[1].status)
+        self.assertEqual(FakeCheck.calls, 5)
+
+    def test_run_cache_ttl_expired(self):
+        self.app_config.platform_checks[0]["cache_ttl"] = 60
+        self.runner.restore(
+            [CheckResult("Fake Platform", "FakeCheck", "platform", "Passed", 0)]
+        )
+
+        self.runner.run()
+        self.assertEqual(FakeCheck.calls, 2)
+
+    def test_run_cache_invalidated_on_change(self):
+        change_watches = MagicMock()
+        self.runner.change_watches = change_watches
+        self.app_config.platform_checks[1]["cache_ttl"] = 60
+        self.app_config.platform_checks[1]["invalidate_on_change"] = True
+
+        self.runner.run()
+        self.runner.run()
+
+        change_watches.subscribe.assert_called_once()
+        name, resources, on_change = change_watches.subscribe.call_args.args
+        self.assertEqual(name, "Missing CRD")
+        self.assertEqual(resources, (("manage.robin.io", "v1", "robinclusters"),))
+
+        on_change()
+        with patch.object(NotFoundCheck, "is_healthy", return_value=True) as check:
+            cycle = self.runner.run()
+        check.assert_called_once()
+        self.assertTrue(cycle.healthy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+
+from single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.calls
+
+    def test_do_collapses_concurrent_calls(self):
+        results = []
+
+        def call():
+            results.append(self.flight.do("key", self.slow))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        self.started.wait(5)
+        followers = [threading.Thread(target=call) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        time.sleep(0.1)
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1, 1, 1, 1])
+
+    def test_do_runs_again_after_completion(self):
+        self.release.set()
+        self.assertEqual(self.flight.do("key", self.slow), 1)
+        self.assertEqual(self.flight.do("key", self.slow), 2)
+
+    def test_do_raises_for_followers(self):
+        errors = []
+
+        def fail():
+            self.started.set()
+            self.release.wait(5)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                self.flight.do("key", fail)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        self.started.wait(5)
+        follower = threading.Thread(target=call)
+        follower.start()
+        time.sleep(0.1)
+        self.release.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+
+    def test_wait(self):
+        self.assertIsNone(self.flight.wait("key"))
+
+        leader = threading.Thread(target=self.flight.do, args=("key", self.slow))
+        leader.start()
+        self.started.wait(5)
+        threading.Timer(0.1, self.release.set).start()
+        self.assertEqual(self.flight.wait("key"), 1)
+        leader.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "snapshot.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        state = {"results": [{"name": "Node Health"}], "crd_resource_version": "42"}
+        snapshot.save(self.path, state)
+
+        loaded = snapshot.load(self.path)
+        self.assertEqual(loaded["results"], state["results"])
+        self.assertEqual(loaded["crd_resource_version"], "42")
+        self.assertIn("saved_at", loaded)
+        self.assertEqual(os.listdir(self.directory.name), ["snapshot.json"])
+
+    def test_failed_save_keeps_previous_snapshot(self):
+        snapshot.save(self.path, {"results": []})
+        with patch("snapshot.json.dump", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                snapshot.save(self.path, {"results": [{"name": "Node Health"}]})
+
+        self.assertEqual(snapshot.load(self.path)["results"], [])
+        self.assertEqual(os.listdir(self.directory.name), ["snapshot.json"])
+
+    def test_missing_or_unusable_snapshot(self):
+        self.assertIsNone(snapshot.load(self.path))
+
+        with open(self.path, "w") as stream:
+            stream.write('{"results": [')
+        self.assertIsNone(snapshot.load(self.path))
+
+        with open(self.path, "w") as stream:
+            json.dump({"version": 0}, stream)
+        self.assertIsNone(snapshot.load(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
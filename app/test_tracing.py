@@ -0,0 +1,165 @@
+import concurrent.futures
+import contextvars
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import kube_client
+from json_decode import list_items
+from kubernetes import client
+from tracing import JsonLinesExporter, OtlpHttpExporter, Tracer, tracer
+
+
+class FakeExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.exporter = FakeExporter()
+        self.tracer = Tracer(self.exporter)
+
+    def test_disabled(self):
+        disabled = Tracer()
+        with disabled.span("cycle") as span:
+            span.set_attribute("ignored", True)
+        self.assertFalse(disabled.enabled)
+
+    def test_nested_spans_exported_with_root(self):
+        with self.tracer.span("cycle") as root:
+            with self.tracer.span("check", module="CheckNodes") as child:
+                with self.tracer.span("k8s GET /api/v1/nodes") as grandchild:
+                    grandchild.set_attribute("k8s.object_count", 3)
+            self.assertEqual(self.exporter.traces, [])
+
+        self.assertEqual(len(self.exporter.traces), 1)
+        spans = {span.name: span for span in self.exporter.traces[0]}
+        self.assertEqual(len(spans), 3)
+        self.assertIsNone(root.parent_id)
+        self.assertEqual(child.parent_id, root.span_id)
+        self.assertEqual(grandchild.parent_id, child.span_id)
+        self.assertEqual({span.trace_id for span in spans.values()}, {root.trace_id})
+        self.assertEqual(spans["check"].attributes["module"], "CheckNodes")
+        self.assertEqual(
+            spans["k8s GET /api/v1/nodes"].attributes["k8s.object_count"], 3
+        )
+        self.assertGreaterEqual(root.end_time_ns, child.end_time_ns)
+
+    def test_spans_across_threads(self):
+        def check():
+            with self.tracer.span("check") as span:
+                return span
+
+        with self.tracer.span("cycle") as root:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, check)
+                    for _ in range(2)
+                ]
+                children = [future.result() for future in futures]
+
+        for child in children:
+            self.assertEqual(child.parent_id, root.span_id)
+        self.assertEqual(len(self.exporter.traces[0]), 3)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("cycle"):
+                raise ValueError("boom")
+        self.assertEqual(self.exporter.traces[0][0].error, "ValueError: boom")
+
+    def test_json_lines_exporter(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            json_tracer = Tracer(JsonLinesExporter(path))
+            with json_tracer.span("cycle"):
+                with json_tracer.span("check"):
+                    pass
+            with open(path) as f:
+                spans = [json.loads(line) for line in f]
+        self.assertEqual([span["name"] for span in spans], ["check", "cycle"])
+
+    def test_otlp_encode(self):
+        with self.tracer.span("cycle", checks=2, healthy=True):
+            with self.tracer.span("check"):
+                pass
+        encoded = OtlpHttpExporter("http://collector:4318").encode(
+            self.exporter.traces[0]
+        )
+        spans = encoded["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual(spans[0]["parentSpanId"], spans[1]["spanId"])
+        self.assertNotIn("parentSpanId", spans[1])
+        self.assertIn({"key": "checks", "value": {"intValue": "2"}}, spans[1]["attributes"])
+        self.assertIn(
+            {"key": "healthy", "value": {"boolValue": True}}, spans[1]["attributes"]
+        )
+
+
+class TestApiClientTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = FakeExporter()
+        self.exporter_patcher = patch.object(tracer, "exporter", self.exporter)
+        self.exporter_patcher.start()
+        body = json.dumps({"items": [{"metadata": {"name": "vm1"}}] * 3}).encode()
+        self.response = response = MagicMock(status=200, data=body)
+        response.getheaders.return_value = {}
+        self.request_patcher = patch(
+            "kubernetes.client.ApiClient.request", return_value=response
+        )
+        self.request_patcher.start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_api_call_span(self):
+        k8s = client.CustomObjectsApi(kube_client.ApiClient())
+        with tracer.span("check"):
+            resp = k8s.list_namespaced_custom_object(
+                group="vm.cluster.gke.io",
+                version="v1",
+                plural="virtualmachines",
+                namespace="vm-workloads",
+            )
+        self.assertEqual(len(resp["items"]), 3)
+
+        api_span, check_span = self.exporter.traces[0]
+        self.assertEqual(api_span.parent_id, check_span.span_id)
+        self.assertEqual(
+            api_span.name,
+            "k8s GET /apis/{group}/{version}/namespaces/{namespace}/{plural}",
+        )
+        self.assertEqual(api_span.attributes["k8s.plural"], "virtualmachines")
+        self.assertEqual(api_span.attributes["k8s.object_count"], 3)
+        self.assertEqual(api_span.attributes["http.status_code"], 200)
+        self.assertGreater(api_span.attributes["http.response_bytes"], 0)
+
+    def test_streamed_list_span(self):
+        body = self.response.data
+        self.response.stream.return_value = [body[:10], body[10:]]
+        k8s = client.CustomObjectsApi(kube_client.ApiClient())
+        with tracer.span("check"):
+            items = list(
+                list_items(
+                    k8s.list_namespaced_custom_object,
+                    group="vm.cluster.gke.io",
+                    version="v1",
+                    plural="virtualmachines",
+                    namespace="vm-workloads",
+                )
+            )
+        self.assertEqual(len(items), 3)
+
+        api_span, _ = self.exporter.traces[0]
+        self.assertEqual(api_span.attributes["k8s.object_count"], 3)
+        self.assertEqual(api_span.attributes["http.response_bytes"], len(body))
+        self.assertEqual(api_span.attributes["http.status_code"], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import MagicMock, patch
+
+import traffic
+import urllib3
+from json_decode import list_items
+from kube_client import ApiClient
+from kubernetes import client
+from kubernetes.client import rest
+from kubernetes.client.exceptions import ApiException
+
+_NODES = {
+    "apiVersion": "v1",
+    "kind": "NodeList",
+    "metadata": {},
+    "items": [{"metadata": {"name": "node-1"}}],
+}
+
+
+def response(status, data):
+    return rest.RESTResponse(
+        urllib3.HTTPResponse(
+            body=json.dumps(data).encode(),
+            headers={"Content-Type": "application/json"},
+            status=status,
+            reason="OK" if status == 200 else "Not Found",
+            preload_content=True,
+        )
+    )
+
+
+class TestRequestKey(unittest.TestCase):
+    def test_ignores_host_and_query_order(self):
+        self.assertEqual(
+            traffic.request_key(
+                "GET", "https://a:6443/api/v1/pods", [("limit", 5), ("watch", False)]
+            ),
+            traffic.request_key(
+                "GET", "https://b/api/v1/pods?watch=False", [("limit", "5")]
+            ),
+        )
+
+    def test_distinguishes_bodies(self):
+        self.assertNotEqual(
+            traffic.request_key("PATCH", "/apis/x", body={"a": 1}),
+            traffic.request_key("PATCH", "/apis/x", body={"a": 2}),
+        )
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "traffic.zip")
+
+    def record(self, *responses):
+        api = ApiClient()
+        recorder = traffic.record(api, self.path)
+        with patch.object(
+            rest.RESTClientObject, "request", side_effect=list(responses)
+        ):
+            for _ in responses:
+                try:
+                    client.CoreV1Api(api).list_node()
+                except ApiException:
+                    pass
+        return recorder
+
+    def test_replays_recorded_responses(self):
+        self.record(response(200, _NODES)).flush()
+
+        api = ApiClient()
+        traffic.replay(api, self.path, time_scale=0)
+        nodes = client.CoreV1Api(api).list_node()
+
+        self.assertEqual(["node-1"], [node.metadata.name for node in nodes.items])
+
+    def test_replays_repeated_requests_in_order(self):
+        second = dict(_NODES, items=[])
+        self.record(response(200, _NODES), response(200, second)).flush()
+
+        api = ApiClient()
+        traffic.replay(api, self.path, time_scale=0)
+        core_v1_api = client.CoreV1Api(api)
+
+        self.assertEqual(1, len(core_v1_api.list_node().items))
+        self.assertEqual(0, len(core_v1_api.list_node().items))
+        # The last response is served again once all are used up
+        self.assertEqual(0, len(core_v1_api.list_node().items))
+
+    def test_replays_errors(self):
+        error = response(404, {"kind": "Status"})
+        self.record(ApiException(http_resp=error)).flush()
+
+        api = ApiClient()
+        traffic.replay(api, self.path, time_scale=0)
+        with self.assertRaises(ApiException) as raised:
+            client.CoreV1Api(api).list_node()
+        self.assertEqual(404, raised.exception.status)
+
+    def test_records_and_replays_streamed_lists(self):
+        streamed = urllib3.HTTPResponse(
+            body=io.BytesIO(json.dumps(_NODES).encode()),
+            status=200,
+            reason="OK",
+            preload_content=False,
+        )
+        api = ApiClient()
+        recorder = traffic.record(api, self.path)
+        with patch.object(rest.RESTClientObject, "request", return_value=streamed):
+            recorded = list(list_items(client.CoreV1Api(api).list_node))
+        recorder.flush()
+
+        api = ApiClient()
+        traffic.replay(api, self.path, time_scale=0)
+        replayed = list(list_items(client.CoreV1Api(api).list_node))
+
+        self.assertEqual(_NODES["items"], recorded)
+        self.assertEqual(_NODES["items"], replayed)
+
+    def test_unrecorded_request_is_not_found(self):
+        self.record().flush()
+
+        api = ApiClient()
+        traffic.replay(api, self.path, time_scale=0)
+        with self.assertRaises(ApiException) as raised:
+            client.CoreV1Api(api).list_namespace()
+        self.assertEqual(404, raised.exception.status)
+
+    def test_flush_appends_compressed_batches(self):
+        recorder = self.record(response(200, _NODES))
+        self.assertEqual(1, recorder.flush())
+        self.assertEqual(0, recorder.flush())
+        recorder.record(
+            {"key": "GET /api/v1/nodes", "status": 200} | traffic._encode(b"{}")
+        )
+        self.assertEqual(1, recorder.flush())
+
+        with zipfile.ZipFile(self.path) as archive:
+            names = archive.namelist()
+            compression = {info.compress_type for info in archive.infolist()}
+        self.assertEqual(2, len([name for name in names if name.startswith("index/")]))
+        self.assertEqual({zipfile.ZIP_DEFLATED}, compression)
+        self.assertEqual(2, len(traffic.Replayer(self.path)))
+
+    @patch("traffic.time.sleep")
+    def test_scales_recorded_timings(self, sleep: MagicMock):
+        self.record(response(200, _NODES)).flush()
+        with zipfile.ZipFile(self.path) as archive:
+            elapsed = json.loads(archive.read("exchanges/00000001.json"))[
+                "elapsed_seconds"
+            ]
+
+        api = ApiClient()
+        traffic.replay(api, self.path, time_scale=2)
+        client.CoreV1Api(api).list_node()
+
+        sleep.assert_called_once_with(elapsed * 2)
@@ -0,0 +1,175 @@
+import io
+import logging
+import unittest
+from unittest.mock import MagicMock
+
+from fakes import FakeClock
+from watch_view import ERROR, FAIL, PASS, WatchView, since
+
+_NODES = ("", "v1", "nodes")
+
+
+class FakeCheck:
+    api_resources = [_NODES]
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.runs = 0
+
+    def is_healthy(self):
+        self.runs += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        if not result:
+            logging.getLogger("check.fake").error("Node node-1 is not ready.")
+        return result
+
+
+class PolledCheck(FakeCheck):
+    api_resources = []
+
+
+class TestWatchView(unittest.TestCase):
+    def setUp(self):
+        self.watches = MagicMock()
+        self.stream = io.StringIO()
+        self.clock = FakeClock()
+
+    def view(self, *checks, poll_seconds=60):
+        return WatchView(
+            checks,
+            self.watches,
+            poll_seconds=poll_seconds,
+            stream=self.stream,
+            clock=self.clock,
+            sleep=lambda seconds: None,
+        )
+
+    def test_failures_from_check_errors(self):
+        view = self.view(FakeCheck(False))
+
+        changed = view.run_checks()
+
+        self.assertEqual(view.rows, changed)
+        self.assertEqual(FAIL, view.rows[0].status)
+        self.assertEqual(["Node node-1 is not ready."], view.rows[0].failures)
+        self.assertEqual(1000.0, view.rows[0].changed_at)
+
+    def test_check_exception(self):
+        view = self.view(FakeCheck(RuntimeError("connection refused\ndetails")))
+
+        view.run_checks()
+
+        self.assertEqual(ERROR, view.rows[0].status)
+        self.assertEqual(["connection refused"], view.rows[0].failures)
+
+    def test_reruns_only_changed_checks(self):
+        changed_check, other_check = FakeCheck(False, True), FakeCheck(True)
+        view = self.view(changed_check, other_check)
+        view.run_checks()
+        self.clock.now += 30
+
+        self.assertEqual([], view.run_checks())
+        view._mark(0)
+        changed = view.run_checks()
+
+        self.assertEqual([view.rows[0]], changed)
+        self.assertEqual((2, 1), (changed_check.runs, other_check.runs))
+        self.assertEqual(PASS, view.rows[0].status)
+        self.assertEqual([], view.rows[0].failures)
+        self.assertEqual(1030.0, view.rows[0].changed_at)
+
+    def test_polls_checks_without_resources(self):
+        check = PolledCheck(True)
+        view = self.view(check, poll_seconds=60)
+        view.run_checks()
+
+        self.clock.now += 59
+        view.run_checks()
+        self.clock.now += 1
+        view.run_checks()
+
+        self.assertEqual(2, check.runs)
+
+    def test_run_until_healthy(self):
+        check = FakeCheck(False, True)
+        view = self.view(check)
+        is_healthy = check.is_healthy
+
+        def changed_after_run():
+            # The watch reports a change of the nodes after the first run
+            healthy = is_healthy()
+            self.watches.subscribe.call_args.args[2]()
+            return healthy
+
+        check.is_healthy = changed_after_run
+
+        self.assertEqual(0, view.run(until_healthy=True))
+
+        self.assertEqual(2, check.runs)
+        self.watches.subscribe.assert_called_once()
+        self.assertEqual([_NODES], list(self.watches.subscribe.call_args.args[1]))
+        self.watches.stop.assert_called_once()
+        output = self.stream.getvalue().splitlines()
+        self.assertIn("FAIL  FakeCheck: Node node-1 is not ready.", output[0])
+        self.assertIn("PASS  FakeCheck", output[1])
+
+    def test_run_timeout(self):
+        view = self.view(FakeCheck(False))
+
+        def tick():
+            self.clock.now += 10
+            return self.clock.now
+
+        view._clock = tick
+
+        self.assertEqual(1, view.run(until_healthy=True, timeout=5))
+        self.assertIn("Timed out", self.stream.getvalue())
+        self.watches.stop.assert_called_once()
+
+    def test_interrupt(self):
+        view = self.view(FakeCheck(True))
+        view._changed = MagicMock()
+        view._changed.wait.side_effect = KeyboardInterrupt
+
+        self.assertEqual(0, view.run())
+        self.watches.stop.assert_called_once()
+
+    def test_check_errors_are_not_logged(self):
+        view = self.view(FakeCheck(False))
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logging.getLogger().addHandler(handler)
+        try:
+            view.run(until_healthy=True, timeout=0)
+        finally:
+            logging.getLogger().removeHandler(handler)
+
+        self.assertEqual([], records)
+        self.assertTrue(logging.getLogger("check").propagate)
+
+    def test_table(self):
+        self.stream.isatty = lambda: True
+        view = self.view(FakeCheck(False), PolledCheck(True))
+        view.run_checks()
+        self.clock.now += 125
+
+        view.render()
+
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(["CHECK", "STATUS", "SINCE", "FAILING"], lines[2].split())
+        self.assertEqual(
+            "FakeCheck    FAIL        2m  Node node-1 is not ready.", lines[3]
+        )
+        self.assertEqual("PolledCheck  PASS        2m  ", lines[4])
+
+    def test_since(self):
+        self.assertEqual("42s", since(42.7))
+        self.assertEqual("5m", since(330))
+        self.assertEqual("2h05m", since(7500))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from worker_lock import WorkerLock
+
+
+class TestWorkerLock(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scheduler.lock")
+        self.leader = WorkerLock(self.path, retry_seconds=0.01)
+        self.follower = WorkerLock(self.path, retry_seconds=0.01)
+
+    def tearDown(self):
+        self.leader.release()
+        self.follower.release()
+        self.directory.cleanup()
+
+    def test_exclusive(self):
+        self.assertTrue(self.leader.try_acquire())
+        self.assertTrue(self.leader.try_acquire())
+        self.assertFalse(self.follower.try_acquire())
+        self.assertFalse(self.follower.held)
+
+        self.leader.release()
+        self.assertTrue(self.follower.try_acquire())
+
+    def test_run_when_acquired(self):
+        started = threading.Event()
+        self.leader.run_when_acquired(lambda: None)
+        self.follower.run_when_acquired(started.set)
+        self.assertFalse(started.wait(0.1))
+
+        # the follower takes over once the leader is gone
+        self.leader.release()
+        self.assertTrue(started.wait(5))
+        self.assertTrue(self.follower.held)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+"""Span-based tracing of check cycles.
+
+Each check cycle is recorded as a trace: a root span for the cycle, a child
+span per check and grandchild spans per Kubernetes API call. Finished traces
+are exported as a batch when their root span ends, either as JSON lines to a
+local file or as OTLP/JSON to the /v1/traces endpoint of an OTLP HTTP
+collector.
+
+Tracing is disabled until an exporter is configured, in which case span()
+yields a shared no-op span.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+log = logging.getLogger("tracing")
+
+SERVICE_NAME = "cluster-health-validator"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time_ns: int = 0
+    end_time_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_time_ns - self.start_time_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _NoopSpan:
+    """Span returned while tracing is disabled"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class JsonLinesExporter:
+    """Appends finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """Posts finished spans as OTLP/JSON to an OTLP HTTP collector"""
+
+    def __init__(self, endpoint: str, timeout: float = 2) -> None:
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def encode(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": _otlp_value(SERVICE_NAME)}
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": SERVICE_NAME},
+                            "spans": [self._encode_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    @staticmethod
+    def _encode_span(span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.end_time_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(self.encode(spans)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """Records spans and exports each trace once its root span ends"""
+
+    def __init__(self, exporter: Any = None) -> None:
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self._traces: Dict[str, List[Span]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Records the enclosed block as a span, child of the current span"""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        span.start_time_ns = time.time_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_time_ns = time.time_ns()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            spans = self._traces.setdefault(span.trace_id, [])
+            spans.append(span)
+            if span.parent_id is not None:
+                return
+            del self._traces[span.trace_id]
+
+        try:
+            self.exporter.export(spans)
+        except Exception:  # pylint: disable=broad-except
+            log.warning("Failed to export trace %s", span.trace_id, exc_info=True)
+
+
+def current_span() -> Any:
+    """Returns the active span, or a no-op span when there is none"""
+    return _current_span.get() or _NOOP_SPAN
+
+
+def configure_from_env() -> None:
+    """Enables tracing from the TRACE_FILE or OTLP_ENDPOINT environment variables"""
+    if os.environ.get("OTLP_ENDPOINT"):
+        tracer.exporter = OtlpHttpExporter(os.environ["OTLP_ENDPOINT"])
+    elif os.environ.get("TRACE_FILE"):
+        tracer.exporter = JsonLinesExporter(os.environ["TRACE_FILE"])
+
+
+tracer = Tracer()
@@ -0,0 +1,279 @@
+"""Record and replay of Kubernetes API traffic.
+
+The recorder captures every request sent through an ApiClient, with its
+response and duration, into a compressed zip archive: one entry per exchange,
+plus index files mapping each request (method, path, query and body) to the
+entries recorded for it. The replayer serves the recorded responses back
+instead of sending requests, sleeping for the recorded durations scaled by
+time_scale (0 to replay as fast as possible), so that the checks can be run and
+benchmarked against recorded traffic without a cluster.
+
+Streaming requests such as watches are passed through without being recorded.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+import urllib3
+from kubernetes.client import rest
+from kubernetes.client.exceptions import ApiException
+
+log = logging.getLogger("traffic")
+
+_INDEX_PREFIX = "index/"
+_EXCHANGE_PREFIX = "exchanges/"
+
+
+def request_key(
+    method: str, url: str, query_params: Any = None, body: Any = None
+) -> str:
+    """Identifies a request independently of the apiserver address"""
+    parts = urlsplit(url)
+    query = sorted(
+        [tuple(param.split("=", 1)) for param in parts.query.split("&") if param]
+        + [(str(key), str(value)) for key, value in (query_params or [])]
+    )
+    key = f"{method} {parts.path}"
+    if query:
+        key += f"?{urlencode(query)}"
+    if body is not None:
+        digest = hashlib.sha256(
+            json.dumps(body, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        key += f" {digest[:16]}"
+    return key
+
+
+def _encode(data: bytes) -> Dict[str, str]:
+    try:
+        return {"data": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"data_base64": base64.b64encode(data).decode()}
+
+
+def _decode(exchange: Dict[str, Any]) -> bytes:
+    if "data_base64" in exchange:
+        return base64.b64decode(exchange["data_base64"])
+    return exchange["data"].encode("utf-8")
+
+
+def _response(
+    status: int, reason: str, headers: Any, data: bytes
+) -> urllib3.HTTPResponse:
+    """Returns a response streaming data, as if read from the network"""
+    return urllib3.HTTPResponse(
+        body=io.BytesIO(data),
+        headers=headers,
+        status=status,
+        reason=reason,
+        preload_content=False,
+    )
+
+
+def _is_watch(query_params: Any) -> bool:
+    return any(key == "watch" and value for key, value in query_params or [])
+
+
+class Recorder:
+    """Collects exchanges in memory and appends them to the archive on flush()"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._count = 0
+        self._flushes = 0
+        # Start a new archive
+        zipfile.ZipFile(path, "w").close()
+
+    def record(self, exchange: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending.append(exchange)
+
+    def flush(self) -> int:
+        """Appends the exchanges recorded since the last flush to the archive.
+        Returns:
+            number of exchanges written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+
+            index = defaultdict(list)
+            with zipfile.ZipFile(
+                self.path, "a", compression=zipfile.ZIP_DEFLATED
+            ) as archive:
+                for exchange in pending:
+                    self._count += 1
+                    name = f"{_EXCHANGE_PREFIX}{self._count:08d}.json"
+                    archive.writestr(name, json.dumps(exchange))
+                    index[exchange["key"]].append(name)
+                self._flushes += 1
+                archive.writestr(
+                    f"{_INDEX_PREFIX}{self._flushes:08d}.json", json.dumps(index)
+                )
+        log.info("Recorded %d API exchanges to %s", len(pending), self.path)
+        return len(pending)
+
+
+class Replayer:
+    """Serves responses from an archive written by Recorder.
+
+    Repeated requests are answered with the recorded responses in order; once
+    these are used up, the last one is served again.
+    """
+
+    def __init__(self, path: str, time_scale: float = 1.0) -> None:
+        self.path = path
+        self.time_scale = time_scale
+        self._archive = zipfile.ZipFile(path)
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[str]] = defaultdict(list)
+        for name in sorted(self._archive.namelist()):
+            if name.startswith(_INDEX_PREFIX):
+                for key, entries in json.loads(self._archive.read(name)).items():
+                    self._index[key].extend(entries)
+        self._served: Dict[str, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._index.values())
+
+    def exchange(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the next recorded exchange for a request key, None if the
+        request was never recorded"""
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                return None
+            position = min(self._served[key], len(entries) - 1)
+            self._served[key] += 1
+            return json.loads(self._archive.read(entries[position]))
+
+
+class RecordingRESTClient(rest.RESTClientObject):
+    """REST client recording the exchanges it sends to a Recorder"""
+
+    def __init__(self, configuration: Any, recorder: Recorder) -> None:
+        super().__init__(configuration)
+        self.recorder = recorder
+
+    def request(
+        self,
+        method,
+        url,
+        query_params=None,
+        headers=None,
+        body=None,
+        post_params=None,
+        _preload_content=True,
+        _request_timeout=None,
+    ):
+        start = time.perf_counter()
+        try:
+            response = super().request(
+                method,
+                url,
+                query_params,
+                headers,
+                body,
+                post_params,
+                _preload_content,
+                _request_timeout,
+            )
+        except ApiException as e:
+            status, reason = e.status, e.reason
+            response_headers, data = e.headers, (e.body or b"")
+            response = e
+        else:
+            status, reason = response.status, response.reason
+            if _preload_content:
+                response_headers, data = response.getheaders(), response.data
+            elif _is_watch(query_params):
+                # Watches are not recorded
+                return response
+            else:
+                # Read the whole body to record it, and stream it from memory
+                response_headers, data = response.headers, response.data
+                response = _response(status, reason, response_headers, data)
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.recorder.record(
+            {
+                "key": request_key(method, url, query_params, body),
+                "method": method,
+                "url": urlsplit(url).path,
+                "status": status,
+                "reason": reason,
+                "headers": dict(response_headers or {}),
+                "elapsed_seconds": time.perf_counter() - start,
+            }
+            | _encode(data)
+        )
+        if isinstance(response, ApiException):
+            raise response
+        return response
+
+
+class ReplayRESTClient(rest.RESTClientObject):
+    """REST client answering requests from a Replayer instead of the network"""
+
+    def __init__(self, replayer: Replayer) -> None:  # pylint: disable=super-init-not-called
+        # No connection pool, nothing is sent
+        self.replayer = replayer
+
+    def request(
+        self,
+        method,
+        url,
+        query_params=None,
+        headers=None,
+        body=None,
+        post_params=None,
+        _preload_content=True,
+        _request_timeout=None,
+    ):
+        key = request_key(method, url, query_params, body)
+        exchange = self.replayer.exchange(key)
+        if exchange is None:
+            log.debug("No recorded response for %s", key)
+            exchange = {"status": 404, "reason": "Not Recorded", "headers": {}}
+            data = b""
+        else:
+            data = _decode(exchange)
+            if self.replayer.time_scale > 0:
+                time.sleep(exchange["elapsed_seconds"] * self.replayer.time_scale)
+
+        response = _response(
+            exchange["status"], exchange["reason"], exchange["headers"], data
+        )
+        if _preload_content:
+            response = rest.RESTResponse(response)
+        if not 200 <= response.status <= 299:
+            raise ApiException(http_resp=response)
+        return response
+
+
+def record(api: Any, path: str) -> Recorder:
+    """Records the traffic of an ApiClient to the archive at path"""
+    recorder = Recorder(path)
+    api.rest_client = RecordingRESTClient(api.configuration, recorder)
+    return recorder
+
+
+def replay(api: Any, path: str, time_scale: float = 1.0) -> Replayer:
+    """Answers the requests of an ApiClient from the archive at path"""
+    replayer = Replayer(path, time_scale)
+    api.rest_client = ReplayRESTClient(replayer)
+    log.info("Replaying %d API exchanges from %s", len(replayer), path)
+    return replayer
@@ -0,0 +1,224 @@
+"""Live table of the results of the CLI checks, shown with --watch.
+
+Each check runs once, then again only when an object of the resource types it
+declares in api_resources is added, modified or deleted, as reported by the
+watch streams of ChangeWatches, instead of re-listing everything every
+--interval. Events arriving together, e.g. while VMs start, are coalesced into a
+single run. Checks that declare no resources are polled every poll_seconds.
+
+The objects a check fails on are taken from the errors it logs, which name
+them, e.g. "Node node-1 is not ready."
+"""
+
+import functools
+import logging
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence, TextIO
+
+from change_watch import ChangeWatches
+
+PENDING = "PENDING"
+PASS = "PASS"
+FAIL = "FAIL"
+ERROR = "ERROR"
+
+_DEBOUNCE_SECONDS = 1.0
+_REFRESH_SECONDS = 1.0
+_CLEAR_SCREEN = "\x1b[H\x1b[2J"
+
+
+class _ErrorLog(logging.Handler):
+    """Collects the errors logged by a check"""
+
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+@dataclass
+class Row:
+    """Latest result of a check"""
+
+    name: str
+    check: Any
+    status: str = PENDING
+    # When the status last changed, and when the check last ran
+    changed_at: Optional[float] = None
+    checked_at: Optional[float] = None
+    failures: List[str] = field(default_factory=list)
+
+    @property
+    def resources(self) -> tuple:
+        return tuple(getattr(self.check, "api_resources", ()))
+
+
+def since(seconds: float) -> str:
+    """Formats a duration as e.g. 42s, 5m or 2h05m"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def _names(checks: Sequence[Any]) -> List[str]:
+    """Names checks by class, adding the parameters of checks sharing a class"""
+    classes = [check.__class__.__name__ for check in checks]
+    names = []
+    for check, name in zip(checks, classes):
+        params = getattr(check, "params", None)
+        if classes.count(name) > 1 and params is not None:
+            values = params.model_dump(exclude_defaults=True)
+            name += " " + " ".join(f"{key}={value}" for key, value in values.items())
+        names.append(name)
+    return names
+
+
+class WatchView:
+    """Runs checks on changes of their resources and shows their results.
+    Args:
+        checks: check instances
+        watches: watches to subscribe the checks to
+        poll_seconds: interval of the runs of checks without api_resources
+        stream: output; a table redrawn in place on a terminal, a line per
+            status change otherwise
+    """
+
+    def __init__(
+        self,
+        checks: Sequence[Any],
+        watches: ChangeWatches,
+        poll_seconds: float = 60,
+        stream: TextIO = sys.stdout,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rows = [Row(name, check) for name, check in zip(_names(checks), checks)]
+        self.watches = watches
+        self.poll_seconds = poll_seconds
+        self.stream = stream
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._dirty = set(range(len(self.rows)))
+
+    @property
+    def healthy(self) -> bool:
+        return all(row.status == PASS for row in self.rows)
+
+    def _mark(self, index: int) -> None:
+        with self._lock:
+            self._dirty.add(index)
+            self._changed.set()
+
+    def run(self, until_healthy: bool = False, timeout: Optional[float] = None) -> int:
+        """Shows the results until interrupted, or until all checks pass.
+        Returns:
+            0 if all checks passed last, 1 otherwise
+        """
+        # Failures are shown in the table rather than logged
+        check_logger = logging.getLogger("check")
+        propagate, check_logger.propagate = check_logger.propagate, False
+        deadline = None if timeout is None else self._clock() + timeout
+        try:
+            for index, row in enumerate(self.rows):
+                if row.resources:
+                    self.watches.subscribe(
+                        str(index), row.resources, functools.partial(self._mark, index)
+                    )
+            while True:
+                changed = self.run_checks()
+                self.render(changed)
+                if until_healthy and self.healthy:
+                    return 0
+                if deadline is not None and self._clock() >= deadline:
+                    self.stream.write("Timed out waiting for health checks to pass\n")
+                    return 1
+                if self._changed.wait(_REFRESH_SECONDS):
+                    self._sleep(_DEBOUNCE_SECONDS)
+        except KeyboardInterrupt:
+            return 0 if self.healthy else 1
+        finally:
+            self.watches.stop()
+            check_logger.propagate = propagate
+
+    def run_checks(self) -> List[Row]:
+        """Runs the checks whose resources changed, or whose poll is due.
+        Returns:
+            the rows whose status changed
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self._changed.clear()
+        now = self._clock()
+        for index, row in enumerate(self.rows):
+            if (
+                not row.resources
+                and row.checked_at is not None
+                and now - row.checked_at >= self.poll_seconds
+            ):
+                dirty.add(index)
+        return [
+            self.rows[index] for index in sorted(dirty) if self._run(self.rows[index])
+        ]
+
+    def _run(self, row: Row) -> bool:
+        """Runs the check of row, returns whether its status changed"""
+        errors = _ErrorLog()
+        check_logger = logging.getLogger("check")
+        check_logger.addHandler(errors)
+        try:
+            status = PASS if row.check.is_healthy() else FAIL
+            failures = errors.messages if status == FAIL else []
+        except Exception as e:  # pylint: disable=broad-except
+            status = ERROR
+            failures = [(str(e) or type(e).__name__).splitlines()[0]]
+        finally:
+            check_logger.removeHandler(errors)
+
+        row.checked_at = self._clock()
+        row.failures = failures
+        if status == row.status:
+            return False
+        row.status = status
+        row.changed_at = row.checked_at
+        return True
+
+    def render(self, changed: Sequence[Row] = ()) -> None:
+        if not self.stream.isatty():
+            for row in changed:
+                line = f"{time.strftime('%H:%M:%S')} {row.status:<5} {row.name}"
+                if row.failures:
+                    line += ": " + "; ".join(row.failures)
+                self.stream.write(line + "\n")
+            self.stream.flush()
+            return
+
+        width = shutil.get_terminal_size().columns
+        name_width = max(len("CHECK"), *(len(row.name) for row in self.rows))
+        lines = [
+            f"{len(self.rows)} checks, updated on changes, as of "
+            f"{time.strftime('%H:%M:%S')}; Ctrl-C to exit",
+            "",
+            f"{'CHECK':<{name_width}}  {'STATUS':<7} {'SINCE':>6}  FAILING",
+        ]
+        now = self._clock()
+        for row in self.rows:
+            age = since(now - row.changed_at) if row.changed_at is not None else ""
+            lines.append(
+                f"{row.name:<{name_width}}  {row.status:<7} {age:>6}  "
+                + "; ".join(row.failures)
+            )
+        self.stream.write(
+            _CLEAR_SCREEN + "\n".join(line[:width] for line in lines) + "\n"
+        )
+        self.stream.flush()
@@ -0,0 +1,70 @@
+"""Election of the gunicorn worker running the check scheduler.
+
+Workers compete for an exclusive flock on a shared file; the holder runs the
+scheduled checks, the others only serve requests. The kernel releases the lock
+when its holder exits, and the remaining workers keep trying to take it over.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+log = logging.getLogger("worker_lock")
+
+_DEFAULT_RETRY_SECONDS = 10
+
+
+class WorkerLock:
+    """Exclusive lock held by at most one process at a time"""
+
+    def __init__(self, path: str, retry_seconds: float = _DEFAULT_RETRY_SECONDS):
+        self.path = path
+        self.retry_seconds = retry_seconds
+        self._file: Optional[int] = None
+        self._stop = threading.Event()
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """Takes the lock if no other process holds it.
+        Returns:
+            whether this process holds the lock
+        """
+        if self.held:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._file = fd
+        log.info("Process %d took %s", os.getpid(), self.path)
+        return True
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            os.close(self._file)
+            self._file = None
+
+    def run_when_acquired(self, fn: Callable[[], None]) -> None:
+        """Calls fn once this process holds the lock, retrying in a background
+        thread until then"""
+        if self.try_acquire():
+            fn()
+            return
+
+        def wait():
+            while not self._stop.wait(self.retry_seconds):
+                if self.try_acquire():
+                    fn()
+                    return
+
+        threading.Thread(target=wait, name="worker-lock", daemon=True).start()
@@ -0,0 +1,228 @@
+"""Namespace selection shared by the workload checks.
+
+A workload check covers a single `namespace`, a list of `namespaces`, the
+namespaces matching a `namespace_selector`, or a combination of these. A single
+namespace is listed directly; anything else is served by one cluster-wide list
+of the resource, grouped by namespace in memory, instead of one list per
+namespace. With `list_format: table`, only the printer columns a check needs are
+listed instead of full objects. Full objects are decoded as the list response
+arrives, and either way the objects of every namespace are kept as compact
+projections of the fields the check reads.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional, Tuple
+
+from json_decode import list_items
+from metrics import multiprocess_enabled
+from partial_objects import list_table, resource_path
+from projection import Projection, projection
+from prometheus_client import Gauge
+from pydantic import BaseModel, field_validator, model_validator
+
+namespace_health_metric = Gauge(
+    "workload_namespace_health",
+    "Health of the workloads of a resource type in a namespace",
+    ["resource", "namespace"],
+    multiprocess_mode="livemostrecent",
+)
+
+_lock = threading.Lock()
+# (gauge, scope) -> samples exported for the scope, by label values
+_exported: Dict[Tuple[Gauge, str], Dict[tuple, float]] = {}
+
+
+class WorkloadParameters(BaseModel):
+    namespace: str | None = None
+    namespaces: list[str] = []
+    namespace_selector: str | None = None
+    label_selector: str | None = None
+    # Only useful for fields the CRD declares as selectable
+    field_selector: str | None = None
+    # List full objects, or only the printer columns the check needs
+    list_format: Literal["objects", "table"] = "objects"
+    # Expected number of objects in each selected namespace
+    count: int | None = None
+    # Expected number of objects by namespace, overriding count
+    counts: dict[str, int] = {}
+
+    @field_validator("namespaces", mode="before")
+    @classmethod
+    def split_namespaces(cls, namespaces: Any) -> Any:
+        # Comma-separated on the command line, e.g. namespaces=ns-a,ns-b
+        if isinstance(namespaces, str):
+            return [namespace for namespace in namespaces.split(",") if namespace]
+        return namespaces
+
+    @field_validator("counts", mode="before")
+    @classmethod
+    def split_counts(cls, counts: Any) -> Any:
+        # Comma-separated on the command line, e.g. counts=ns-a=8,ns-b=2
+        if isinstance(counts, str):
+            pairs = [pair.partition("=") for pair in counts.split(",") if pair]
+            if not all(separator for _, separator, _ in pairs):
+                raise ValueError("counts must be namespace=count pairs")
+            return {namespace: count for namespace, _, count in pairs}
+        return counts
+
+    @model_validator(mode="after")
+    def check_namespaces(self) -> "WorkloadParameters":
+        if (
+            self.namespace is None
+            and not self.namespaces
+            and self.namespace_selector is None
+        ):
+            raise ValueError(
+                "One of namespace, namespaces or namespace_selector is required"
+            )
+        return self
+
+    def expected_count(self, namespace: str) -> int | None:
+        return self.counts.get(namespace, self.count)
+
+    def scope(self) -> str:
+        """Identifies the selected objects, so that checks of different
+        selections do not remove each other's metric samples"""
+        return self.model_dump_json(
+            include={"namespace", "namespaces", "namespace_selector", "label_selector"}
+        )
+
+
+def list_by_namespace(
+    params: WorkloadParameters,
+    custom_objects_api: Any,
+    core_v1_api: Any,
+    group: str,
+    version: str,
+    plural: str,
+    columns: Optional[Dict[str, str]] = None,
+) -> Dict[str, List[dict]]:
+    """Lists the objects of a resource in the selected namespaces.
+    Args:
+        columns: printer column name by status field the check reads, used
+            instead of full objects when params.list_format is table
+    Returns:
+        objects by namespace, including selected namespaces without objects.
+        With columns, the objects only hold their name, namespace and the
+        status fields of columns
+    """
+    selectors = {}
+    if params.label_selector:
+        selectors["label_selector"] = params.label_selector
+    if params.field_selector:
+        selectors["field_selector"] = params.field_selector
+
+    single_namespace = (
+        params.namespace is not None
+        and not params.namespaces
+        and params.namespace_selector is None
+    )
+
+    items = None
+    if params.list_format == "table" and columns:
+        items = list_table(
+            resource_path(
+                group, version, plural, params.namespace if single_namespace else None
+            ),
+            columns,
+            [
+                (name, value)
+                for name, value in (
+                    ("labelSelector", params.label_selector),
+                    ("fieldSelector", params.field_selector),
+                )
+                if value
+            ],
+        )
+    # Fall back to full objects if the resource lacks the printer columns
+    if items is None and single_namespace:
+        items = list_items(
+            custom_objects_api.list_namespaced_custom_object,
+            group=group,
+            version=version,
+            plural=plural,
+            namespace=params.namespace,
+            **selectors,
+        )
+    project = _projection(columns) if columns else None
+    if single_namespace:
+        return {
+            params.namespace: [project(item) if project else item for item in items]
+        }
+
+    namespaces = set(params.namespaces)
+    if params.namespace is not None:
+        namespaces.add(params.namespace)
+    if params.namespace_selector is not None:
+        namespaces.update(
+            namespace.metadata.name
+            for namespace in core_v1_api.list_namespace(
+                label_selector=params.namespace_selector
+            ).items
+        )
+
+    if items is None:
+        items = list_items(
+            custom_objects_api.list_cluster_custom_object,
+            group=group,
+            version=version,
+            plural=plural,
+            **selectors,
+        )
+    by_namespace = {namespace: [] for namespace in sorted(namespaces)}
+    for item in items:
+        namespace_items = by_namespace.get(item.get("metadata").get("namespace"))
+        if namespace_items is not None:
+            namespace_items.append(project(item) if project else item)
+    return by_namespace
+
+
+def _projection(columns: Dict[str, str]) -> Projection:
+    return projection(
+        (
+            "metadata.name",
+            "metadata.namespace",
+            *(f"status.{field}" for field in columns),
+        )
+    )
+
+
+def export(
+    metric: Gauge,
+    samples: Dict[tuple, float],
+    scope: str = "",
+    combine: Callable[[Iterable[float]], float] = max,
+) -> None:
+    """Sets the samples of a gauge by label values, in place of those exported
+    by the previous call for the same scope. Checks whose selections overlap
+    export the same label values from different scopes; such a sample is set to
+    the combination of the values of every scope, and only removed once no scope
+    exports it. In multiprocess mode, where prometheus_client cannot remove
+    samples from the files of the workers, it is set to 0 instead."""
+    with _lock:
+        previous = _exported.get((metric, scope), {})
+        _exported[(metric, scope)] = dict(samples)
+        for labels in previous.keys() | samples.keys():
+            values = [
+                exported[labels]
+                for (gauge, _), exported in _exported.items()
+                if gauge is metric and labels in exported
+            ]
+            if values:
+                metric.labels(*labels).set(combine(values))
+            elif multiprocess_enabled():
+                metric.labels(*labels).set(0)
+            else:
+                metric.remove(*labels)
+
+
+def report(resource: str, results: Dict[str, bool], scope: str = "") -> None:
+    """Exports the health of each namespace, dropping namespaces no longer
+    selected. A namespace selected by several checks is healthy if it is healthy
+    for all of them."""
+    export(
+        namespace_health_metric,
+        {(resource, namespace): int(healthy) for namespace, healthy in results.items()},
+        scope=resource + scope,
+        combine=min,
+    )
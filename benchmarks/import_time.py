@@ -0,0 +1,72 @@
+"""Measures startup import time and peak RSS of the validator.
+
+Each scenario runs in a fresh interpreter with the app directory on the path,
+so module caches from one scenario never leak into another.
+
+Usage:
+    python3 benchmarks/import_time.py [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+_EAGER_IMPORTS = """
+import check_data_volumes, check_google_group_rbac, check_nodes
+import check_robin_cluster, check_root_syncs, check_virtual_machines
+import check_vmruntime
+"""
+
+_SCENARIOS = {
+    "eager import of all checks": _EAGER_IMPORTS,
+    "registry, default CLI checks": """
+from registry import health_check_registry
+for name in ("checknodes", "checkrobincluster", "checkrootsyncs"):
+    health_check_registry[name]
+""",
+    "registry, no checks": "from registry import health_check_registry",
+}
+
+_MEASURE = """
+import json, resource, sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "<scenario>", "exec"))
+elapsed = time.perf_counter() - start
+rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_kib": rss_kib, "modules": len(sys.modules)}}))
+"""
+
+
+def measure(code: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _MEASURE.format(code=code)],
+        cwd=_APP_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<32} {'import ms':>10} {'peak RSS MiB':>13} {'modules':>8}")
+    for name, code in _SCENARIOS.items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss = statistics.median(run["rss_kib"] for run in runs) / 1024
+        modules = runs[-1]["modules"]
+        print(f"{name:<32} {seconds * 1000:>10.1f} {rss:>13.1f} {modules:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
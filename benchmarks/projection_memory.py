@@ -0,0 +1,155 @@
+"""Compares the memory held by decoded objects and by their projections.
+
+Generates realistic virtual machine, data volume and node objects, decodes
+them from JSON as the API client does, and measures with tracemalloc the memory
+held by the decoded dicts, and by the projections the workload checks keep.
+
+Usage:
+    python3 benchmarks/projection_memory.py [--objects 10000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, _APP_DIR)
+
+from projection import Projection  # pylint: disable=wrong-import-position
+
+_FIELDS = {
+    "virtualmachines": ["metadata.name", "metadata.namespace", "status.state"],
+    "datavolumes": [
+        "metadata.name",
+        "metadata.namespace",
+        "status.phase",
+        "status.progress",
+    ],
+    "nodes": ["metadata.name", "status.conditions"],
+}
+
+
+def _metadata(kind: str, index: int, namespace: str = "") -> dict:
+    return {
+        "name": f"{kind}-{index:05d}",
+        "namespace": namespace,
+        "uid": f"6f1c7e4a-0d8b-4c1e-9a7f-{index:012d}",
+        "resourceVersion": str(1000000 + index),
+        "generation": 3,
+        "creationTimestamp": "2024-05-01T10:00:00Z",
+        "labels": {"app": f"workload-{index % 50}", "tier": "vm"},
+        "annotations": {
+            "kubectl.kubernetes.io/last-applied-configuration": "{" + "x" * 600 + "}"
+        },
+        "managedFields": [
+            {
+                "manager": manager,
+                "operation": "Update",
+                "apiVersion": "v1",
+                "time": "2024-05-01T10:00:00Z",
+                "fieldsType": "FieldsV1",
+                "fieldsV1": {"f:metadata": {"f:labels": {".": {}, "f:app": {}}}},
+            }
+            for manager in ("kubectl", "controller", "scheduler")
+        ],
+    }
+
+
+def _objects(resource: str, count: int) -> list:
+    objects = []
+    for index in range(count):
+        namespace = f"vm-workloads-{index % 20}"
+        if resource == "virtualmachines":
+            obj = {
+                "apiVersion": "vm.cluster.gke.io/v1",
+                "kind": "VirtualMachine",
+                "metadata": _metadata("vm", index, namespace),
+                "spec": {
+                    "compute": {"cpu": {"vcpus": 4}, "memory": {"capacity": "8Gi"}},
+                    "disks": [
+                        {"virtualMachineDiskName": f"disk-{index}", "boot": True}
+                    ],
+                    "interfaces": [{"name": "eth0", "networkName": "pod-network"}],
+                    "runningState": "Running",
+                },
+                "status": {"state": "Running", "ip": f"10.0.{index % 256}.1"},
+            }
+        elif resource == "datavolumes":
+            obj = {
+                "apiVersion": "cdi.kubevirt.io/v1beta1",
+                "kind": "DataVolume",
+                "metadata": _metadata("dv", index, namespace),
+                "spec": {
+                    "source": {"http": {"url": f"https://images/{index}.qcow2"}},
+                    "pvc": {"resources": {"requests": {"storage": "20Gi"}}},
+                },
+                "status": {
+                    "phase": "Succeeded",
+                    "progress": "100.0%",
+                    "claimName": f"dv-{index}",
+                },
+            }
+        else:
+            obj = {
+                "apiVersion": "v1",
+                "kind": "Node",
+                "metadata": _metadata("node", index),
+                "spec": {"podCIDR": "10.1.0.0/24", "providerID": f"bm://{index}"},
+                "status": {
+                    "conditions": [
+                        {"type": kind, "status": status, "reason": kind + "Reason"}
+                        for kind, status in (
+                            ("MemoryPressure", "False"),
+                            ("DiskPressure", "False"),
+                            ("PIDPressure", "False"),
+                            ("Ready", "True"),
+                        )
+                    ],
+                    "capacity": {"cpu": "64", "memory": "512Gi", "pods": "250"},
+                    "nodeInfo": {"kubeletVersion": "v1.28.3", "osImage": "Ubuntu"},
+                },
+            }
+        objects.append(obj)
+    return objects
+
+
+def _held(build) -> tuple:
+    """Returns the result of build and the memory it holds"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--objects", type=int, default=10000, help="objects per resource"
+    )
+    args = parser.parse_args()
+
+    print(f"{'resource':<16} {'dicts MiB':>10} {'projected MiB':>14} {'ratio':>7}")
+    for resource, fields in _FIELDS.items():
+        payload = json.dumps({"items": _objects(resource, args.objects)})
+        project = Projection(fields)
+        items, dicts = _held(lambda: json.loads(payload)["items"])
+        del items
+        # Fields kept whole, such as node conditions, are counted as held
+        _, projected = _held(
+            lambda: [project(item) for item in json.loads(payload)["items"]]
+        )
+        print(
+            f"{resource:<16} {dicts / 2**20:>10.1f} {projected / 2**20:>14.2f} "
+            f"{dicts / projected:>6.0f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Measures the latency of /health, /metrics and /robin_metrics under load.
+
+Starts a fake robin-master whose /metrics answers after --upstream-delay
+seconds, and the service under gunicorn with the gunicorn.conf.py of the app,
+replaying an empty traffic capture so that no cluster is needed. Clients then
+scrape /robin_metrics and /metrics and probe /health concurrently for
+--duration seconds, and the requests, errors and p50/p99 latencies of each
+endpoint are printed. Run with --worker-class sync and gthread to compare.
+
+Usage:
+    python3 benchmarks/serving_load.py [--worker-class gthread] [--duration 30]
+        [--upstream-delay 5] [--clients 4] [--robin-clients 4]
+    python3 benchmarks/serving_load.py --url http://localhost:8080
+"""
+
+import argparse
+import http.server
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from typing import Dict, List, Tuple
+
+_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+_STARTUP_TIMEOUT_SECONDS = 60
+_REQUEST_TIMEOUT_SECONDS = 30
+_ENDPOINTS = ("/health", "/metrics", "/robin_metrics")
+
+_ROBIN_METRICS = "".join(
+    f'robin_volume_used_bytes{{volume="pvc-{index}"}} {index * 1024}\n'
+    for index in range(500)
+).encode()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_upstream(delay: float) -> http.server.ThreadingHTTPServer:
+    """Starts a fake robin-master metrics endpoint answering after delay"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):  # pylint: disable=invalid-name
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(_ROBIN_METRICS)))
+            self.end_headers()
+            self.wfile.write(_ROBIN_METRICS)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _get(url: str) -> Tuple[float, int]:
+    """Returns the latency and status of a GET request, 0 if it failed"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=_REQUEST_TIMEOUT_SECONDS) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def _start_service(
+    args, directory: str, upstream_url: str
+) -> Tuple[subprocess.Popen, str]:
+    """Starts the service under gunicorn, returns its process and URL"""
+    capture = os.path.join(directory, "empty.zip")
+    zipfile.ZipFile(capture, "w").close()
+
+    port = _free_port()
+    env = dict(os.environ)
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    if args.threads is not None:
+        env["GUNICORN_THREADS"] = str(args.threads)
+    env.update(
+        {
+            "ROBIN_METRICS_URL": upstream_url,
+            "TRAFFIC_REPLAY_PATH": capture,
+            "GUNICORN_WORKER_CLASS": args.worker_class,
+            "LOG_LEVEL": "ERROR",
+        }
+    )
+    log_path = os.path.join(directory, "gunicorn.log")
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "-c",
+                "gunicorn.conf.py",
+                "-b",
+                f"127.0.0.1:{port}",
+                "app:app",
+            ],
+            cwd=_APP_DIR,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + _STARTUP_TIMEOUT_SECONDS
+    while _get(url + "/health")[1] != 200:
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            with open(log_path) as stream:
+                sys.stderr.write(stream.read())
+            raise RuntimeError("The service failed to start")
+        time.sleep(0.2)
+    return process, url
+
+
+def _load(url: str, args) -> Dict[str, List[Tuple[float, int]]]:
+    """Requests each endpoint from its clients until the end of the run"""
+    samples: Dict[str, List[Tuple[float, int]]] = {path: [] for path in _ENDPOINTS}
+    deadline = time.monotonic() + args.duration
+
+    def client(path: str) -> None:
+        while time.monotonic() < deadline:
+            samples[path].append(_get(url + path))
+            time.sleep(args.pause)
+
+    threads = [
+        threading.Thread(target=client, args=(path,))
+        for path in _ENDPOINTS
+        for _ in range(
+            args.robin_clients if path == "/robin_metrics" else args.clients
+        )
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def _percentile(latencies: List[float], percent: float) -> float:
+    index = min(len(latencies) - 1, int(len(latencies) * percent / 100))
+    return latencies[index]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", help="load a running service instead of starting one"
+    )
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument(
+        "--threads", type=int, help="threads per worker (default: gunicorn.conf.py)"
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--upstream-delay", type=float, default=5)
+    parser.add_argument(
+        "--clients", type=int, default=4, help="clients of /metrics and of /health"
+    )
+    parser.add_argument("--robin-clients", type=int, default=4)
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=0.1,
+        help="seconds between the requests of a client",
+    )
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url
+        if url is None:
+            upstream = _start_upstream(args.upstream_delay)
+            process, url = _start_service(
+                args, directory, f"http://127.0.0.1:{upstream.server_port}/metrics"
+            )
+            print(
+                f"{args.worker_class} worker, "
+                f"robin-master answering after {args.upstream_delay:g}s"
+            )
+        try:
+            samples = _load(url, args)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    print(
+        f"{'endpoint':<16} {'requests':>8} {'errors':>8} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+    for path in _ENDPOINTS:
+        latencies = sorted(latency * 1000 for latency, _ in samples[path])
+        errors = sum(1 for _, status in samples[path] if status != 200)
+        if not latencies:
+            print(f"{path:<16} {0:>8}")
+            continue
+        print(
+            f"{path:<16} {len(latencies):>8} {errors:>8} "
+            f"{_percentile(latencies, 50):>8.1f} {_percentile(latencies, 99):>8.1f} "
+            f"{latencies[-1]:>8.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())